@@ -0,0 +1,142 @@
+import json
+from typing import AsyncIterator, Iterator
+
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework import status
+
+from app.api.serializers import EventStreamQuerySerializer, StreamAckSerializer
+from app.api.exceptions import ServiceUnavailableError, translate_exception
+from app.services import EventStreamService
+
+class EventStreamView(APIView):
+    def get(self, request):
+        offsets, data = self._offsets(request)
+
+        # Under ASGI every sync view shares one thread, so the wait must not
+        # happen here: the body is produced on the event loop instead.
+        if isinstance(request._request, ASGIRequest):
+            response = StreamingHttpResponse(
+                _long_poll_async(offsets, limit=data["limit"], wait=data["wait"]),
+                content_type="application/json",
+            )
+            response["Cache-Control"] = "no-cache"
+            return response
+
+        # Past EVENT_STREAM_MAX_CONNECTIONS a long poll answers right away
+        # instead of holding one more worker thread.
+        waiting = data["wait"] > 0 and EventStreamService.claim_connection()
+        try:
+            batch = EventStreamService.poll(offsets, limit=data["limit"], wait=data["wait"] if waiting else 0)
+        finally:
+            if waiting:
+                EventStreamService.release_connection()
+
+        return Response(_batch_body(batch), status=status.HTTP_200_OK)
+
+    @staticmethod
+    def _offsets(request):
+        serializer = EventStreamQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        try:
+            offsets = EventStreamService.offsets(
+                cursor=data.get("cursor"),
+                consumer=data.get("consumer"),
+                start=data["start"],
+            )
+        except Exception as exception:
+            translate_exception(exception)
+        return offsets, data
+
+class EventStreamNdjsonView(EventStreamView):
+    def get(self, request):
+        offsets, data = self._offsets(request)
+
+        # Under ASGI the stream is an async iterator, so each line goes out as
+        # soon as it is produced and an idle stream holds no thread. Under WSGI
+        # it needs a worker thread for its whole lifetime.
+        if isinstance(request._request, ASGIRequest):
+            content = _ndjson_async(offsets, limit=data["limit"], timeout=data["timeout"])
+        elif EventStreamService.claim_connection():
+            content = _ReleaseOnClose(_ndjson(offsets, limit=data["limit"], timeout=data["timeout"]))
+        else:
+            raise ServiceUnavailableError("Too many open event streams, retry later", wait=1)
+
+        response = StreamingHttpResponse(content, content_type="application/x-ndjson")
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+class StreamConsumerOffsetsView(APIView):
+    def get(self, request, consumer):
+        offsets = EventStreamService.consumer_offsets(consumer)
+        return Response(
+            {"consumer": consumer, "offsets": offsets, "cursor": EventStreamService.encode_cursor(offsets)},
+            status=status.HTTP_200_OK,
+        )
+
+    def post(self, request, consumer):
+        serializer = StreamAckSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            offsets = EventStreamService.ack(consumer, EventStreamService.decode_cursor(serializer.validated_data["cursor"]))
+        except Exception as exception:
+            translate_exception(exception)
+
+        return Response(
+            {"consumer": consumer, "offsets": offsets, "cursor": EventStreamService.encode_cursor(offsets)},
+            status=status.HTTP_200_OK,
+        )
+
+def _batch_body(batch) -> dict:
+    return {
+        "events": [event.as_dict() for event in batch.events],
+        "cursor": batch.cursor,
+    }
+
+async def _long_poll_async(offsets, *, limit: int, wait: float) -> AsyncIterator[bytes]:
+    batch = await EventStreamService.apoll(offsets, limit=limit, wait=wait)
+    yield JSONRenderer().render(_batch_body(batch))
+
+def _ndjson_lines(batch) -> Iterator[str]:
+    # One JSON object per line: the events, then a cursor line after every
+    # batch (or as a heartbeat) to resume from on reconnect.
+    for event in batch.events:
+        yield json.dumps(event.as_dict(), separators=(",", ":")) + "\n"
+    yield json.dumps({"type": "cursor", "cursor": batch.cursor}) + "\n"
+
+def _ndjson(offsets, *, limit: int, timeout: float) -> Iterator[str]:
+    for batch in EventStreamService.stream(offsets, limit=limit, timeout=timeout):
+        yield from _ndjson_lines(batch)
+
+async def _ndjson_async(offsets, *, limit: int, timeout: float) -> AsyncIterator[str]:
+    async for batch in EventStreamService.astream(offsets, limit=limit, timeout=timeout):
+        for line in _ndjson_lines(batch):
+            yield line
+
+class _ReleaseOnClose:
+    # Gives the stream's connection slot back when the server closes the
+    # response, even if the client left before the first line was sent.
+    def __init__(self, lines: Iterator[str]):
+        self._lines = lines
+        self._released = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        return next(self._lines)
+
+    def close(self):
+        try:
+            self._lines.close()
+        finally:
+            if not self._released:
+                self._released = True
+                EventStreamService.release_connection()
@@ -1,13 +1,9 @@
+import math
+
 from rest_framework import status
-from rest_framework.exceptions import APIException
+from rest_framework.exceptions import APIException, Throttled
 
-from app.services import (
-    IdempotencyConflict,
-    UnsupportedPaymentMethod,
-    InvalidInstallments,
-    EmptySplitError,
-    InvalidSplitPercentage,
-)
+from app import services
 
 class ConflictError(APIException):
     status_code = status.HTTP_409_CONFLICT
@@ -19,16 +15,41 @@ class BadRequestError(APIException):
     default_detail = "Bad request"
     default_code = "bad_request"
 
+class ServiceUnavailableError(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Service temporarily unavailable"
+    default_code = "service_unavailable"
+
+    def __init__(self, detail=None, code=None, wait=None):
+        super().__init__(detail, code)
+        self.wait = wait
+
+# Keyed by name: a service's exceptions are only looked up once its module
+# is loaded (nothing else could have raised them), so importing this module
+# loads no service.
 EXCEPTION_MAPPING = {
-    IdempotencyConflict: ConflictError,
-    UnsupportedPaymentMethod: BadRequestError,
-    InvalidInstallments: BadRequestError,
-    EmptySplitError: BadRequestError,
-    InvalidSplitPercentage: BadRequestError,
+    "IdempotencyConflict": ConflictError,
+    "UnsupportedPaymentMethod": BadRequestError,
+    "InvalidInstallments": BadRequestError,
+    "EmptySplitError": BadRequestError,
+    "InvalidSplitPercentage": BadRequestError,
+    "InvalidStatementCursor": BadRequestError,
+    "StatementCurrencyRequired": BadRequestError,
+    "InvalidStreamCursor": BadRequestError,
+    "UnsupportedCurrency": BadRequestError,
+    "InvalidCurrencyAmount": BadRequestError,
+    "FxRateUnavailable": ServiceUnavailableError,
+    "RateLimited": Throttled,
+    "Overloaded": ServiceUnavailableError,
 }
 
 def translate_exception(exception: Exception):
-    for exception_type, api_exception in EXCEPTION_MAPPING.items():
-        if isinstance(exception, exception_type):
+    for name, api_exception in EXCEPTION_MAPPING.items():
+        exception_type = services.loaded(name)
+        if exception_type is not None and isinstance(exception, exception_type):
+            retry_after = getattr(exception, "retry_after", None)
+            if retry_after is not None:
+                # DRF's handler turns `wait` into a whole-second Retry-After.
+                raise api_exception(detail=str(exception), wait=math.ceil(retry_after))
             raise api_exception(str(exception))
     raise exception
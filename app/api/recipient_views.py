@@ -0,0 +1,70 @@
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework import status
+
+from app.api.serializers import StatementQuerySerializer, BalanceQuerySerializer
+from app.api.exceptions import translate_exception
+from app.services import StatementService, LedgerSnapshotService
+
+class RecipientStatementView(APIView):
+    def get(self, request, recipient_id):
+        serializer = StatementQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        try:
+            page = StatementService.get_statement(
+                recipient_id=recipient_id,
+                start=data.get("start"),
+                end=data.get("end"),
+                currency=data.get("currency"),
+                cursor=data.get("cursor"),
+                limit=data["limit"],
+            )
+        except Exception as exception:
+            translate_exception(exception)
+
+        return Response(
+            {
+                "recipient_id": page.recipient_id,
+                "closing_balance": float(page.closing_balance),
+                "entries": [
+                    {
+                        "payment_id": line.payment_id,
+                        "role": line.role,
+                        "amount": float(line.amount),
+                        "currency": line.currency,
+                        "running_balance": float(line.running_balance),
+                        "created_at": line.created_at.isoformat(),
+                    }
+                    for line in page.lines
+                ],
+                "next_cursor": page.next_cursor,
+            },
+            status=status.HTTP_200_OK,
+        )
+
+class RecipientBalanceView(APIView):
+    def get(self, request, recipient_id):
+        serializer = BalanceQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        try:
+            balance = LedgerSnapshotService.balance(
+                recipient_id=recipient_id,
+                currency=data["currency"],
+                as_of=data.get("as_of"),
+            )
+        except Exception as exception:
+            translate_exception(exception)
+
+        return Response(
+            {
+                "recipient_id": balance.recipient_id,
+                "currency": balance.currency,
+                "as_of": balance.as_of.isoformat() if balance.as_of else None,
+                "balance": float(balance.balance),
+            },
+            status=status.HTTP_200_OK,
+        )
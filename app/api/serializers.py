@@ -1,17 +1,18 @@
 from decimal import Decimal
 from rest_framework import serializers
 
+from app.services.currency_service import CURRENCIES
+
 class SplitSerializer(serializers.Serializer):
     recipient_id = serializers.CharField()
     role = serializers.CharField()
     percent = serializers.IntegerField(min_value=1, max_value=100)
 
-class PaymentInputSerializer(serializers.Serializer):
+class QuoteQuerySerializer(serializers.Serializer):
     amount = serializers.DecimalField(max_digits=12, decimal_places=2)
     currency = serializers.CharField()
     payment_method = serializers.CharField()
     installments = serializers.IntegerField()
-    splits = SplitSerializer(many=True)
 
     def validate_amount(self, value: Decimal):
         if value <= Decimal("0.00"):
@@ -20,8 +21,8 @@ class PaymentInputSerializer(serializers.Serializer):
 
     def validate_currency(self, value: str):
         value = value.upper()
-        if value != "BRL":
-            raise serializers.ValidationError("Only BRL is supported")
+        if value not in CURRENCIES:
+            raise serializers.ValidationError("Unsupported currency")
         return value
 
     def validate_payment_method(self, value: str):
@@ -30,6 +31,25 @@ class PaymentInputSerializer(serializers.Serializer):
             raise serializers.ValidationError("Unsupported payment method")
         return value
 
+    def validate(self, data):
+        currency = CURRENCIES[data["currency"]]
+        if data["amount"] != data["amount"].quantize(currency.quantum):
+            raise serializers.ValidationError(f"{currency.code} amounts allow at most {currency.minor_units} decimal places")
+
+        payment_method = data["payment_method"]
+        installments = data["installments"]
+
+        if payment_method == "pix" and installments != 1:
+            raise serializers.ValidationError("PIX does not support installments")
+
+        if payment_method == "card" and not (1 <= installments <= 12):
+            raise serializers.ValidationError("Card installments must be between 1 and 12")
+
+        return data
+
+class PaymentInputSerializer(QuoteQuerySerializer):
+    splits = SplitSerializer(many=True)
+
     def validate(self, data):
         splits = data.get("splits", [])
 
@@ -40,13 +60,47 @@ class PaymentInputSerializer(serializers.Serializer):
         if total_percent != 100:
             raise serializers.ValidationError("Split percentages must sum to 100")
 
-        payment_method = data["payment_method"]
-        installments = data["installments"]
+        return super().validate(data)
 
-        if payment_method == "pix" and installments != 1:
-            raise serializers.ValidationError("PIX does not support installments")
+class StatementQuerySerializer(serializers.Serializer):
+    start = serializers.DateTimeField(required=False)
+    end = serializers.DateTimeField(required=False)
+    currency = serializers.CharField(required=False)
+    cursor = serializers.CharField(required=False)
+    limit = serializers.IntegerField(min_value=1, max_value=200, default=50)
 
-        if payment_method == "card" and not (1 <= installments <= 12):
-            raise serializers.ValidationError("Card installments must be between 1 and 12")
+    def validate_currency(self, value: str):
+        value = value.upper()
+        if value not in CURRENCIES:
+            raise serializers.ValidationError("Unsupported currency")
+        return value
+
+    def validate(self, data):
+        start = data.get("start")
+        end = data.get("end")
+
+        if start and end and start >= end:
+            raise serializers.ValidationError("start must be before end")
 
         return data
+
+class BalanceQuerySerializer(serializers.Serializer):
+    currency = serializers.CharField(default="BRL")
+    as_of = serializers.DateTimeField(required=False)
+
+    def validate_currency(self, value: str):
+        value = value.upper()
+        if value not in CURRENCIES:
+            raise serializers.ValidationError("Unsupported currency")
+        return value
+
+class EventStreamQuerySerializer(serializers.Serializer):
+    cursor = serializers.CharField(required=False)
+    consumer = serializers.CharField(required=False, max_length=100)
+    start = serializers.ChoiceField(choices=["earliest", "latest"], default="earliest")
+    limit = serializers.IntegerField(min_value=1, max_value=1000, default=100)
+    wait = serializers.FloatField(min_value=0, max_value=60, default=20)
+    timeout = serializers.FloatField(min_value=0, max_value=3600, default=300)
+
+class StreamAckSerializer(serializers.Serializer):
+    cursor = serializers.CharField()
@@ -1,8 +1,32 @@
 from django.urls import path
+from django.utils.module_loading import import_string
+from django.views.decorators.csrf import csrf_exempt
 
 from app.api.views import ConfirmPaymentView, CheckoutQuoteView
 
+
+def _lazy(view_path: str):
+    # Statement and event stream views (and the services behind them) are
+    # imported on their first request, so a worker that only confirms and
+    # quotes never loads them.
+    view = None
+
+    @csrf_exempt
+    def dispatch(request, *args, **kwargs):
+        nonlocal view
+        if view is None:
+            view = import_string(view_path).as_view()
+        return view(request, *args, **kwargs)
+
+    return dispatch
+
+
 urlpatterns = [
     path("payments", ConfirmPaymentView.as_view()),
     path("checkout/quote", CheckoutQuoteView.as_view()),
+    path("recipients/<str:recipient_id>/statement", _lazy("app.api.recipient_views.RecipientStatementView")),
+    path("recipients/<str:recipient_id>/balance", _lazy("app.api.recipient_views.RecipientBalanceView")),
+    path("events", _lazy("app.api.event_views.EventStreamView")),
+    path("events/stream", _lazy("app.api.event_views.EventStreamNdjsonView")),
+    path("events/consumers/<str:consumer>/offsets", _lazy("app.api.event_views.StreamConsumerOffsetsView")),
 ]
@@ -1,10 +1,16 @@
+from decimal import Decimal
+from typing import Optional
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from rest_framework.renderers import JSONRenderer
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 
-from app.api.serializers import PaymentInputSerializer
+from app.api.serializers import PaymentInputSerializer, QuoteQuerySerializer
 from app.api.exceptions import translate_exception
-from app.services import PaymentService, CalculationService, SplitInput
+from app.services import PaymentService, CalculationService, ShardService, AdmissionService, FxService, QuoteCache, CachedQuote, SplitInput
 
 class ConfirmPaymentView(APIView):
     def post(self, request):
@@ -27,14 +33,20 @@ class ConfirmPaymentView(APIView):
                 percent=split["percent"],
             ))
 
+        payment = dict(
+            idempotency_key=idempotency_key,
+            amount=data["amount"],
+            currency=data["currency"],
+            payment_method=data["payment_method"],
+            installments=data["installments"],
+            splits=splits,
+        )
+
         try:
-            result = PaymentService.confirm_payment(
-                idempotency_key=idempotency_key,
-                amount=data["amount"],
-                currency=data["currency"],
-                payment_method=data["payment_method"],
-                installments=data["installments"],
-                splits=splits,
+            result = AdmissionService.run(
+                seller=ShardService.seller_of(splits),
+                operation=lambda: PaymentService.confirm_payment(**payment),
+                fallback=lambda: PaymentService.find_replay(**payment),
             )
         except Exception as exception:
             translate_exception(exception)
@@ -46,6 +58,12 @@ class ConfirmPaymentView(APIView):
                 "gross_amount": float(result.gross_amount),
                 "platform_fee_amount": float(result.platform_fee_amount),
                 "net_amount": float(result.net_amount),
+                "currency": result.currency,
+                "settlement": {
+                    "currency": settings.SETTLEMENT_CURRENCY,
+                    "net_amount": _as_float(result.settlement_net_amount),
+                    "fx_rate_version": result.fx_rate_version,
+                },
                 "receivables": [
                     {
                         "recipient_id": r.recipient_id,
@@ -63,25 +81,95 @@ class ConfirmPaymentView(APIView):
         )
 
 class CheckoutQuoteView(APIView):
+    def get(self, request):
+        # Repeat quotes are answered from the cache before any validation:
+        # only inputs that were validated once are ever stored under a key.
+        cached = CheckoutQuoteView._cached(request.query_params)
+        if cached is None:
+            serializer = QuoteQuerySerializer(data=request.query_params)
+            serializer.is_valid(raise_exception=True)
+            cached = CheckoutQuoteView._quote(serializer.validated_data)
+
+        if CheckoutQuoteView._matches(request.headers.get("If-None-Match"), cached.etag):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(cached.body, content_type="application/json")
+        response["ETag"] = cached.etag
+        response["Cache-Control"] = f"public, max-age={settings.QUOTE_CACHE_MAX_AGE_SECONDS}"
+        return response
+
     def post(self, request):
         serializer = PaymentInputSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        data = serializer.validated_data
+
+        cached = CheckoutQuoteView._quote(serializer.validated_data)
+        response = HttpResponse(cached.body, content_type="application/json")
+        response["ETag"] = cached.etag
+        return response
+
+    @staticmethod
+    def _cached(params) -> Optional[CachedQuote]:
+        try:
+            amount = Decimal(params["amount"])
+            # NaNs cannot be hashed (sNaN raises); the serializer rejects them.
+            if not amount.is_finite():
+                return None
+            key = QuoteCache.key(
+                amount=amount,
+                currency=params["currency"].upper(),
+                payment_method=params["payment_method"].lower(),
+                installments=int(params["installments"]),
+                fx_version=FxService.snapshot().version,
+            )
+        except (KeyError, TypeError, ValueError, ArithmeticError):
+            return None
+        return QuoteCache.get(key)
+
+    @staticmethod
+    def _quote(data) -> CachedQuote:
+        # The FX snapshot is pinned so the body always matches the key's version.
+        snapshot = FxService.snapshot()
+        key = QuoteCache.key(
+            amount=data["amount"],
+            currency=data["currency"],
+            payment_method=data["payment_method"],
+            installments=data["installments"],
+            fx_version=snapshot.version,
+        )
+        cached = QuoteCache.get(key)
+        if cached is not None:
+            return cached
 
         try:
             result = CalculationService.calculate(
                 amount=data["amount"],
                 payment_method=data["payment_method"],
                 installments=data["installments"],
+                currency=data["currency"],
+                fx_snapshot=snapshot,
             )
         except Exception as exception:
             translate_exception(exception)
 
-        return Response(
-            {
-                "gross_amount": float(result.gross_amount),
-                "platform_fee_amount": float(result.platform_fee_amount),
-                "net_amount": float(result.net_amount),
+        return QuoteCache.put(key, JSONRenderer().render({
+            "gross_amount": float(result.gross_amount),
+            "platform_fee_amount": float(result.platform_fee_amount),
+            "net_amount": float(result.net_amount),
+            "currency": result.currency,
+            "settlement": {
+                "currency": settings.SETTLEMENT_CURRENCY,
+                "net_amount": _as_float(result.settlement_net_amount),
+                "fx_rate_version": result.fx_rate_version,
             },
-            status=status.HTTP_200_OK,
-        )
+        }))
+
+    @staticmethod
+    def _matches(if_none_match: Optional[str], etag: str) -> bool:
+        if not if_none_match:
+            return False
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+
+def _as_float(value: Optional[Decimal]) -> Optional[float]:
+    # Payments written before settlement amounts existed may not have one.
+    return float(value) if value is not None else None
@@ -2,3 +2,4 @@ from django.apps import AppConfig
 
 class AppConfig(AppConfig):
     name = 'app'
+    default_auto_field = 'django.db.models.BigAutoField'
@@ -0,0 +1,51 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.module_loading import import_string
+
+from app.testing.money_harness import MoneyHarness, DEFAULT_CANDIDATE
+
+
+class Command(BaseCommand):
+    help = (
+        "Generates random (amount, currency, method, installments, splits) cases, checks the fee and split "
+        "invariants on CalculationService/SplitService and compares a candidate implementation against them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--cases", type=int, default=1_000_000)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+        parser.add_argument("--chunk-size", type=int, default=10_000)
+        parser.add_argument("--candidate", default=DEFAULT_CANDIDATE, help="Dotted path to a callable taking a MoneyCase and returning a MoneyOutcome.")
+        parser.add_argument("--max-failures", type=int, default=20)
+        parser.add_argument("--case", type=int, default=None, help="Re-run a single case index (with the same --seed) and print it.")
+
+    def handle(self, *args, **options):
+        if options["case"] is not None:
+            case = MoneyHarness.generate(options["seed"], options["case"])
+            expected, failures = MoneyHarness.check_case(case, import_string(options["candidate"]))
+            self.stdout.write(f"{case}\nreference: {expected}")
+            for failure in failures:
+                self.stdout.write(self.style.ERROR(f"{failure.kind}: {failure.detail}"))
+            return
+
+        report = MoneyHarness.run(
+            cases=options["cases"],
+            seed=options["seed"],
+            candidate=options["candidate"],
+            workers=options["workers"],
+            chunk_size=options["chunk_size"],
+            max_failures=options["max_failures"],
+        )
+
+        self.stdout.write(
+            f"{report.cases} case(s) ({report.invalid_cases} invalid on purpose) in {report.seconds:.1f}s "
+            f"with {options['workers']} worker(s): {report.cases_per_second:.0f} cases/s"
+        )
+        for failure in report.failures:
+            self.stdout.write(self.style.ERROR(f"case {failure.case.index} {failure.kind}: {failure.detail}"))
+
+        if report.failures:
+            raise CommandError(f"Failures found (seed {options['seed']}); re-run one with --case <index>")
+        self.stdout.write(self.style.SUCCESS(f"All invariants hold and {options['candidate']} matches the reference"))
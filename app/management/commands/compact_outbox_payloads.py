@@ -0,0 +1,67 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from app.models import OutboxEvent
+from app.services import ShardService, EventCodec, EventEncodingError
+from app.services.event_codec import BINARY, ENCODINGS
+
+
+class Command(BaseCommand):
+    help = "Rewrites stored payment_captured outbox payloads in another encoding (JSON to compact binary, or back)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--to", choices=ENCODINGS, default=BINARY, help="Target encoding.")
+        parser.add_argument("--batch-size", type=int, default=1_000)
+        parser.add_argument("--dry-run", action="store_true", help="Only report how many rows and bytes would change.")
+
+    def handle(self, *args, **options):
+        target = options["to"]
+        converted = skipped = bytes_before = bytes_after = 0
+
+        for alias in ShardService.aliases():
+            pending = OutboxEvent.objects.using(alias).filter(type="payment_captured")
+            if target == BINARY:
+                pending = pending.filter(payload_bin__isnull=True)
+            else:
+                pending = pending.filter(payload_bin__isnull=False)
+
+            last_id = 0
+            while True:
+                batch = list(pending.filter(id__gt=last_id).order_by("id")[:options["batch_size"]])
+                if not batch:
+                    break
+                last_id = batch[-1].id
+
+                changed = []
+                for outbox_event in batch:
+                    try:
+                        payload = EventCodec.payload_of(outbox_event)
+                        before = self._size(outbox_event)
+                        EventCodec.store(outbox_event, payload, encoding=target)
+                    except EventEncodingError as exception:
+                        skipped += 1
+                        self.stderr.write(f"{alias}: skipping outbox event {outbox_event.id}: {exception}")
+                        continue
+
+                    bytes_before += before
+                    bytes_after += self._size(outbox_event)
+                    changed.append(outbox_event)
+
+                if changed and not options["dry_run"]:
+                    with transaction.atomic(using=alias):
+                        OutboxEvent.objects.using(alias).bulk_update(changed, ["payload", "payload_bin"])
+                converted += len(changed)
+
+        verb = "would convert" if options["dry_run"] else "converted"
+        self.stdout.write(f"{verb} {converted} event(s) to {target}, {skipped} skipped")
+        if bytes_before:
+            self.stdout.write(f"payload bytes: {bytes_before} -> {bytes_after} ({bytes_after / bytes_before:.0%} of the original)")
+        self.stdout.write(self.style.SUCCESS("Done"))
+
+    @staticmethod
+    def _size(outbox_event: OutboxEvent) -> int:
+        if outbox_event.payload_bin is not None:
+            return len(outbox_event.payload_bin)
+        return len(json.dumps(outbox_event.payload))
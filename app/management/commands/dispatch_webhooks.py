@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from app.services import WebhookDispatcher
+
+
+class Command(BaseCommand):
+    help = (
+        "Delivers pending outbox events to the matching webhook subscriptions (signed, over pooled keep-alive "
+        "connections), rescheduling failures with jittered backoff and dead-lettering the ones that still fail."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--alias", action="append", default=None, help="Shard alias (repeatable); defaults to every shard.")
+        parser.add_argument("--batch-size", type=int, default=None, help="Events claimed per batch (default: WEBHOOK_BATCH_SIZE).")
+        parser.add_argument("--follow", action="store_true", help="Keep polling for new events instead of stopping once events and retries are drained.")
+        parser.add_argument("--poll-interval", type=float, default=1.0)
+        parser.add_argument("--max-seconds", type=float, default=None, help="Stop claiming new batches after this long.")
+
+    def handle(self, *args, **options):
+        summary = WebhookDispatcher.dispatch(
+            aliases=options["alias"],
+            batch_size=options["batch_size"],
+            follow=options["follow"],
+            poll_interval=options["poll_interval"],
+            max_seconds=options["max_seconds"],
+        )
+
+        self.stdout.write(
+            f"{summary.events} event(s), {summary.deliveries} delivery(ies) in {summary.seconds:.1f}s "
+            f"({summary.deliveries_per_second:.0f}/s): {summary.delivered} delivered, {summary.retries} rescheduled, {summary.dead_lettered} dead-lettered"
+        )
+        if summary.dead_lettered:
+            self.stdout.write(self.style.WARNING("Failed deliveries were written to webhook_dead_letters"))
+        else:
+            self.stdout.write(self.style.SUCCESS("Webhooks dispatched"))
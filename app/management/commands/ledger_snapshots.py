@@ -0,0 +1,52 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app.services import LedgerSnapshotService, ShardService
+
+
+class Command(BaseCommand):
+    help = (
+        "Builds per-recipient cumulative ledger snapshots up to a watermark, verifies them against the raw "
+        "ledger entries, or drops and rebuilds them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("action", choices=["build", "verify", "rebuild"])
+        parser.add_argument("--alias", action="append", default=None, help="Shard alias (repeatable); defaults to every shard.")
+        parser.add_argument("--chunk-size", type=int, default=50_000, help="Ledger entry ids aggregated per query.")
+        parser.add_argument("--step-size", type=int, default=1_000_000, help="Ledger entry ids covered per snapshot generation.")
+        parser.add_argument("--safety-lag-seconds", type=int, default=300, help="Leave entries younger than this for the next run.")
+
+    def handle(self, *args, **options):
+        aliases = options["alias"] or ShardService.aliases()
+        mismatches = 0
+
+        for alias in aliases:
+            if options["action"] == "verify":
+                verification = LedgerSnapshotService.verify(alias=alias)
+                self.stdout.write(f"{alias}: {verification.checked} snapshot(s) checked, {len(verification.mismatches)} mismatch(es)")
+                for mismatch in verification.mismatches:
+                    self.stdout.write(self.style.ERROR(
+                        f"{alias}: {mismatch.recipient_id} {mismatch.currency} @ {mismatch.watermark_entry_id}: "
+                        f"ledger {mismatch.expected_amount} ({mismatch.expected_count} entries), "
+                        f"snapshot {mismatch.actual_amount} ({mismatch.actual_count} entries)"
+                    ))
+                mismatches += len(verification.mismatches)
+                continue
+
+            build = LedgerSnapshotService.rebuild if options["action"] == "rebuild" else LedgerSnapshotService.build
+            result = build(
+                alias=alias,
+                chunk_size=options["chunk_size"],
+                step_size=options["step_size"],
+                safety_lag=timedelta(seconds=options["safety_lag_seconds"]),
+            )
+            self.stdout.write(
+                f"{alias}: {result.entries} entry(ies) in {result.steps} step(s), {result.snapshots} snapshot(s) written, "
+                f"watermark at entry {result.watermark_entry_id}"
+            )
+
+        if mismatches:
+            raise CommandError(f"{mismatches} snapshot(s) disagree with the ledger; run `ledger_snapshots rebuild`")
+        self.stdout.write(self.style.SUCCESS("Ledger snapshots verified" if options["action"] == "verify" else "Ledger snapshots up to date"))
@@ -0,0 +1,32 @@
+from decimal import Decimal, InvalidOperation
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app.services import FxService, UnsupportedCurrency
+
+
+class Command(BaseCommand):
+    help = "Publishes a new FX snapshot version. Rates are settlement currency units per one unit of each currency."
+
+    def add_arguments(self, parser):
+        parser.add_argument("rates", nargs="+", metavar="CUR=RATE", help="e.g. USD=5.1234 EUR=5.5012")
+
+    def handle(self, *args, **options):
+        rates = {}
+        for pair in options["rates"]:
+            currency, _, rate = pair.partition("=")
+            try:
+                rates[currency.upper()] = Decimal(rate)
+            except InvalidOperation:
+                raise CommandError(f"Invalid rate: {pair}")
+            if rates[currency.upper()] <= 0:
+                raise CommandError(f"Rate must be positive: {pair}")
+
+        try:
+            version = FxService.publish(rates)
+        except UnsupportedCurrency as exception:
+            raise CommandError(str(exception))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Published FX snapshot v{version} ({len(rates)} rate(s)); processes pick it up within their cache TTL"
+        ))
@@ -0,0 +1,200 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.db.models import F
+
+from app.models import Payment, LedgerEntry, LedgerSnapshot, OutboxEvent, ShardMove, WebhookDeadLetter, WebhookRetry
+from app.services import ShardService, EventCodec
+from app.services.event_codec import BINARY, JSON
+
+
+class Command(BaseCommand):
+    help = "Moves payments (with their ledger entries and outbox events) to the shard they hash to under the current PAYMENT_SHARDS."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--from-alias",
+            action="append",
+            default=[],
+            help="Extra database alias to drain (e.g. 'default' when enabling sharding, or a shard being removed). Repeatable.",
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        targets = ShardService.aliases()
+        sources = targets + [alias for alias in options["from_alias"] if alias not in targets]
+
+        for alias in sources:
+            if alias not in connections:
+                raise CommandError(f"Unknown database alias: {alias}")
+
+        moved = 0
+        for source in sources:
+            moved_from_source = self._drain(
+                source=source,
+                targets=targets,
+                batch_size=options["batch_size"],
+                dry_run=options["dry_run"],
+            )
+            self.stdout.write(f"{source}: {moved_from_source} payment(s) {'to move' if options['dry_run'] else 'moved'}")
+            moved += moved_from_source
+
+        self.stdout.write(self.style.SUCCESS(f"Done: {moved} payment(s) {'to move' if options['dry_run'] else 'moved'}"))
+
+    def _drain(self, *, source: str, targets: list[str], batch_size: int, dry_run: bool) -> int:
+        moved = 0
+        last_id = 0
+
+        while True:
+            payments = list(
+                Payment.objects.using(source)
+                .filter(id__gt=last_id)
+                .order_by("id")[:batch_size]
+            )
+            if not payments:
+                return moved
+
+            last_id = payments[-1].id
+
+            for payment in payments:
+                ledger_entries = list(
+                    LedgerEntry.objects.using(source)
+                    .filter(payment_id=payment.id)
+                    .order_by("id")
+                )
+                target = ShardService.shard_for(
+                    idempotency_key=payment.idempotency_key,
+                    recipients=ledger_entries,
+                    aliases=targets,
+                )
+                if target == source:
+                    continue
+
+                if not dry_run:
+                    self._move(payment=payment, ledger_entries=ledger_entries, source=source, target=target)
+                moved += 1
+
+    def _move(self, *, payment: Payment, ledger_entries: list[LedgerEntry], source: str, target: str):
+        source_payment_id = payment.id
+        # _copy reassigns the entries' ids, so keep what the source snapshots need.
+        source_entries = [(entry.id, entry.recipient_id, entry.currency, entry.amount) for entry in ledger_entries]
+        outbox_events = list(
+            OutboxEvent.objects.using(source)
+            .filter(payment_id=source_payment_id)
+            .order_by("id")
+        )
+
+        # Copy first, delete after: a crash in between leaves the payment on
+        # both shards, and the next run finds its ShardMove and only deletes
+        # the source copy. The source is never deleted without that proof.
+        with transaction.atomic(using=target):
+            already_copied = ShardMove.objects.using(target).filter(
+                source_alias=source,
+                source_payment_id=source_payment_id,
+            ).exists()
+
+            if not already_copied:
+                existing = Payment.objects.using(target).filter(idempotency_key=payment.idempotency_key).first()
+                if existing is None:
+                    self._copy(payment=payment, ledger_entries=ledger_entries, outbox_events=outbox_events, source=source, target=target)
+                elif self._same_payment(existing, payment):
+                    # Copied by a run that predates shard_moves: record it now.
+                    self._record(payment=payment, copy=existing, ledger_entries=ledger_entries, outbox_events=outbox_events, source=source, target=target)
+                else:
+                    raise CommandError(
+                        f"{target} already holds a different payment {existing.id} with idempotency key "
+                        f"{payment.idempotency_key!r} (payment {source_payment_id} on {source}); nothing was deleted"
+                    )
+
+        # The copies get ids above the target's snapshot watermarks, so they
+        # count there as delta; the source snapshots must stop counting them.
+        with transaction.atomic(using=source):
+            for entry_id, recipient_id, currency, amount in source_entries:
+                LedgerSnapshot.objects.using(source).filter(
+                    recipient_id=recipient_id,
+                    currency=currency,
+                    watermark_entry_id__gte=entry_id,
+                ).update(cumulative_amount=F("cumulative_amount") - amount, entry_count=F("entry_count") - 1)
+            Payment.objects.using(source).filter(id=source_payment_id).delete()
+
+    def _copy(self, *, payment: Payment, ledger_entries: list[LedgerEntry], outbox_events: list[OutboxEvent], source: str, target: str):
+        # Ids are allocated per shard, so the source ids may already be taken
+        # on the target: rows get new ids, recorded in a ShardMove.
+        source_payment_id = payment.id
+        ledger_entry_ids = {}
+        outbox_event_ids = {}
+
+        created_at = payment.created_at
+        payment.pk = None
+        payment.save(using=target, force_insert=True)
+        # auto_now_add overwrites created_at on insert, so restore it explicitly.
+        Payment.objects.using(target).filter(id=payment.id).update(created_at=created_at)
+
+        for ledger_entry in ledger_entries:
+            source_id, created_at = ledger_entry.id, ledger_entry.created_at
+            ledger_entry.pk = None
+            ledger_entry.payment_id = payment.id
+            ledger_entry.save(using=target, force_insert=True)
+            LedgerEntry.objects.using(target).filter(id=ledger_entry.id).update(created_at=created_at)
+            ledger_entry_ids[str(source_id)] = ledger_entry.id
+
+        for outbox_event in outbox_events:
+            source_id, created_at = outbox_event.id, outbox_event.created_at
+            outbox_event.pk = None
+            outbox_event.payment_id = payment.id
+            payload = EventCodec.payload_of(outbox_event)
+            if payload.get("payment_id") == str(source_payment_id):
+                encoding = BINARY if outbox_event.payload_bin is not None else JSON
+                EventCodec.store(outbox_event, {**payload, "payment_id": str(payment.id)}, encoding=encoding)
+            outbox_event.save(using=target, force_insert=True)
+            OutboxEvent.objects.using(target).filter(id=outbox_event.id).update(created_at=created_at)
+            outbox_event_ids[str(source_id)] = outbox_event.id
+
+        self._copy_deliveries(outbox_event_ids, source=source, target=target)
+
+        ShardMove.objects.using(target).create(
+            source_alias=source,
+            source_payment_id=source_payment_id,
+            payment_id=payment.id,
+            ledger_entry_ids=ledger_entry_ids,
+            outbox_event_ids=outbox_event_ids,
+        )
+
+    def _record(self, *, payment: Payment, copy: Payment, ledger_entries: list[LedgerEntry], outbox_events: list[OutboxEvent], source: str, target: str):
+        copied_entries = list(LedgerEntry.objects.using(target).filter(payment_id=copy.id).order_by("id").values_list("id", flat=True))
+        copied_events = list(OutboxEvent.objects.using(target).filter(payment_id=copy.id).order_by("id").values_list("id", flat=True))
+        if len(copied_entries) != len(ledger_entries) or len(copied_events) != len(outbox_events):
+            raise CommandError(f"Incomplete copy of payment {payment.id} ({source}) as {copy.id} on {target}; nothing was deleted")
+
+        outbox_event_ids = {str(event.id): copied for event, copied in zip(outbox_events, copied_events)}
+        # Runs before shard_moves never copied dead letters.
+        self._copy_deliveries(outbox_event_ids, source=source, target=target)
+
+        ShardMove.objects.using(target).create(
+            source_alias=source,
+            source_payment_id=payment.id,
+            payment_id=copy.id,
+            ledger_entry_ids={str(entry.id): copied for entry, copied in zip(ledger_entries, copied_entries)},
+            outbox_event_ids=outbox_event_ids,
+        )
+
+    @staticmethod
+    def _copy_deliveries(outbox_event_ids: dict, *, source: str, target: str):
+        # Deleting the source payment cascades to its events' dead letters and
+        # scheduled webhook retries.
+        for model in (WebhookDeadLetter, WebhookRetry):
+            for row in model.objects.using(source).filter(event_id__in=[int(event_id) for event_id in outbox_event_ids]):
+                created_at = row.created_at
+                row.pk = None
+                row.event_id = outbox_event_ids[str(row.event_id)]
+                row.save(using=target, force_insert=True)
+                model.objects.using(target).filter(id=row.id).update(created_at=created_at)
+
+    @staticmethod
+    def _same_payment(existing: Payment, payment: Payment) -> bool:
+        return (
+            existing.payload_hash == payment.payload_hash
+            and existing.created_at == payment.created_at
+            and existing.gross_amount == payment.gross_amount
+            and existing.currency == payment.currency
+        )
@@ -0,0 +1,41 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from app.services import ReconciliationService
+
+
+class Command(BaseCommand):
+    help = "Verifies stored payments: fee + net = gross, ledger total = net and exactly one payment_captured event."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--report", type=Path, default=Path("reconciliation_report.jsonl"))
+        parser.add_argument("--checkpoint", type=Path, default=Path("reconciliation_checkpoint.jsonl"))
+        parser.add_argument("--chunk-size", type=int, default=10_000, help="Payment ids per range (keep it fixed across resumed runs).")
+        parser.add_argument("--workers", type=int, default=1)
+        parser.add_argument("--max-seconds", type=float, default=None, help="Stop dispatching new ranges after this long; rerun to resume.")
+        parser.add_argument("--restart", action="store_true", help="Ignore and truncate an existing checkpoint and report.")
+
+    def handle(self, *args, **options):
+        if options["restart"]:
+            options["checkpoint"].unlink(missing_ok=True)
+            options["report"].unlink(missing_ok=True)
+
+        summary = ReconciliationService.reconcile(
+            report_path=options["report"],
+            checkpoint_path=options["checkpoint"],
+            chunk_size=options["chunk_size"],
+            workers=options["workers"],
+            max_seconds=options["max_seconds"],
+        )
+
+        self.stdout.write(
+            f"{summary.ranges} range(s) checked, {summary.skipped_ranges} skipped from checkpoint, "
+            f"{summary.payments} payment(s), {summary.discrepancies} discrepancy(ies)"
+        )
+        if not summary.completed:
+            self.stdout.write(self.style.WARNING("Time budget reached; rerun to resume from the checkpoint."))
+        elif summary.discrepancies:
+            self.stdout.write(self.style.ERROR(f"Discrepancies written to {options['report']}"))
+        else:
+            self.stdout.write(self.style.SUCCESS("Ledger reconciled"))
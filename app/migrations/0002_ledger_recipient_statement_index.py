@@ -0,0 +1,21 @@
+# Generated by Django 6.0.2 on 2026-10-19 11:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ledgerentry',
+            index=models.Index(fields=['recipient_id', '-created_at', '-id', 'amount', 'role', 'payment'], name='ledger_recipient_statement'),
+        ),
+        migrations.RemoveIndex(
+            model_name='ledgerentry',
+            name='ledger_entr_recipie_42c77e_idx',
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0.2 on 2026-10-19 11:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0002_ledger_recipient_statement_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboxevent',
+            name='payload_bin',
+            field=models.BinaryField(blank=True, help_text='Event payload (compact binary encoding, see EventCodec)', null=True),
+        ),
+        migrations.AlterField(
+            model_name='outboxevent',
+            name='payload',
+            field=models.JSONField(blank=True, help_text='Event payload (JSON encoding)', null=True),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 6.0.2 on 2026-10-19 11:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0003_outbox_payload_bin'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FxRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField(help_text='Snapshot version; every published set of rates gets a new one')),
+                ('currency', models.CharField(max_length=3)),
+                ('rate', models.DecimalField(decimal_places=10, help_text='Settlement currency units per one unit of `currency`', max_digits=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'fx_rates',
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name='ledgerentry',
+            name='ledger_recipient_statement',
+        ),
+        migrations.AddField(
+            model_name='ledgerentry',
+            name='currency',
+            field=models.CharField(default='BRL', max_length=3),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='fx_rate_version',
+            field=models.PositiveIntegerField(blank=True, help_text='FX snapshot version the settlement amount was converted with', null=True),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='settlement_net_amount',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='Net amount converted to the settlement currency', max_digits=12, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='ledgerentry',
+            index=models.Index(fields=['recipient_id', '-created_at', '-id', 'amount', 'role', 'payment', 'currency'], name='ledger_recipient_statement'),
+        ),
+        migrations.AddConstraint(
+            model_name='fxrate',
+            constraint=models.UniqueConstraint(fields=('version', 'currency'), name='fx_rate_version_currency'),
+        ),
+    ]
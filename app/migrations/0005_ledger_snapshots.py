@@ -0,0 +1,37 @@
+# Generated by Django 6.0.2 on 2026-10-19 12:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0004_multi_currency'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recipient_id', models.CharField(max_length=255)),
+                ('currency', models.CharField(max_length=3)),
+                ('watermark_entry_id', models.BigIntegerField(help_text='Every ledger entry of this recipient and currency with id <= watermark is included')),
+                ('watermark_at', models.DateTimeField(help_text='Latest created_at among the included entries')),
+                ('cumulative_amount', models.DecimalField(decimal_places=2, help_text='Sum of the included entries', max_digits=18)),
+                ('entry_count', models.PositiveBigIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'ledger_snapshots',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='ledgerentry',
+            index=models.Index(fields=['recipient_id', 'currency', 'id', 'created_at', 'amount'], name='ledger_recipient_delta'),
+        ),
+        migrations.AddConstraint(
+            model_name='ledgersnapshot',
+            constraint=models.UniqueConstraint(fields=('recipient_id', 'currency', 'watermark_entry_id'), name='ledger_snapshot_watermark'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 6.0.2 on 2026-10-19 13:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0005_ledger_snapshots'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboxevent',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, help_text='When a webhook dispatcher claimed the event; the claim expires after WEBHOOK_CLAIM_LEASE_SECONDS', null=True),
+        ),
+        migrations.AlterField(
+            model_name='outboxevent',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('dispatching', 'Dispatching'), ('published', 'Published')], default='pending', max_length=20),
+        ),
+        migrations.CreateModel(
+            name='WebhookSubscription',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url', models.URLField(max_length=500)),
+                ('secret', models.CharField(help_text='HMAC-SHA256 key used to sign every delivery', max_length=128)),
+                ('event_type', models.CharField(default='payment_captured', max_length=50)),
+                ('recipient_id', models.CharField(blank=True, default='', help_text='Only events with a receivable for this recipient; empty receives every event', max_length=255)),
+                ('active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'webhook_subscriptions',
+                'indexes': [models.Index(fields=['event_type', 'active'], name='webhook_sub_event_t_60a4e7_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='WebhookDeadLetter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subscription_id', models.BigIntegerField()),
+                ('url', models.URLField(max_length=500)),
+                ('attempts', models.PositiveIntegerField()),
+                ('last_status', models.PositiveSmallIntegerField(blank=True, help_text='HTTP status of the last attempt; empty when it never got a response', null=True)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('event', models.ForeignKey(db_column='event_id', on_delete=django.db.models.deletion.CASCADE, related_name='webhook_dead_letters', to='app.outboxevent')),
+            ],
+            options={
+                'db_table': 'webhook_dead_letters',
+                'indexes': [models.Index(fields=['subscription_id', 'created_at'], name='webhook_dea_subscri_fbcaa4_idx')],
+            },
+        ),
+    ]
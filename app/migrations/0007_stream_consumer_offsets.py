@@ -0,0 +1,27 @@
+# Generated by Django 6.0.2 on 2026-10-19 13:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0006_webhooks'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StreamConsumerOffset',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('consumer', models.CharField(max_length=100)),
+                ('shard', models.CharField(help_text='Database alias of the payment shard whose outbox is read', max_length=100)),
+                ('sequence', models.BigIntegerField(default=0, help_text='Last acknowledged outbox event id on this shard')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'stream_consumer_offsets',
+                'constraints': [models.UniqueConstraint(fields=('consumer', 'shard'), name='stream_consumer_shard')],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 6.0.2 on 2026-10-19 15:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0007_stream_consumer_offsets'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShardMove',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source_alias', models.CharField(max_length=100)),
+                ('source_payment_id', models.BigIntegerField()),
+                ('payment_id', models.BigIntegerField(help_text='Id of the payment on this shard')),
+                ('ledger_entry_ids', models.JSONField(default=dict, help_text='Source ledger entry id -> id on this shard')),
+                ('outbox_event_ids', models.JSONField(default=dict, help_text='Source outbox event id -> id (stream sequence) on this shard')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'shard_moves',
+                'indexes': [models.Index(fields=['payment_id'], name='shard_moves_payment_3bee67_idx')],
+                'constraints': [models.UniqueConstraint(fields=('source_alias', 'source_payment_id'), name='shard_move_source_payment')],
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 6.0.2 on 2026-10-19 17:40
+
+from django.db import migrations
+from django.db.models import F
+
+
+def backfill_settlement_net_amount(apps, schema_editor):
+    # Payments created before 0004 were all BRL, the settlement currency, so
+    # their settlement amount is the net amount itself.
+    Payment = apps.get_model('app', 'Payment')
+    Payment.objects.using(schema_editor.connection.alias).filter(
+        settlement_net_amount__isnull=True,
+        currency='BRL',
+    ).update(settlement_net_amount=F('net_amount'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0008_shard_moves'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_settlement_net_amount, migrations.RunPython.noop),
+    ]
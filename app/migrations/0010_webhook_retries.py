@@ -0,0 +1,33 @@
+# Generated by Django 6.0.2 on 2026-10-19 18:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0009_backfill_settlement_net_amount'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WebhookRetry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subscription_id', models.BigIntegerField()),
+                ('url', models.URLField(max_length=500)),
+                ('attempts', models.PositiveIntegerField(help_text='Attempts made so far')),
+                ('last_status', models.PositiveSmallIntegerField(blank=True, help_text='HTTP status of the last attempt; empty when it never got a response', null=True)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('next_attempt_at', models.DateTimeField()),
+                ('claimed_at', models.DateTimeField(blank=True, help_text='When a webhook dispatcher claimed the retry; the claim expires after WEBHOOK_CLAIM_LEASE_SECONDS', null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('event', models.ForeignKey(db_column='event_id', on_delete=django.db.models.deletion.CASCADE, related_name='webhook_retries', to='app.outboxevent')),
+            ],
+            options={
+                'db_table': 'webhook_retries',
+                'indexes': [models.Index(fields=['next_attempt_at'], name='webhook_ret_next_at_4be856_idx'), models.Index(fields=['claimed_at'], name='webhook_ret_claimed_9bce93_idx')],
+            },
+        ),
+    ]
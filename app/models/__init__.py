@@ -1,5 +1,12 @@
 from .payment import Payment
 from .ledger_entry import LedgerEntry
 from .outbox_event import OutboxEvent
+from .fx_rate import FxRate
+from .ledger_snapshot import LedgerSnapshot
+from .webhook_subscription import WebhookSubscription
+from .webhook_dead_letter import WebhookDeadLetter
+from .webhook_retry import WebhookRetry
+from .stream_consumer_offset import StreamConsumerOffset
+from .shard_move import ShardMove
 
-__all__ = ["Payment", "LedgerEntry", "OutboxEvent"]
+__all__ = ["Payment", "LedgerEntry", "OutboxEvent", "FxRate", "LedgerSnapshot", "WebhookSubscription", "WebhookDeadLetter", "WebhookRetry", "StreamConsumerOffset", "ShardMove"]
@@ -0,0 +1,25 @@
+from django.db import models
+
+class FxRate(models.Model):
+    version = models.PositiveIntegerField(
+        help_text="Snapshot version; every published set of rates gets a new one",
+    )
+
+    currency = models.CharField(max_length=3)
+
+    rate = models.DecimalField(
+        max_digits=20,
+        decimal_places=10,
+        help_text="Settlement currency units per one unit of `currency`",
+    )
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "fx_rates"
+        constraints = [
+            models.UniqueConstraint(fields=["version", "currency"], name="fx_rate_version_currency"),
+        ]
+
+    def __str__(self):
+        return f"FxRate v{self.version} - {self.currency} - {self.rate}"
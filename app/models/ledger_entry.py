@@ -26,13 +26,28 @@ class LedgerEntry(models.Model):
         help_text="Amount assigned to this recipient",
     )
 
+    currency = models.CharField(max_length=3, default="BRL")
+
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         db_table = "ledger_entries"
         indexes = [
             models.Index(fields=["payment"]),
-            models.Index(fields=["recipient_id"]),
+            # Statement reads (recipient, newest first) are served from this
+            # index alone: amount, role, payment and currency are trailing key
+            # columns so the scan never touches the table (INCLUDE is
+            # PostgreSQL-only).
+            models.Index(
+                fields=["recipient_id", "-created_at", "-id", "amount", "role", "payment", "currency"],
+                name="ledger_recipient_statement",
+            ),
+            # Balance reads add the entries newer than a LedgerSnapshot
+            # watermark: an id range per recipient and currency.
+            models.Index(
+                fields=["recipient_id", "currency", "id", "created_at", "amount"],
+                name="ledger_recipient_delta",
+            ),
         ]
 
     def __str__(self):
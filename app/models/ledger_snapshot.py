@@ -0,0 +1,36 @@
+from django.db import models
+
+class LedgerSnapshot(models.Model):
+    recipient_id = models.CharField(max_length=255)
+
+    currency = models.CharField(max_length=3)
+
+    watermark_entry_id = models.BigIntegerField(
+        help_text="Every ledger entry of this recipient and currency with id <= watermark is included",
+    )
+
+    watermark_at = models.DateTimeField(
+        help_text="Latest created_at among the included entries",
+    )
+
+    cumulative_amount = models.DecimalField(
+        max_digits=18,
+        decimal_places=2,
+        help_text="Sum of the included entries",
+    )
+
+    entry_count = models.PositiveBigIntegerField()
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "ledger_snapshots"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["recipient_id", "currency", "watermark_entry_id"],
+                name="ledger_snapshot_watermark",
+            ),
+        ]
+
+    def __str__(self):
+        return f"LedgerSnapshot {self.recipient_id} {self.currency} @ {self.watermark_entry_id}"
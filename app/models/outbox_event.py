@@ -5,6 +5,7 @@ from app.models import Payment
 class OutboxEvent(models.Model):
     class Status(models.TextChoices):
         PENDING = "pending", "Pending"
+        DISPATCHING = "dispatching", "Dispatching"
         PUBLISHED = "published", "Published"
 
     payment = models.ForeignKey(
@@ -20,7 +21,15 @@ class OutboxEvent(models.Model):
     )
 
     payload = models.JSONField(
-        help_text="Event payload",
+        null=True,
+        blank=True,
+        help_text="Event payload (JSON encoding)",
+    )
+
+    payload_bin = models.BinaryField(
+        null=True,
+        blank=True,
+        help_text="Event payload (compact binary encoding, see EventCodec)",
     )
 
     status = models.CharField(
@@ -32,6 +41,12 @@ class OutboxEvent(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     published_at = models.DateTimeField(null=True, blank=True)
 
+    claimed_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="When a webhook dispatcher claimed the event; the claim expires after WEBHOOK_CLAIM_LEASE_SECONDS",
+    )
+
     class Meta:
         db_table = "outbox_events"
         indexes = [
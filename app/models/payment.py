@@ -49,6 +49,20 @@ class Payment(models.Model):
 
     currency = models.CharField(max_length=3)
 
+    settlement_net_amount = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        help_text="Net amount converted to the settlement currency",
+    )
+
+    fx_rate_version = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="FX snapshot version the settlement amount was converted with",
+    )
+
     payload_hash = models.CharField(max_length=64)
 
     created_at = models.DateTimeField(auto_now_add=True)
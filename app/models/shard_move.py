@@ -0,0 +1,36 @@
+from django.db import models
+
+# Written on the target shard in the same transaction as the copy, so it both
+# proves the copy is complete and maps the moved rows' old ids to their new ones.
+class ShardMove(models.Model):
+    source_alias = models.CharField(max_length=100)
+
+    source_payment_id = models.BigIntegerField()
+
+    payment_id = models.BigIntegerField(
+        help_text="Id of the payment on this shard",
+    )
+
+    ledger_entry_ids = models.JSONField(
+        default=dict,
+        help_text="Source ledger entry id -> id on this shard",
+    )
+
+    outbox_event_ids = models.JSONField(
+        default=dict,
+        help_text="Source outbox event id -> id (stream sequence) on this shard",
+    )
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "shard_moves"
+        constraints = [
+            models.UniqueConstraint(fields=["source_alias", "source_payment_id"], name="shard_move_source_payment"),
+        ]
+        indexes = [
+            models.Index(fields=["payment_id"]),
+        ]
+
+    def __str__(self):
+        return f"ShardMove {self.source_alias}:{self.source_payment_id} -> {self.payment_id}"
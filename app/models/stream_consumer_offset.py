@@ -0,0 +1,25 @@
+from django.db import models
+
+class StreamConsumerOffset(models.Model):
+    consumer = models.CharField(max_length=100)
+
+    shard = models.CharField(
+        max_length=100,
+        help_text="Database alias of the payment shard whose outbox is read",
+    )
+
+    sequence = models.BigIntegerField(
+        default=0,
+        help_text="Last acknowledged outbox event id on this shard",
+    )
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "stream_consumer_offsets"
+        constraints = [
+            models.UniqueConstraint(fields=["consumer", "shard"], name="stream_consumer_shard"),
+        ]
+
+    def __str__(self):
+        return f"StreamConsumerOffset {self.consumer} {self.shard} @ {self.sequence}"
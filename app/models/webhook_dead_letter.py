@@ -0,0 +1,38 @@
+from django.db import models
+
+from app.models import OutboxEvent
+
+class WebhookDeadLetter(models.Model):
+    event = models.ForeignKey(
+        OutboxEvent,
+        on_delete=models.CASCADE,
+        related_name="webhook_dead_letters",
+        db_column="event_id",
+    )
+
+    # Subscriptions live in the default database while events live on the
+    # payment shards, so this is a plain id rather than a foreign key.
+    subscription_id = models.BigIntegerField()
+
+    url = models.URLField(max_length=500)
+
+    attempts = models.PositiveIntegerField()
+
+    last_status = models.PositiveSmallIntegerField(
+        null=True,
+        blank=True,
+        help_text="HTTP status of the last attempt; empty when it never got a response",
+    )
+
+    last_error = models.TextField(blank=True, default="")
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "webhook_dead_letters"
+        indexes = [
+            models.Index(fields=["subscription_id", "created_at"]),
+        ]
+
+    def __str__(self):
+        return f"WebhookDeadLetter {self.id} - event {self.event_id} -> {self.url}"
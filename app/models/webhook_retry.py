@@ -0,0 +1,48 @@
+from django.db import models
+
+from app.models import OutboxEvent
+
+class WebhookRetry(models.Model):
+    event = models.ForeignKey(
+        OutboxEvent,
+        on_delete=models.CASCADE,
+        related_name="webhook_retries",
+        db_column="event_id",
+    )
+
+    # Same as WebhookDeadLetter: subscriptions live in the default database.
+    subscription_id = models.BigIntegerField()
+
+    url = models.URLField(max_length=500)
+
+    attempts = models.PositiveIntegerField(
+        help_text="Attempts made so far",
+    )
+
+    last_status = models.PositiveSmallIntegerField(
+        null=True,
+        blank=True,
+        help_text="HTTP status of the last attempt; empty when it never got a response",
+    )
+
+    last_error = models.TextField(blank=True, default="")
+
+    next_attempt_at = models.DateTimeField()
+
+    claimed_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="When a webhook dispatcher claimed the retry; the claim expires after WEBHOOK_CLAIM_LEASE_SECONDS",
+    )
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "webhook_retries"
+        indexes = [
+            models.Index(fields=["next_attempt_at"]),
+            models.Index(fields=["claimed_at"]),
+        ]
+
+    def __str__(self):
+        return f"WebhookRetry {self.id} - event {self.event_id} -> {self.url} (attempt {self.attempts + 1})"
@@ -0,0 +1,34 @@
+from django.db import models
+
+class WebhookSubscription(models.Model):
+    url = models.URLField(max_length=500)
+
+    secret = models.CharField(
+        max_length=128,
+        help_text="HMAC-SHA256 key used to sign every delivery",
+    )
+
+    event_type = models.CharField(
+        max_length=50,
+        default="payment_captured",
+    )
+
+    recipient_id = models.CharField(
+        max_length=255,
+        blank=True,
+        default="",
+        help_text="Only events with a receivable for this recipient; empty receives every event",
+    )
+
+    active = models.BooleanField(default=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "webhook_subscriptions"
+        indexes = [
+            models.Index(fields=["event_type", "active"]),
+        ]
+
+    def __str__(self):
+        return f"WebhookSubscription {self.id} - {self.event_type} -> {self.url}"
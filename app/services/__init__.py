@@ -1,17 +1,89 @@
-from .calculation_service import (CalculationService, CalculationResult, UnsupportedPaymentMethod, InvalidInstallments)
-from .split_service import (SplitService, SplitInput, SplitResult, EmptySplitError, InvalidSplitPercentage)
-from .payment_service import (PaymentService, IdempotencyConflict)
-
-__all__ = [
-    "CalculationService",
-    "CalculationResult",
-    "UnsupportedPaymentMethod",
-    "InvalidInstallments",
-    "SplitService",
-    "SplitInput",
-    "SplitResult",
-    "EmptySplitError",
-    "InvalidSplitPercentage",
-    "PaymentService",
-    "IdempotencyConflict",
-]
+import importlib
+import sys
+
+# Services are imported on first access, so a worker only pays for the ones
+# its code path actually uses (e.g. group commit stays unloaded unless enabled).
+_EXPORTS = {
+    "Currency": ".currency_service",
+    "CurrencyService": ".currency_service",
+    "UnsupportedCurrency": ".currency_service",
+    "InvalidCurrencyAmount": ".currency_service",
+    "FxService": ".fx_service",
+    "FxRateSnapshot": ".fx_service",
+    "FxRateUnavailable": ".fx_service",
+    "CalculationService": ".calculation_service",
+    "CalculationResult": ".calculation_service",
+    "FeeSchedule": ".calculation_service",
+    "UnsupportedPaymentMethod": ".calculation_service",
+    "InvalidInstallments": ".calculation_service",
+    "SplitService": ".split_service",
+    "SplitInput": ".split_service",
+    "SplitResult": ".split_service",
+    "EmptySplitError": ".split_service",
+    "InvalidSplitPercentage": ".split_service",
+    "ShardService": ".shard_service",
+    "InvalidShardKey": ".shard_service",
+    "IdempotencyFilter": ".idempotency_filter",
+    "IdempotencyFilterStats": ".idempotency_filter",
+    "EventCodec": ".event_codec",
+    "EventEncodingError": ".event_codec",
+    "PaymentService": ".payment_service",
+    "IdempotencyConflict": ".payment_service",
+    "GroupCommitWriter": ".group_commit",
+    "PendingConfirm": ".group_commit",
+    "StatementService": ".statement_service",
+    "StatementPage": ".statement_service",
+    "StatementLine": ".statement_service",
+    "InvalidStatementCursor": ".statement_service",
+    "StatementCurrencyRequired": ".statement_service",
+    "ReconciliationService": ".reconciliation_service",
+    "ReconciliationRange": ".reconciliation_service",
+    "ReconciliationSummary": ".reconciliation_service",
+    "Discrepancy": ".reconciliation_service",
+    "LedgerSnapshotService": ".ledger_snapshot_service",
+    "SnapshotBuildResult": ".ledger_snapshot_service",
+    "SnapshotVerification": ".ledger_snapshot_service",
+    "SnapshotMismatch": ".ledger_snapshot_service",
+    "RecipientBalance": ".ledger_snapshot_service",
+    "WebhookDispatcher": ".webhook_dispatcher",
+    "WebhookDelivery": ".webhook_dispatcher",
+    "DeliveryOutcome": ".webhook_dispatcher",
+    "DispatchSummary": ".webhook_dispatcher",
+    "HttpConnectionPool": ".webhook_dispatcher",
+    "EventStreamService": ".event_stream_service",
+    "StreamEvent": ".event_stream_service",
+    "StreamBatch": ".event_stream_service",
+    "InvalidStreamCursor": ".event_stream_service",
+    "QuoteCache": ".quote_cache",
+    "CachedQuote": ".quote_cache",
+    "AdmissionService": ".admission_service",
+    "RateLimitBackend": ".admission_service",
+    "InMemoryRateLimitBackend": ".admission_service",
+    "CacheRateLimitBackend": ".admission_service",
+    "ConcurrencyLimiter": ".admission_service",
+    "RateLimited": ".admission_service",
+    "Overloaded": ".admission_service",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def loaded(name: str):
+    # The export if its service module was already imported, else None (for
+    # code that must not be the one to load it, e.g. exception translation).
+    module = sys.modules.get(__name__ + _EXPORTS[name])
+    return getattr(module, name) if module is not None else None
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,208 @@
+import math
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, Optional, Tuple, TypeVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+T = TypeVar("T")
+
+
+class RateLimitBackend:
+    def consume(self, key: str, *, rate: float, burst: int) -> float:
+        """Takes one token from `key`'s bucket; returns 0 on success, or the seconds until a token is available."""
+        raise NotImplementedError
+
+
+class InMemoryRateLimitBackend(RateLimitBackend):
+    def __init__(self, *, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def consume(self, key: str, *, rate: float, burst: int) -> float:
+        with self._lock:
+            now = self._clock()
+            tokens, updated_at = self._buckets.get(key, (float(burst), now))
+            tokens = min(float(burst), tokens + (now - updated_at) * rate)
+
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                return 0.0
+
+            self._buckets[key] = (tokens, now)
+            return (1 - tokens) / rate
+
+
+class CacheRateLimitBackend(RateLimitBackend):
+    # GCRA over a Django cache shared by every worker (e.g. Redis or
+    # Memcached): one "theoretical arrival time" per key. Each update holds a
+    # per-key lock taken with cache.add, which is atomic on every backend.
+    lock_timeout = 1
+    lock_wait = 0.05
+
+    def __init__(self, *, alias: str = "default", clock: Callable[[], float] = time.time):
+        self._cache = caches[alias]
+        self._clock = clock
+
+    def consume(self, key: str, *, rate: float, burst: int) -> float:
+        interval = 1 / rate
+        cache_key = f"admission:{key}"
+        lock_key = f"{cache_key}:lock"
+
+        deadline = time.monotonic() + self.lock_wait
+        while not self._cache.add(lock_key, 1, timeout=self.lock_timeout):
+            if time.monotonic() >= deadline:
+                # A lock held this long belongs to a worker that died mid-update
+                # (it expires after lock_timeout): reject rather than overshoot.
+                return interval
+            time.sleep(0.001)
+
+        try:
+            now = self._clock()
+            arrival = max(self._cache.get(cache_key, now), now)
+            allowed_at = arrival - burst * interval
+            if allowed_at > now - interval:
+                return allowed_at + interval - now
+
+            self._cache.set(cache_key, arrival + interval, timeout=math.ceil(burst * interval) + 1)
+            return 0.0
+        finally:
+            self._cache.delete(lock_key)
+
+
+class ConcurrencyLimiter:
+    def __init__(self, *, limit: int, per_key_limit: int):
+        self.limit = limit
+        self.per_key_limit = per_key_limit
+        self._active = 0
+        self._active_per_key: Counter = Counter()
+        self._condition = threading.Condition()
+
+    def acquire(self, key: str, *, timeout: float = 0) -> bool:
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while not self._available(key):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+
+            self._active += 1
+            self._active_per_key[key] += 1
+            return True
+
+    def release(self, key: str):
+        with self._condition:
+            self._active -= 1
+            self._active_per_key[key] -= 1
+            if not self._active_per_key[key]:
+                del self._active_per_key[key]
+            self._condition.notify_all()
+
+    def _available(self, key: str) -> bool:
+        return self._active < self.limit and self._active_per_key[key] < self.per_key_limit
+
+
+class AdmissionService:
+    _limiter: Optional[ConcurrencyLimiter] = None
+    _backend: Optional[RateLimitBackend] = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def run(cls, *, seller: str, operation: Callable[[], T], fallback: Callable[[], Optional[T]]) -> T:
+        if not settings.ADMISSION_CONTROL_ENABLED:
+            return operation()
+
+        # `fallback` answers requests that need no new write (idempotent
+        # replays) so they never wait behind, or get rejected with, new work.
+        wait = cls._rate_limit_wait(seller)
+        if wait > 0:
+            replay = fallback()
+            if replay is not None:
+                return replay
+            raise RateLimited("Too many payment confirmations, retry later", retry_after=wait)
+
+        limiter = cls.limiter()
+        if not limiter.acquire(seller):
+            replay = fallback()
+            if replay is not None:
+                return replay
+            if not limiter.acquire(seller, timeout=settings.ADMISSION_QUEUE_TIMEOUT_MS / 1000):
+                raise Overloaded(
+                    "Payment confirmation capacity exhausted, retry later",
+                    retry_after=settings.ADMISSION_RETRY_AFTER_SECONDS,
+                )
+
+        try:
+            return operation()
+        finally:
+            limiter.release(seller)
+
+    @classmethod
+    def limiter(cls) -> ConcurrencyLimiter:
+        if cls._limiter is None:
+            with cls._lock:
+                if cls._limiter is None:
+                    cls._limiter = ConcurrencyLimiter(
+                        limit=settings.ADMISSION_MAX_CONCURRENT,
+                        per_key_limit=settings.ADMISSION_MAX_CONCURRENT_PER_SELLER,
+                    )
+        return cls._limiter
+
+    @classmethod
+    def backend(cls) -> RateLimitBackend:
+        if cls._backend is None:
+            with cls._lock:
+                if cls._backend is None:
+                    cls._backend = import_string(settings.ADMISSION_RATE_LIMIT_BACKEND)()
+        return cls._backend
+
+    @classmethod
+    def reset(cls):
+        with cls._lock:
+            cls._limiter = None
+            cls._backend = None
+
+    @classmethod
+    def _rate_limit_wait(cls, seller: str) -> float:
+        backend = cls.backend()
+
+        # The seller's own bucket goes first: a seller over its limit is
+        # rejected without draining the global bucket everybody shares.
+        wait = backend.consume(
+            f"confirm:seller:{seller}",
+            rate=settings.ADMISSION_SELLER_RATE_PER_SECOND,
+            burst=settings.ADMISSION_SELLER_BURST,
+        )
+        if wait > 0:
+            return wait
+
+        return backend.consume(
+            "confirm",
+            rate=settings.ADMISSION_RATE_PER_SECOND,
+            burst=settings.ADMISSION_BURST,
+        )
+
+
+@receiver(setting_changed)
+def _reset_on_setting_changed(*, setting: str, **kwargs):
+    if setting.startswith("ADMISSION_"):
+        AdmissionService.reset()
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, message: str, *, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class RateLimited(AdmissionRejected):
+    pass
+
+class Overloaded(AdmissionRejected):
+    pass
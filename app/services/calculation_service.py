@@ -1,51 +1,118 @@
-from decimal import Decimal, ROUND_HALF_UP
+import hashlib
+import json
+import threading
+from decimal import Decimal
 from dataclasses import dataclass
+from typing import Optional
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
 
 from app.models import Payment
+from app.services import CurrencyService, FxService, FxRateSnapshot
 
 @dataclass(frozen=True)
 class CalculationResult:
     gross_amount: Decimal
     platform_fee_amount: Decimal
     net_amount: Decimal
+    currency: str
+    settlement_net_amount: Decimal
+    fx_rate_version: Optional[int]
+
+
+@dataclass(frozen=True)
+class FeeSchedule:
+    pix: Decimal
+    card_single: Decimal
+    card_installment_base: Decimal
+    card_per_extra_installment: Decimal
+    version: str
 
 
 class CalculationService:
+    _fee_schedule: Optional[FeeSchedule] = None
+    _lock = threading.Lock()
+
     @staticmethod
-    def calculate(*, amount: Decimal, payment_method: str, installments: int) -> CalculationResult:
+    def calculate(*, amount: Decimal, payment_method: str, installments: int, currency: str = "BRL", fx_snapshot: Optional[FxRateSnapshot] = None) -> CalculationResult:
+        currency = CurrencyService.get(currency)
+        CurrencyService.validate_amount(amount, currency)
+
         fee_rate = CalculationService._get_fee_rate(payment_method=payment_method, installments=installments)
 
-        platform_fee = (amount * fee_rate).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-        net_amount = (amount - platform_fee).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+        gross_amount = CurrencyService.quantize(amount, currency)
+        platform_fee = CurrencyService.quantize(gross_amount * fee_rate, currency)
+        net_amount = CurrencyService.quantize(gross_amount - platform_fee, currency)
+
+        # The snapshot is cached in-process, so quoting stays free of queries.
+        snapshot = fx_snapshot or FxService.snapshot()
 
         return CalculationResult(
-            gross_amount=amount,
+            gross_amount=gross_amount,
             platform_fee_amount=platform_fee,
             net_amount=net_amount,
+            currency=currency.code,
+            settlement_net_amount=FxService.to_settlement(net_amount, currency.code, snapshot=snapshot),
+            fx_rate_version=snapshot.version,
         )
 
+    @classmethod
+    def fee_schedule(cls) -> FeeSchedule:
+        schedule = cls._fee_schedule
+        if schedule is not None:
+            return schedule
+
+        with cls._lock:
+            if cls._fee_schedule is None:
+                rates = settings.PLATFORM_FEE_SCHEDULE
+                # The version is a digest of the rates themselves, so every
+                # process running the same schedule agrees on it.
+                digest = hashlib.sha256(json.dumps(rates, sort_keys=True).encode()).hexdigest()
+                cls._fee_schedule = FeeSchedule(
+                    pix=Decimal(rates["pix"]),
+                    card_single=Decimal(rates["card_single"]),
+                    card_installment_base=Decimal(rates["card_installment_base"]),
+                    card_per_extra_installment=Decimal(rates["card_per_extra_installment"]),
+                    version=digest[:16],
+                )
+            return cls._fee_schedule
+
+    @classmethod
+    def reset(cls):
+        with cls._lock:
+            cls._fee_schedule = None
+
     @staticmethod
     def _get_fee_rate(*, payment_method: str, installments: int) -> Decimal:
         method = payment_method.lower()
+        schedule = CalculationService.fee_schedule()
 
         if method == Payment.PaymentMethod.PIX:
             if installments != 1:
                 raise InvalidInstallments("PIX does not support installments")
-            return Decimal("0.00")
+            return schedule.pix
 
         if method == Payment.PaymentMethod.CARD:
             if installments < 1 or installments > 12:
                 raise InvalidInstallments("CARD installments must be between 1 and 12")
 
             if installments == 1:
-                return Decimal("0.0399")
+                return schedule.card_single
 
             extra_installments = installments - 1
-            return Decimal("0.0499") + (Decimal("0.02") * extra_installments)
+            return schedule.card_installment_base + (schedule.card_per_extra_installment * extra_installments)
 
         raise UnsupportedPaymentMethod(f"Unsupported payment method: {payment_method}")
 
 
+@receiver(setting_changed)
+def _reset_on_setting_changed(*, setting: str, **kwargs):
+    if setting == "PLATFORM_FEE_SCHEDULE":
+        CalculationService.reset()
+
+
 class UnsupportedPaymentMethod(Exception):
     pass
 
@@ -0,0 +1,57 @@
+from dataclasses import dataclass
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Optional
+
+
+@dataclass(frozen=True)
+class Currency:
+    code: str
+    minor_units: int
+    rounding: str = ROUND_HALF_UP
+
+    @property
+    def quantum(self) -> Decimal:
+        return Decimal(1).scaleb(-self.minor_units)
+
+
+# Amount columns have two decimal places, so only currencies with at most two
+# minor units can be registered here.
+CURRENCIES = {
+    currency.code: currency
+    for currency in [
+        Currency("BRL", 2),
+        Currency("USD", 2),
+        Currency("EUR", 2),
+        Currency("GBP", 2),
+        Currency("MXN", 2),
+        Currency("ARS", 2),
+        Currency("COP", 2),
+        Currency("CLP", 0),
+        Currency("JPY", 0),
+    ]
+}
+
+
+class CurrencyService:
+    @staticmethod
+    def get(code: str) -> Currency:
+        currency = CURRENCIES.get(code.upper())
+        if currency is None:
+            raise UnsupportedCurrency(f"Unsupported currency: {code}")
+        return currency
+
+    @staticmethod
+    def quantize(amount: Decimal, currency: Currency, *, rounding: Optional[str] = None) -> Decimal:
+        return amount.quantize(currency.quantum, rounding=rounding or currency.rounding)
+
+    @staticmethod
+    def validate_amount(amount: Decimal, currency: Currency):
+        if amount != amount.quantize(currency.quantum):
+            raise InvalidCurrencyAmount(f"{currency.code} amounts allow at most {currency.minor_units} decimal places")
+
+
+class UnsupportedCurrency(Exception):
+    pass
+
+class InvalidCurrencyAmount(Exception):
+    pass
@@ -0,0 +1,171 @@
+import struct
+from decimal import Decimal
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+
+from app.models import OutboxEvent
+from app.services import CurrencyService, UnsupportedCurrency
+
+JSON = "json"
+BINARY = "binary"
+ENCODINGS = (JSON, BINARY)
+
+VERSION = 2
+
+# Layout, big-endian:
+#   v1 header   B version, Q payment_id, q gross cents, q net cents, B receivable count
+#   v2 header   B version, 3s currency, B minor units, Q payment_id, q gross, q net, B receivable count
+#   receivable  B role code, [B role length, role], H recipient length, recipient, q amount
+# Amounts are integers in the currency's minor units (cents in v1, which is
+# BRL-only). Role code 0 means the role is spelled out right after it.
+_VERSION = struct.Struct(">B")
+_HEADER_V1 = struct.Struct(">BQqqB")
+_HEADER = struct.Struct(">B3sBQqqB")
+_ROLE_CODE = struct.Struct(">B")
+_LENGTH = struct.Struct(">H")
+_AMOUNT = struct.Struct(">q")
+
+ROLE_CODES = {"producer": 1, "affiliate": 2, "coproducer": 3}
+ROLES = {code: role for role, code in ROLE_CODES.items()}
+
+
+class EventCodec:
+    @staticmethod
+    def encode(payload: Dict[str, Any]) -> bytes:
+        try:
+            receivables = payload["receivables"]
+            currency = payload.get("currency")
+            if currency is None:
+                # Payloads written before multi-currency support are BRL and
+                # carry no currency key; v1 round-trips them unchanged.
+                minor_units = 2
+                parts = [_HEADER_V1.pack(
+                    1,
+                    int(payload["payment_id"]),
+                    EventCodec._to_minor(payload["gross_amount"], minor_units),
+                    EventCodec._to_minor(payload["net_amount"], minor_units),
+                    len(receivables),
+                )]
+            else:
+                minor_units = CurrencyService.get(currency).minor_units
+                parts = [_HEADER.pack(
+                    VERSION,
+                    currency.encode("ascii"),
+                    minor_units,
+                    int(payload["payment_id"]),
+                    EventCodec._to_minor(payload["gross_amount"], minor_units),
+                    EventCodec._to_minor(payload["net_amount"], minor_units),
+                    len(receivables),
+                )]
+
+            for receivable in receivables:
+                role = receivable["role"]
+                code = ROLE_CODES.get(role, 0)
+                parts.append(_ROLE_CODE.pack(code))
+                if code == 0:
+                    parts.append(EventCodec._pack_string(role, _ROLE_CODE))
+
+                parts.append(EventCodec._pack_string(receivable["recipient_id"], _LENGTH))
+                parts.append(_AMOUNT.pack(EventCodec._to_minor(receivable["amount"], minor_units)))
+        except (KeyError, TypeError, ValueError, ArithmeticError, UnicodeEncodeError, UnsupportedCurrency, struct.error) as exception:
+            raise EventEncodingError(f"Cannot encode payload: {exception}") from exception
+
+        return b"".join(parts)
+
+    @staticmethod
+    def decode(data: bytes) -> Dict[str, Any]:
+        data = bytes(data)
+        try:
+            (version,) = _VERSION.unpack_from(data)
+            if version == VERSION:
+                _, currency, minor_units, payment_id, gross, net, count = _HEADER.unpack_from(data)
+                currency = currency.decode("ascii")
+                offset = _HEADER.size
+            elif version == 1:
+                _, payment_id, gross, net, count = _HEADER_V1.unpack_from(data)
+                currency, minor_units = None, 2
+                offset = _HEADER_V1.size
+            else:
+                raise EventEncodingError(f"Unsupported event encoding version {version}")
+
+            receivables = []
+            for _ in range(count):
+                (code,) = _ROLE_CODE.unpack_from(data, offset)
+                offset += _ROLE_CODE.size
+                if code == 0:
+                    role, offset = EventCodec._unpack_string(data, offset, _ROLE_CODE)
+                else:
+                    role = ROLES[code]
+
+                recipient_id, offset = EventCodec._unpack_string(data, offset, _LENGTH)
+                (amount,) = _AMOUNT.unpack_from(data, offset)
+                offset += _AMOUNT.size
+
+                receivables.append({
+                    "recipient_id": recipient_id,
+                    "role": role,
+                    "amount": EventCodec._from_minor(amount, minor_units),
+                })
+        except (KeyError, UnicodeDecodeError, struct.error) as exception:
+            raise EventEncodingError(f"Cannot decode payload: {exception}") from exception
+
+        payload = {"payment_id": str(payment_id)}
+        if currency is not None:
+            payload["currency"] = currency
+        payload.update({
+            "gross_amount": EventCodec._from_minor(gross, minor_units),
+            "net_amount": EventCodec._from_minor(net, minor_units),
+            "receivables": receivables,
+        })
+        return payload
+
+    @staticmethod
+    def payload_of(outbox_event: OutboxEvent) -> Dict[str, Any]:
+        if outbox_event.payload_bin is not None:
+            return EventCodec.decode(outbox_event.payload_bin)
+        return outbox_event.payload
+
+    @staticmethod
+    def store(outbox_event: OutboxEvent, payload: Dict[str, Any], *, encoding: Optional[str] = None) -> OutboxEvent:
+        encoding = encoding or settings.OUTBOX_PAYLOAD_ENCODING
+        if encoding == BINARY:
+            outbox_event.payload = None
+            outbox_event.payload_bin = EventCodec.encode(payload)
+        elif encoding == JSON:
+            outbox_event.payload = payload
+            outbox_event.payload_bin = None
+        else:
+            raise EventEncodingError(f"Unknown outbox payload encoding {encoding!r}")
+        return outbox_event
+
+    @staticmethod
+    def _to_minor(value: Any, minor_units: int) -> int:
+        minor = Decimal(value).scaleb(minor_units)
+        if minor != minor.to_integral_value():
+            raise ValueError(f"{value} has more than {minor_units} decimal places")
+        return int(minor)
+
+    @staticmethod
+    def _from_minor(amount: int, minor_units: int) -> str:
+        if minor_units == 0:
+            return str(amount)
+        units, remainder = divmod(abs(amount), 10 ** minor_units)
+        return f"{'-' if amount < 0 else ''}{units}.{remainder:0{minor_units}d}"
+
+    @staticmethod
+    def _pack_string(value: str, length: struct.Struct) -> bytes:
+        encoded = value.encode()
+        return length.pack(len(encoded)) + encoded
+
+    @staticmethod
+    def _unpack_string(data: bytes, offset: int, length: struct.Struct):
+        (size,) = length.unpack_from(data, offset)
+        offset += length.size
+        if offset + size > len(data):
+            raise struct.error("string runs past the end of the payload")
+        return data[offset:offset + size].decode(), offset + size
+
+
+class EventEncodingError(Exception):
+    pass
@@ -0,0 +1,315 @@
+import asyncio
+import base64
+import bisect
+import json
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.dispatch import receiver
+from django.utils import timezone
+
+from app.models import OutboxEvent, StreamConsumerOffset
+from app.services import EventCodec, ShardService
+
+EARLIEST = "earliest"
+LATEST = "latest"
+
+
+@dataclass(frozen=True)
+class StreamEvent:
+    shard: str
+    sequence: int
+    type: str
+    payment_id: int
+    created_at: datetime
+    data: Dict[str, Any]
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "id": f"{self.shard}:{self.sequence}",
+            "shard": self.shard,
+            "sequence": self.sequence,
+            "type": self.type,
+            "payment_id": str(self.payment_id),
+            "created_at": self.created_at.isoformat(),
+            "data": self.data,
+        }
+
+
+@dataclass(frozen=True)
+class StreamBatch:
+    events: List[StreamEvent]
+    offsets: Dict[str, int]
+
+    @property
+    def cursor(self) -> str:
+        return EventStreamService.encode_cursor(self.offsets)
+
+
+@dataclass
+class _ShardTail:
+    head: int
+    # Every event with complete_after < sequence <= head is in `events`.
+    complete_after: int
+    events: List[StreamEvent] = field(default_factory=list)
+
+
+class EventStreamService:
+    _tails: Dict[str, _ShardTail] = {}
+    _refreshed_at = 0.0
+    _refreshing = threading.Lock()
+    _changed = threading.Condition()
+    # Long polls and streams currently holding a worker thread.
+    _connections = 0
+
+    @classmethod
+    def offsets(cls, *, cursor: Optional[str] = None, consumer: Optional[str] = None, start: str = EARLIEST) -> Dict[str, int]:
+        if cursor is not None:
+            offsets = cls.decode_cursor(cursor)
+        elif consumer is not None:
+            offsets = cls.consumer_offsets(consumer)
+        else:
+            offsets = {}
+
+        if start == LATEST and len(offsets) < len(ShardService.aliases()):
+            cls._refresh(force=True)
+        for alias in ShardService.aliases():
+            if alias not in offsets:
+                offsets[alias] = cls._tails[alias].head if start == LATEST else 0
+        return offsets
+
+    @classmethod
+    def poll(cls, offsets: Dict[str, int], *, limit: int = 100, wait: float = 0.0) -> StreamBatch:
+        deadline = time.monotonic() + wait
+        while True:
+            cls._refresh()
+            batch = cls._read(offsets, limit)
+            remaining = deadline - time.monotonic()
+            if batch.events or remaining <= 0:
+                return batch
+
+            # Waiters are woken as soon as any request thread's refresh finds
+            # new events; the timeout makes one of them refresh otherwise.
+            with cls._changed:
+                cls._changed.wait(min(remaining, settings.EVENT_STREAM_POLL_INTERVAL_MS / 1000))
+
+    @classmethod
+    def stream(cls, offsets: Dict[str, int], *, limit: int = 100, timeout: float = 300.0) -> Iterator[StreamBatch]:
+        # Yields every non-empty batch, and an empty one (a heartbeat carrying
+        # the cursor) when nothing arrived for EVENT_STREAM_HEARTBEAT_SECONDS.
+        deadline = time.monotonic() + timeout
+        while (remaining := deadline - time.monotonic()) > 0:
+            batch = cls.poll(offsets, limit=limit, wait=min(remaining, settings.EVENT_STREAM_HEARTBEAT_SECONDS))
+            offsets = batch.offsets
+            yield batch
+
+    @classmethod
+    async def apoll(cls, offsets: Dict[str, int], *, limit: int = 100, wait: float = 0.0) -> StreamBatch:
+        # poll() for the event loop: waits with asyncio.sleep instead of holding
+        # a thread, and only leaves the loop to refresh or to read the outbox.
+        deadline = time.monotonic() + wait
+        interval = settings.EVENT_STREAM_POLL_INTERVAL_MS / 1000
+        while True:
+            if time.monotonic() - cls._refreshed_at >= interval:
+                await sync_to_async(cls._refresh)()
+            if cls._has_news(offsets):
+                batch = await sync_to_async(cls._read)(offsets, limit)
+            else:
+                batch = StreamBatch(events=[], offsets=dict(offsets))
+
+            remaining = deadline - time.monotonic()
+            if batch.events or remaining <= 0:
+                return batch
+            await asyncio.sleep(min(remaining, interval))
+
+    @classmethod
+    async def astream(cls, offsets: Dict[str, int], *, limit: int = 100, timeout: float = 300.0) -> AsyncIterator[StreamBatch]:
+        deadline = time.monotonic() + timeout
+        while (remaining := deadline - time.monotonic()) > 0:
+            batch = await cls.apoll(offsets, limit=limit, wait=min(remaining, settings.EVENT_STREAM_HEARTBEAT_SECONDS))
+            offsets = batch.offsets
+            yield batch
+
+    @classmethod
+    def claim_connection(cls) -> bool:
+        # Caps the threads a process spends waiting for events, so long polls
+        # and WSGI streams cannot starve the payment endpoints.
+        with cls._changed:
+            if cls._connections >= settings.EVENT_STREAM_MAX_CONNECTIONS:
+                return False
+            cls._connections += 1
+            return True
+
+    @classmethod
+    def release_connection(cls):
+        with cls._changed:
+            cls._connections -= 1
+
+    @staticmethod
+    def consumer_offsets(consumer: str) -> Dict[str, int]:
+        return dict(StreamConsumerOffset.objects.filter(consumer=consumer).values_list("shard", "sequence"))
+
+    @staticmethod
+    def ack(consumer: str, offsets: Dict[str, int]) -> Dict[str, int]:
+        # Offsets only move forward, so a late or duplicated ack is harmless.
+        with transaction.atomic():
+            for shard, sequence in offsets.items():
+                offset, created = StreamConsumerOffset.objects.get_or_create(
+                    consumer=consumer,
+                    shard=shard,
+                    defaults={"sequence": sequence},
+                )
+                if not created:
+                    StreamConsumerOffset.objects.filter(pk=offset.pk, sequence__lt=sequence).update(
+                        sequence=sequence,
+                        updated_at=timezone.now(),
+                    )
+        return EventStreamService.consumer_offsets(consumer)
+
+    @staticmethod
+    def encode_cursor(offsets: Dict[str, int]) -> str:
+        raw = json.dumps(offsets, sort_keys=True, separators=(",", ":"))
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> Dict[str, int]:
+        try:
+            raw = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            offsets = {str(alias): int(sequence) for alias, sequence in raw.items()}
+        except (ValueError, TypeError, AttributeError) as exception:
+            raise InvalidStreamCursor("Invalid event stream cursor") from exception
+
+        aliases = ShardService.aliases()
+        if any(alias not in aliases or sequence < 0 for alias, sequence in offsets.items()):
+            raise InvalidStreamCursor("Invalid event stream cursor")
+        return offsets
+
+    @classmethod
+    def reset(cls):
+        with cls._changed:
+            cls._tails = {}
+            cls._refreshed_at = 0.0
+
+    @classmethod
+    def _refresh(cls, *, force: bool = False):
+        # At most one thread per process reads the outbox head per interval;
+        # everybody else reads the shared tail.
+        interval = settings.EVENT_STREAM_POLL_INTERVAL_MS / 1000
+        if not force and time.monotonic() - cls._refreshed_at < interval:
+            return
+        if not cls._refreshing.acquire(blocking=force):
+            return
+
+        try:
+            cutoff = timezone.now() - timedelta(milliseconds=settings.EVENT_STREAM_SETTLE_MS)
+            buffer_size = settings.EVENT_STREAM_BUFFER_SIZE
+            advanced = False
+
+            for alias in ShardService.aliases():
+                tail = cls._tails.get(alias)
+                if tail is None:
+                    head = (
+                        OutboxEvent.objects.using(alias)
+                        .filter(created_at__lte=cutoff)
+                        .order_by("-id")
+                        .values_list("id", flat=True)
+                        .first()
+                    ) or 0
+                    tail = _ShardTail(head=head, complete_after=head)
+
+                # Stop at the first unsettled event: a later id must never be
+                # published before an earlier one.
+                events = []
+                for row in OutboxEvent.objects.using(alias).filter(id__gt=tail.head).order_by("id")[:buffer_size]:
+                    if row.created_at > cutoff:
+                        break
+                    events.append(cls._to_event(alias, row))
+
+                with cls._changed:
+                    if events:
+                        tail.events.extend(events)
+                        tail.head = events[-1].sequence
+                        advanced = True
+                    if len(tail.events) > buffer_size:
+                        dropped = tail.events[:len(tail.events) - buffer_size]
+                        tail.events = tail.events[len(dropped):]
+                        tail.complete_after = dropped[-1].sequence
+                    cls._tails = {**cls._tails, alias: tail}
+
+            cls._refreshed_at = time.monotonic()
+            if advanced:
+                with cls._changed:
+                    cls._changed.notify_all()
+        finally:
+            cls._refreshing.release()
+
+    @classmethod
+    def _has_news(cls, offsets: Dict[str, int]) -> bool:
+        tails = cls._tails
+        return any(alias in tails and after < tails[alias].head for alias, after in offsets.items())
+
+    @classmethod
+    def _read(cls, offsets: Dict[str, int], limit: int) -> StreamBatch:
+        pending = {alias: cls._read_shard(alias, after, limit) for alias, after in offsets.items()}
+
+        # Interleave shards by created_at while keeping each shard in sequence
+        # order, so one shard's backlog cannot starve the others.
+        events: List[StreamEvent] = []
+        positions = dict.fromkeys(pending, 0)
+        offsets = dict(offsets)
+        while len(events) < limit:
+            candidates = [alias for alias, position in positions.items() if position < len(pending[alias])]
+            if not candidates:
+                break
+            alias = min(candidates, key=lambda alias: pending[alias][positions[alias]].created_at)
+            event = pending[alias][positions[alias]]
+            positions[alias] += 1
+            offsets[alias] = event.sequence
+            events.append(event)
+
+        return StreamBatch(events=events, offsets=offsets)
+
+    @classmethod
+    def _read_shard(cls, alias: str, after: int, limit: int) -> List[StreamEvent]:
+        tail = cls._tails.get(alias)
+        if tail is None or after >= tail.head:
+            return []
+
+        with cls._changed:
+            if after >= tail.complete_after:
+                start = bisect.bisect_right(tail.events, after, key=lambda event: event.sequence)
+                return tail.events[start:start + limit]
+
+        # A consumer behind the shared buffer reads its range by primary key.
+        return [
+            cls._to_event(alias, row)
+            for row in OutboxEvent.objects.using(alias).filter(id__gt=after, id__lte=tail.head).order_by("id")[:limit]
+        ]
+
+    @staticmethod
+    def _to_event(alias: str, row: OutboxEvent) -> StreamEvent:
+        return StreamEvent(
+            shard=alias,
+            sequence=row.id,
+            type=row.type,
+            payment_id=row.payment_id,
+            created_at=row.created_at,
+            data=EventCodec.payload_of(row),
+        )
+
+
+@receiver(setting_changed)
+def _reset_on_setting_changed(*, setting: str, **kwargs):
+    if setting.startswith("EVENT_STREAM_") or setting in ("PAYMENT_SHARDS", "DATABASES"):
+        EventStreamService.reset()
+
+
+class InvalidStreamCursor(Exception):
+    pass
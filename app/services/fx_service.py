@@ -0,0 +1,97 @@
+import threading
+import time
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.db.models import Max
+from django.dispatch import receiver
+
+from app.models import FxRate
+from app.services import CurrencyService
+
+
+@dataclass(frozen=True)
+class FxRateSnapshot:
+    version: Optional[int]
+    rates: Dict[str, Decimal]
+
+
+class FxService:
+    _snapshot: Optional[FxRateSnapshot] = None
+    _expires_at = 0.0
+    _lock = threading.Lock()
+
+    @classmethod
+    def snapshot(cls) -> FxRateSnapshot:
+        # Rates are read from the database at most once per TTL per process;
+        # every caller in between shares the same immutable snapshot.
+        snapshot = cls._snapshot
+        if snapshot is not None and time.monotonic() < cls._expires_at:
+            return snapshot
+
+        with cls._lock:
+            if cls._snapshot is None or time.monotonic() >= cls._expires_at:
+                cls._snapshot = cls._load()
+                cls._expires_at = time.monotonic() + settings.FX_RATE_CACHE_TTL_SECONDS
+            return cls._snapshot
+
+    @classmethod
+    def to_settlement(cls, amount: Decimal, currency: str, *, snapshot: Optional[FxRateSnapshot] = None) -> Decimal:
+        snapshot = snapshot or cls.snapshot()
+        settlement = CurrencyService.get(settings.SETTLEMENT_CURRENCY)
+        if currency == settlement.code:
+            return amount
+
+        rate = snapshot.rates.get(currency)
+        if rate is None:
+            raise FxRateUnavailable(f"No FX rate for {currency}")
+        return CurrencyService.quantize(amount * rate, settlement)
+
+    @classmethod
+    def publish(cls, rates: Dict[str, Decimal]) -> int:
+        for currency in rates:
+            CurrencyService.get(currency)
+
+        with transaction.atomic():
+            # A concurrent publisher picking the same version fails on the
+            # (version, currency) unique constraint.
+            latest = FxRate.objects.aggregate(version=Max("version"))["version"]
+            version = (latest or 0) + 1
+            FxRate.objects.bulk_create([
+                FxRate(version=version, currency=currency.upper(), rate=rate)
+                for currency, rate in rates.items()
+            ])
+
+        cls.reset()
+        return version
+
+    @classmethod
+    def reset(cls):
+        with cls._lock:
+            cls._snapshot = None
+            cls._expires_at = 0.0
+
+    @staticmethod
+    def _load() -> FxRateSnapshot:
+        version = FxRate.objects.aggregate(version=Max("version"))["version"]
+        if version is None:
+            return FxRateSnapshot(version=None, rates={})
+
+        return FxRateSnapshot(
+            version=version,
+            rates=dict(FxRate.objects.filter(version=version).values_list("currency", "rate")),
+        )
+
+
+@receiver(setting_changed)
+def _reset_on_setting_changed(*, setting: str, **kwargs):
+    if setting in ("FX_RATE_CACHE_TTL_SECONDS", "SETTLEMENT_CURRENCY"):
+        FxService.reset()
+
+
+class FxRateUnavailable(Exception):
+    pass
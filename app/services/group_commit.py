@@ -0,0 +1,192 @@
+import queue
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.db import IntegrityError, connections, transaction
+
+from app.models import Payment, LedgerEntry, OutboxEvent
+from app.services import CalculationResult, SplitInput, SplitResult, IdempotencyFilter, PaymentService
+
+
+@dataclass
+class PendingConfirm:
+    alias: str
+    idempotency_key: str
+    payload_hash: str
+    # As requested, not quantized: the payload hash is computed from it.
+    amount: Decimal
+    currency: str
+    payment_method: str
+    installments: int
+    splits: List[SplitInput]
+    calculation: CalculationResult
+    split_results: List[SplitResult]
+    future: Future = field(default_factory=Future)
+
+
+class GroupCommitWriter:
+    _instance: Optional["GroupCommitWriter"] = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, *, max_wait: float, max_batch_size: int):
+        self.max_wait = max_wait
+        self.max_batch_size = max_batch_size
+        self._queue: "queue.Queue[PendingConfirm]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="payment-group-commit", daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def instance(cls) -> "GroupCommitWriter":
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = cls(
+                        max_wait=settings.PAYMENT_GROUP_COMMIT_MAX_WAIT_MS / 1000,
+                        max_batch_size=settings.PAYMENT_GROUP_COMMIT_MAX_BATCH_SIZE,
+                    )
+        return cls._instance
+
+    def submit(self, pending: PendingConfirm):
+        self._queue.put(pending)
+        return pending.future.result()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            by_alias: Dict[str, List[PendingConfirm]] = defaultdict(list)
+            for pending in batch:
+                by_alias[pending.alias].append(pending)
+
+            for alias, items in by_alias.items():
+                try:
+                    self._commit(alias, items)
+                except Exception as exception:
+                    for pending in items:
+                        if not pending.future.done():
+                            pending.future.set_exception(exception)
+                finally:
+                    connections[alias].close_if_unusable_or_obsolete()
+
+    def _commit(self, alias: str, items: List[PendingConfirm]):
+        # The first request for a key is written; later ones in the same batch
+        # are answered as replays (or conflicts) once it is committed.
+        leaders: Dict[str, PendingConfirm] = {}
+        followers: List[PendingConfirm] = []
+        for pending in items:
+            if pending.idempotency_key in leaders:
+                followers.append(pending)
+            else:
+                leaders[pending.idempotency_key] = pending
+
+        keys_to_check = [key for key in leaders if IdempotencyFilter.might_exist(key)]
+        existing = {
+            payment.idempotency_key: payment
+            for payment in Payment.objects.using(alias).filter(idempotency_key__in=keys_to_check)
+        } if keys_to_check else {}
+
+        for key in keys_to_check:
+            if key not in existing:
+                IdempotencyFilter.record_false_positive()
+
+        new_items = [pending for key, pending in leaders.items() if key not in existing]
+
+        try:
+            results = self._insert(alias, new_items)
+        except IntegrityError:
+            # Another writer won a race on one of the keys: fall back to one
+            # transaction per item so each caller gets its own outcome.
+            for pending in new_items:
+                self._resolve_individually(pending)
+        else:
+            for pending in new_items:
+                pending.future.set_result(results[pending.idempotency_key])
+
+        for key, payment in existing.items():
+            self._resolve(leaders[key], lambda pending=leaders[key], payment=payment: PaymentService._replay(
+                alias=alias,
+                existing=payment,
+                payload_hash=pending.payload_hash,
+            ))
+
+        for pending in followers:
+            self._resolve_individually(pending)
+
+    def _insert(self, alias: str, items: List[PendingConfirm]) -> Dict:
+        if not items:
+            return {}
+
+        with transaction.atomic(using=alias):
+            payments = Payment.objects.using(alias).bulk_create([
+                PaymentService._build_payment(
+                    idempotency_key=pending.idempotency_key,
+                    currency=pending.currency,
+                    payment_method=pending.payment_method,
+                    installments=pending.installments,
+                    payload_hash=pending.payload_hash,
+                    calculation=pending.calculation,
+                )
+                for pending in items
+            ])
+
+            ledger_entries_per_item = [
+                PaymentService._build_ledger_entries(payment=payment, split_results=pending.split_results)
+                for payment, pending in zip(payments, items)
+            ]
+            LedgerEntry.objects.using(alias).bulk_create(
+                [ledger_entry for ledger_entries in ledger_entries_per_item for ledger_entry in ledger_entries]
+            )
+
+            outbox_events = [
+                PaymentService._build_outbox_event(payment=payment, split_results=pending.split_results)
+                for payment, pending in zip(payments, items)
+            ]
+            OutboxEvent.objects.using(alias).bulk_create(outbox_events)
+
+        results = {}
+        for payment, ledger_entries, outbox_event in zip(payments, ledger_entries_per_item, outbox_events):
+            IdempotencyFilter.add(payment.idempotency_key)
+            results[payment.idempotency_key] = PaymentService._to_result(
+                payment=payment,
+                ledger_entries=ledger_entries,
+                outbox_event=outbox_event,
+            )
+        return results
+
+    def _resolve_individually(self, pending: PendingConfirm):
+        def confirm():
+            with transaction.atomic(using=pending.alias):
+                return PaymentService._confirm_payment(
+                    alias=pending.alias,
+                    idempotency_key=pending.idempotency_key,
+                    amount=pending.amount,
+                    currency=pending.currency,
+                    payment_method=pending.payment_method,
+                    installments=pending.installments,
+                    splits=pending.splits,
+                )
+
+        self._resolve(pending, confirm)
+
+    @staticmethod
+    def _resolve(pending: PendingConfirm, produce):
+        try:
+            pending.future.set_result(produce())
+        except Exception as exception:
+            pending.future.set_exception(exception)
@@ -0,0 +1,141 @@
+import hashlib
+import math
+import threading
+from dataclasses import dataclass
+from typing import Optional
+
+from django.conf import settings
+
+from app.models import Payment
+from app.services import ShardService
+
+
+@dataclass(frozen=True)
+class IdempotencyFilterStats:
+    keys: int
+    checks: int
+    negatives: int
+    false_positives: int
+    false_positive_rate: float
+    estimated_false_positive_rate: float
+    memory_bytes: int
+
+
+class BloomFilter:
+    def __init__(self, *, capacity: int, error_rate: float):
+        if capacity <= 0 or not (0 < error_rate < 1):
+            raise ValueError("capacity must be positive and error_rate must be between 0 and 1")
+
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def add(self, key: str):
+        positions = self._positions(key)
+        with self._lock:
+            for position in positions:
+                self.bits[position >> 3] |= 1 << (position & 7)
+            self.count += 1
+
+    def might_contain(self, key: str) -> bool:
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+    def estimated_false_positive_rate(self) -> float:
+        return (1 - math.exp(-self.hash_count * self.count / self.size)) ** self.hash_count
+
+    def _positions(self, key: str) -> list[int]:
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return [(first + index * second) % self.size for index in range(self.hash_count)]
+
+
+class IdempotencyFilter:
+    _filter: Optional[BloomFilter] = None
+    _lock = threading.Lock()
+    _checks = 0
+    _negatives = 0
+    _false_positives = 0
+
+    @classmethod
+    def get(cls) -> Optional[BloomFilter]:
+        if not settings.IDEMPOTENCY_FILTER_ENABLED:
+            return None
+        if cls._filter is None:
+            cls.warm_up()
+        return cls._filter
+
+    @classmethod
+    def warm_up(cls):
+        if not settings.IDEMPOTENCY_FILTER_ENABLED:
+            return
+
+        with cls._lock:
+            if cls._filter is not None:
+                return
+
+            bloom_filter = BloomFilter(
+                capacity=settings.IDEMPOTENCY_FILTER_CAPACITY,
+                error_rate=settings.IDEMPOTENCY_FILTER_ERROR_RATE,
+            )
+            for alias in ShardService.aliases():
+                keys = (
+                    Payment.objects.using(alias)
+                    .values_list("idempotency_key", flat=True)
+                    .iterator(chunk_size=settings.IDEMPOTENCY_FILTER_WARM_CHUNK_SIZE)
+                )
+                for key in keys:
+                    bloom_filter.add(key)
+
+            cls._filter = bloom_filter
+
+    @classmethod
+    def might_exist(cls, idempotency_key: str) -> bool:
+        bloom_filter = cls.get()
+        if bloom_filter is None:
+            return True
+
+        cls._checks += 1
+        if bloom_filter.might_contain(idempotency_key):
+            return True
+
+        cls._negatives += 1
+        return False
+
+    @classmethod
+    def add(cls, idempotency_key: str):
+        bloom_filter = cls.get()
+        if bloom_filter is not None:
+            bloom_filter.add(idempotency_key)
+
+    @classmethod
+    def record_false_positive(cls):
+        cls._false_positives += 1
+
+    @classmethod
+    def stats(cls) -> Optional[IdempotencyFilterStats]:
+        bloom_filter = cls._filter
+        if bloom_filter is None:
+            return None
+
+        absent_keys = cls._negatives + cls._false_positives
+        return IdempotencyFilterStats(
+            keys=bloom_filter.count,
+            checks=cls._checks,
+            negatives=cls._negatives,
+            false_positives=cls._false_positives,
+            false_positive_rate=cls._false_positives / absent_keys if absent_keys else 0.0,
+            estimated_false_positive_rate=bloom_filter.estimated_false_positive_rate(),
+            memory_bytes=len(bloom_filter.bits),
+        )
+
+    @classmethod
+    def reset(cls):
+        with cls._lock:
+            cls._filter = None
+            cls._checks = 0
+            cls._negatives = 0
+            cls._false_positives = 0
@@ -0,0 +1,215 @@
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import Count, Max, OuterRef, Subquery, Sum
+from django.utils import timezone
+
+from app.models import LedgerEntry, LedgerSnapshot
+from app.services import ShardService
+
+CENTS = Decimal("0.01")
+LOOKUP_BATCH_SIZE = 500
+
+
+@dataclass(frozen=True)
+class SnapshotBuildResult:
+    alias: str
+    steps: int
+    entries: int
+    snapshots: int
+    watermark_entry_id: int
+
+
+@dataclass(frozen=True)
+class SnapshotMismatch:
+    alias: str
+    recipient_id: str
+    currency: str
+    watermark_entry_id: int
+    expected_amount: Decimal
+    actual_amount: Decimal
+    expected_count: int
+    actual_count: int
+
+
+@dataclass(frozen=True)
+class SnapshotVerification:
+    checked: int
+    mismatches: List[SnapshotMismatch]
+
+
+@dataclass(frozen=True)
+class RecipientBalance:
+    recipient_id: str
+    currency: str
+    as_of: Optional[datetime]
+    balance: Decimal
+    delta_entries: int
+
+
+class LedgerSnapshotService:
+    @staticmethod
+    def build(*, alias: str, chunk_size: int = 50_000, step_size: int = 1_000_000, safety_lag: timedelta = timedelta(minutes=5)) -> SnapshotBuildResult:
+        # Entries younger than the safety lag are left for the next run, so a
+        # transaction still in flight cannot commit an id below the watermark.
+        cutoff = timezone.now() - safety_lag
+        target = LedgerEntry.objects.using(alias).filter(created_at__lte=cutoff).aggregate(id=Max("id"))["id"] or 0
+        done = LedgerSnapshot.objects.using(alias).aggregate(id=Max("watermark_entry_id"))["id"] or 0
+
+        steps = entries = snapshots = 0
+        while done < target:
+            step_end = min(target, done + step_size)
+
+            totals: Dict[Tuple[str, str], list] = {}
+            for low in range(done, step_end, chunk_size):
+                rows = (
+                    LedgerEntry.objects.using(alias)
+                    .filter(id__gt=low, id__lte=min(step_end, low + chunk_size))
+                    .values("recipient_id", "currency")
+                    .annotate(total=Sum("amount"), entries=Count("id"), last_at=Max("created_at"))
+                    .values_list("recipient_id", "currency", "total", "entries", "last_at")
+                )
+                for recipient_id, currency, total, count, last_at in rows:
+                    current = totals.setdefault((recipient_id, currency), [Decimal("0.00"), 0, last_at])
+                    current[0] += Decimal(total)
+                    current[1] += count
+                    current[2] = max(current[2], last_at)
+
+            # One transaction per step: the shard's highest watermark is where
+            # the next step resumes, so a step is either fully written or not at all.
+            with transaction.atomic(using=alias):
+                previous = LedgerSnapshotService._latest(alias, list(totals))
+                LedgerSnapshot.objects.using(alias).bulk_create([
+                    LedgerSnapshotService._next(key, previous.get(key), total, count, last_at, step_end)
+                    for key, (total, count, last_at) in totals.items()
+                ], batch_size=LOOKUP_BATCH_SIZE)
+
+            steps += 1
+            entries += sum(count for _, count, _ in totals.values())
+            snapshots += len(totals)
+            done = step_end
+
+        return SnapshotBuildResult(alias=alias, steps=steps, entries=entries, snapshots=snapshots, watermark_entry_id=done)
+
+    @staticmethod
+    def verify(*, alias: str, chunk_size: int = 1_000) -> SnapshotVerification:
+        checked = 0
+        mismatches: List[SnapshotMismatch] = []
+
+        last_id = 0
+        while True:
+            batch = list(
+                LedgerSnapshot.objects.using(alias)
+                .filter(id__gt=last_id)
+                .order_by("id")[:chunk_size]
+            )
+            if not batch:
+                break
+            last_id = batch[-1].id
+
+            for snapshot in batch:
+                raw = LedgerEntry.objects.using(alias).filter(
+                    recipient_id=snapshot.recipient_id,
+                    currency=snapshot.currency,
+                    id__lte=snapshot.watermark_entry_id,
+                ).aggregate(total=Sum("amount"), entries=Count("id"))
+                amount = Decimal(raw["total"] or 0).quantize(CENTS)
+
+                checked += 1
+                if amount != snapshot.cumulative_amount or raw["entries"] != snapshot.entry_count:
+                    mismatches.append(SnapshotMismatch(
+                        alias=alias,
+                        recipient_id=snapshot.recipient_id,
+                        currency=snapshot.currency,
+                        watermark_entry_id=snapshot.watermark_entry_id,
+                        expected_amount=amount,
+                        actual_amount=snapshot.cumulative_amount,
+                        expected_count=raw["entries"],
+                        actual_count=snapshot.entry_count,
+                    ))
+
+        return SnapshotVerification(checked=checked, mismatches=mismatches)
+
+    @staticmethod
+    def rebuild(*, alias: str, **options) -> SnapshotBuildResult:
+        LedgerSnapshot.objects.using(alias).all().delete()
+        return LedgerSnapshotService.build(alias=alias, **options)
+
+    @staticmethod
+    def balance(*, recipient_id: str, currency: str = "BRL", as_of: Optional[datetime] = None, inclusive: bool = True) -> RecipientBalance:
+        # inclusive=False leaves out entries created exactly at as_of, for
+        # half-open periods such as statements.
+        per_shard = ShardService.fan_out(
+            lambda alias: LedgerSnapshotService._shard_balance(alias, recipient_id, currency, as_of, inclusive),
+        )
+
+        return RecipientBalance(
+            recipient_id=recipient_id,
+            currency=currency,
+            as_of=as_of,
+            balance=sum((balance for balance, _ in per_shard.values()), Decimal("0.00")),
+            delta_entries=sum(entries for _, entries in per_shard.values()),
+        )
+
+    @staticmethod
+    def _shard_balance(alias: str, recipient_id: str, currency: str, as_of: Optional[datetime], inclusive: bool = True) -> Tuple[Decimal, int]:
+        # Latest snapshot whose entries all precede as_of, plus the entries
+        # after its watermark (read through the ledger_recipient_delta index).
+        snapshots = LedgerSnapshot.objects.using(alias).filter(recipient_id=recipient_id, currency=currency)
+        delta = LedgerEntry.objects.using(alias).filter(recipient_id=recipient_id, currency=currency)
+        if as_of is not None:
+            lookup = "lte" if inclusive else "lt"
+            snapshots = snapshots.filter(**{f"watermark_at__{lookup}": as_of})
+            delta = delta.filter(**{f"created_at__{lookup}": as_of})
+
+        snapshot = snapshots.order_by("-watermark_entry_id").first()
+        if snapshot is not None:
+            delta = delta.filter(id__gt=snapshot.watermark_entry_id)
+
+        totals = delta.aggregate(total=Sum("amount"), entries=Count("id"))
+        balance = Decimal(totals["total"] or 0).quantize(CENTS)
+        if snapshot is not None:
+            balance += snapshot.cumulative_amount
+        return balance, totals["entries"]
+
+    @staticmethod
+    def _latest(alias: str, keys: List[Tuple[str, str]]) -> Dict[Tuple[str, str], LedgerSnapshot]:
+        newest = (
+            LedgerSnapshot.objects.using(alias)
+            .filter(recipient_id=OuterRef("recipient_id"), currency=OuterRef("currency"))
+            .order_by("-watermark_entry_id")
+            .values("watermark_entry_id")[:1]
+        )
+
+        latest: Dict[Tuple[str, str], LedgerSnapshot] = {}
+        recipients = sorted({recipient_id for recipient_id, _ in keys})
+        for start in range(0, len(recipients), LOOKUP_BATCH_SIZE):
+            for snapshot in LedgerSnapshot.objects.using(alias).filter(
+                recipient_id__in=recipients[start:start + LOOKUP_BATCH_SIZE],
+                watermark_entry_id=Subquery(newest),
+            ):
+                latest[(snapshot.recipient_id, snapshot.currency)] = snapshot
+        return latest
+
+    @staticmethod
+    def _next(key: Tuple[str, str], previous: Optional[LedgerSnapshot], total: Decimal, count: int, last_at: datetime, watermark_entry_id: int) -> LedgerSnapshot:
+        recipient_id, currency = key
+        cumulative_amount = total.quantize(CENTS)
+        entry_count = count
+        watermark_at = last_at
+        if previous is not None:
+            cumulative_amount += previous.cumulative_amount
+            entry_count += previous.entry_count
+            watermark_at = max(watermark_at, previous.watermark_at)
+
+        return LedgerSnapshot(
+            recipient_id=recipient_id,
+            currency=currency,
+            watermark_entry_id=watermark_entry_id,
+            watermark_at=watermark_at,
+            cumulative_amount=cumulative_amount,
+            entry_count=entry_count,
+        )
@@ -1,12 +1,13 @@
 import json
 import hashlib
-from django.db import transaction
+from django.conf import settings
+from django.db import IntegrityError, transaction
 from dataclasses import dataclass
 from decimal import Decimal
-from typing import List, Any
+from typing import List, Any, Optional
 
 from app.models import Payment, LedgerEntry, OutboxEvent
-from app.services import CalculationService, SplitService, SplitInput
+from app.services import CalculationService, CalculationResult, SplitService, SplitInput, SplitResult, ShardService, IdempotencyFilter, EventCodec
 
 @dataclass(frozen=True)
 class ReceivableDTO:
@@ -26,124 +27,245 @@ class PaymentResultDTO:
     gross_amount: Decimal
     platform_fee_amount: Decimal
     net_amount: Decimal
+    currency: str
+    settlement_net_amount: Optional[Decimal]
+    fx_rate_version: Optional[int]
     receivables: List[ReceivableDTO]
     outbox_event: OutboxEventDTO
 
 
 class PaymentService:
     @staticmethod
-    @transaction.atomic
     def confirm_payment(*, idempotency_key: str, amount: Decimal, currency: str, payment_method: str, installments: int, splits: list[SplitInput]) -> PaymentResultDTO:
-        payload = {
-            "amount": amount,
-            "currency": currency,
-            "payment_method": payment_method,
-            "installments": installments,
-            "splits": [
-                {
-                    "recipient_id": split.recipient_id,
-                    "role": split.role,
-                    "percent": split.percent,
-                }
-                for split in splits
-            ],
-        }
-        payload_hash = PaymentService._generate_payload_hash(payload)
+        alias = ShardService.shard_for(idempotency_key=idempotency_key, recipients=splits)
 
-        existing = Payment.objects.filter(
+        if settings.PAYMENT_GROUP_COMMIT_ENABLED:
+            return PaymentService._confirm_payment_grouped(
+                alias=alias,
+                idempotency_key=idempotency_key,
+                amount=amount,
+                currency=currency,
+                payment_method=payment_method,
+                installments=installments,
+                splits=splits,
+            )
+
+        with transaction.atomic(using=alias):
+            return PaymentService._confirm_payment(
+                alias=alias,
+                idempotency_key=idempotency_key,
+                amount=amount,
+                currency=currency,
+                payment_method=payment_method,
+                installments=installments,
+                splits=splits,
+            )
+
+    @staticmethod
+    def find_replay(*, idempotency_key: str, amount: Decimal, currency: str, payment_method: str, installments: int, splits: list[SplitInput]) -> Optional[PaymentResultDTO]:
+        # Asked for every request admission control is about to shed: without
+        # the Bloom filter each would cost a SELECT, exactly when the database
+        # has no room for it, so only keys the filter may have seen are looked up.
+        if IdempotencyFilter.get() is None or not IdempotencyFilter.might_exist(idempotency_key):
+            return None
+
+        alias = ShardService.shard_for(idempotency_key=idempotency_key, recipients=splits)
+        existing = Payment.objects.using(alias).filter(
             idempotency_key=idempotency_key
         ).first()
+        if existing is None:
+            return None
 
-        if existing:
-            if existing.payload_hash != payload_hash:
-                raise IdempotencyConflict("Idempotency-Key reused with different payload")
+        payload_hash = PaymentService._payload_hash_for(
+            amount=amount,
+            currency=currency,
+            payment_method=payment_method,
+            installments=installments,
+            splits=splits,
+        )
+        return PaymentService._replay(alias=alias, existing=existing, payload_hash=payload_hash)
 
-            ledger_entries = LedgerEntry.objects.filter(payment_id=existing.id)
-            outbox_event = (
-                existing.outbox_events
-                .order_by("-created_at")
-                .first()
-            )
+    @staticmethod
+    def _confirm_payment(*, alias: str, idempotency_key: str, amount: Decimal, currency: str, payment_method: str, installments: int, splits: list[SplitInput]) -> PaymentResultDTO:
+        payload_hash = PaymentService._payload_hash_for(
+            amount=amount,
+            currency=currency,
+            payment_method=payment_method,
+            installments=installments,
+            splits=splits,
+        )
 
-            return PaymentResultDTO(
-                payment_id=str(existing.id),
-                status=existing.status,
-                gross_amount=existing.gross_amount,
-                platform_fee_amount=existing.platform_fee_amount,
-                net_amount=existing.net_amount,
-                receivables=[
-                    ReceivableDTO(
-                        recipient_id=ledger_entry.recipient_id,
-                        role=ledger_entry.role,
-                        amount=ledger_entry.amount,
-                    ) for ledger_entry in ledger_entries
-                ],
-                outbox_event=OutboxEventDTO(
-                    type=outbox_event.type,
-                    status=outbox_event.status,
-                ),
-            )
+        if IdempotencyFilter.might_exist(idempotency_key):
+            existing = Payment.objects.using(alias).filter(
+                idempotency_key=idempotency_key
+            ).first()
+
+            if existing:
+                return PaymentService._replay(alias=alias, existing=existing, payload_hash=payload_hash)
+
+            IdempotencyFilter.record_false_positive()
 
         calculation = CalculationService.calculate(
             amount=amount,
             payment_method=payment_method,
             installments=installments,
+            currency=currency,
         )
 
         split_results = SplitService.calculate(
             net_amount=calculation.net_amount,
             splits=splits,
+            currency=currency,
+        )
+
+        payment = PaymentService._build_payment(
+            idempotency_key=idempotency_key,
+            currency=currency,
+            payment_method=payment_method,
+            installments=installments,
+            payload_hash=payload_hash,
+            calculation=calculation,
         )
 
-        payment = Payment.objects.create(
+        try:
+            with transaction.atomic(using=alias):
+                payment.save(using=alias, force_insert=True)
+        except IntegrityError:
+            # Skipped (or raced) pre-read: the unique constraint caught a key
+            # that already exists, so answer it as a replay.
+            existing = Payment.objects.using(alias).filter(
+                idempotency_key=idempotency_key
+            ).first()
+            if existing is None:
+                raise
+            IdempotencyFilter.add(idempotency_key)
+            return PaymentService._replay(alias=alias, existing=existing, payload_hash=payload_hash)
+
+        IdempotencyFilter.add(idempotency_key)
+
+        ledger_entries = LedgerEntry.objects.using(alias).bulk_create(
+            PaymentService._build_ledger_entries(payment=payment, split_results=split_results)
+        )
+
+        outbox_event = PaymentService._build_outbox_event(payment=payment, split_results=split_results)
+        outbox_event.save(using=alias, force_insert=True)
+
+        return PaymentService._to_result(payment=payment, ledger_entries=ledger_entries, outbox_event=outbox_event)
+
+    @staticmethod
+    def _confirm_payment_grouped(*, alias: str, idempotency_key: str, amount: Decimal, currency: str, payment_method: str, installments: int, splits: list[SplitInput]) -> PaymentResultDTO:
+        from app.services.group_commit import GroupCommitWriter, PendingConfirm
+
+        calculation = CalculationService.calculate(
+            amount=amount,
+            payment_method=payment_method,
+            installments=installments,
+            currency=currency,
+        )
+
+        return GroupCommitWriter.instance().submit(PendingConfirm(
+            alias=alias,
+            idempotency_key=idempotency_key,
+            payload_hash=PaymentService._payload_hash_for(
+                amount=amount,
+                currency=currency,
+                payment_method=payment_method,
+                installments=installments,
+                splits=splits,
+            ),
+            amount=amount,
+            currency=currency,
+            payment_method=payment_method,
+            installments=installments,
+            splits=splits,
+            calculation=calculation,
+            split_results=SplitService.calculate(
+                net_amount=calculation.net_amount,
+                splits=splits,
+                currency=currency,
+            ),
+        ))
+
+    @staticmethod
+    def _payload_hash_for(*, amount: Decimal, currency: str, payment_method: str, installments: int, splits: list[SplitInput]) -> str:
+        payload = {
+            "amount": amount,
+            "currency": currency,
+            "payment_method": payment_method,
+            "installments": installments,
+            "splits": [
+                {
+                    "recipient_id": split.recipient_id,
+                    "role": split.role,
+                    "percent": split.percent,
+                }
+                for split in splits
+            ],
+        }
+        return PaymentService._generate_payload_hash(payload)
+
+    @staticmethod
+    def _build_payment(*, idempotency_key: str, currency: str, payment_method: str, installments: int, payload_hash: str, calculation: CalculationResult) -> Payment:
+        return Payment(
             status=Payment.Status.CAPTURED,
             payment_method=payment_method,
             idempotency_key=idempotency_key,
             gross_amount=calculation.gross_amount,
             platform_fee_amount=calculation.platform_fee_amount,
             net_amount=calculation.net_amount,
+            settlement_net_amount=calculation.settlement_net_amount,
+            fx_rate_version=calculation.fx_rate_version,
             installments=installments,
             payload_hash=payload_hash,
-            currency=currency,
+            currency=calculation.currency,
         )
 
-        ledger_entries = LedgerEntry.objects.bulk_create(
-            [
-                LedgerEntry(
-                    payment_id=payment.id,
-                    recipient_id=split.recipient_id,
-                    role=split.role,
-                    amount=split.amount,
-                )
-                for split in split_results
-            ]
-        )
+    @staticmethod
+    def _build_ledger_entries(*, payment: Payment, split_results: List[SplitResult]) -> List[LedgerEntry]:
+        return [
+            LedgerEntry(
+                payment_id=payment.id,
+                recipient_id=split.recipient_id,
+                role=split.role,
+                amount=split.amount,
+                currency=payment.currency,
+            )
+            for split in split_results
+        ]
 
-        outboxEvent = OutboxEvent.objects.create(
+    @staticmethod
+    def _build_outbox_event(*, payment: Payment, split_results: List[SplitResult]) -> OutboxEvent:
+        outbox_event = OutboxEvent(
             payment_id=payment.id,
             type="payment_captured",
             status=OutboxEvent.Status.PENDING,
-            payload={
-                "payment_id": str(payment.id),
-                "gross_amount": str(calculation.gross_amount),
-                "net_amount": str(calculation.net_amount),
-                "receivables": [
-                    {
-                        "recipient_id": split.recipient_id,
-                        "role": split.role,
-                        "amount": str(split.amount),
-                    }
-                    for split in split_results
-                ],
-            },
         )
+        return EventCodec.store(outbox_event, {
+            "payment_id": str(payment.id),
+            "currency": payment.currency,
+            "gross_amount": str(payment.gross_amount),
+            "net_amount": str(payment.net_amount),
+            "receivables": [
+                {
+                    "recipient_id": split.recipient_id,
+                    "role": split.role,
+                    "amount": str(split.amount),
+                }
+                for split in split_results
+            ],
+        })
 
+    @staticmethod
+    def _to_result(*, payment: Payment, ledger_entries: List[LedgerEntry], outbox_event: OutboxEvent) -> PaymentResultDTO:
         return PaymentResultDTO(
             payment_id=str(payment.id),
             status=payment.status,
             gross_amount=payment.gross_amount,
             platform_fee_amount=payment.platform_fee_amount,
             net_amount=payment.net_amount,
+            currency=payment.currency,
+            settlement_net_amount=payment.settlement_net_amount,
+            fx_rate_version=payment.fx_rate_version,
             receivables=[
                 ReceivableDTO(
                     recipient_id=ledger_entry.recipient_id,
@@ -152,11 +274,25 @@ class PaymentService:
                 ) for ledger_entry in ledger_entries
             ],
             outbox_event=OutboxEventDTO(
-                type=outboxEvent.type,
-                status=outboxEvent.status,
+                type=outbox_event.type,
+                status=outbox_event.status,
             ),
         )
 
+    @staticmethod
+    def _replay(*, alias: str, existing: Payment, payload_hash: str) -> PaymentResultDTO:
+        if existing.payload_hash != payload_hash:
+            raise IdempotencyConflict("Idempotency-Key reused with different payload")
+
+        ledger_entries = list(LedgerEntry.objects.using(alias).filter(payment_id=existing.id))
+        outbox_event = (
+            existing.outbox_events
+            .order_by("-created_at")
+            .first()
+        )
+
+        return PaymentService._to_result(payment=existing, ledger_entries=ledger_entries, outbox_event=outbox_event)
+
     @staticmethod
     def _generate_payload_hash(payload: dict) -> str:
         normalized = PaymentService._normalize(payload)
@@ -0,0 +1,69 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Optional, Tuple
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from app.services import CalculationService
+
+
+@dataclass(frozen=True)
+class CachedQuote:
+    body: bytes
+    etag: str
+
+
+class QuoteCache:
+    _entries: "OrderedDict[Tuple, CachedQuote]" = OrderedDict()
+    _lock = threading.Lock()
+
+    @staticmethod
+    def key(*, amount: Decimal, currency: str, payment_method: str, installments: int, fx_version: Optional[int]) -> Tuple:
+        # A new fee schedule or FX snapshot changes the key, so stale quotes
+        # are never served; they just age out of the LRU.
+        return (amount, currency, payment_method, installments, CalculationService.fee_schedule().version, fx_version)
+
+    @classmethod
+    def get(cls, key: Tuple) -> Optional[CachedQuote]:
+        with cls._lock:
+            quote = cls._entries.get(key)
+            if quote is not None:
+                cls._entries.move_to_end(key)
+            return quote
+
+    @classmethod
+    def put(cls, key: Tuple, body: bytes) -> CachedQuote:
+        # The ETag only depends on the body, so every process (and a recomputed
+        # entry after eviction) hands out the same one for the same quote.
+        quote = CachedQuote(body=body, etag=f'"{hashlib.sha256(body).hexdigest()[:32]}"')
+
+        max_entries = settings.QUOTE_CACHE_MAX_ENTRIES
+        if max_entries <= 0:
+            return quote
+
+        with cls._lock:
+            cls._entries[key] = quote
+            cls._entries.move_to_end(key)
+            while len(cls._entries) > max_entries:
+                cls._entries.popitem(last=False)
+        return quote
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._entries.clear()
+
+    @classmethod
+    def size(cls) -> int:
+        return len(cls._entries)
+
+
+@receiver(setting_changed)
+def _clear_on_setting_changed(*, setting: str, **kwargs):
+    if setting in ("PLATFORM_FEE_SCHEDULE", "SETTLEMENT_CURRENCY", "QUOTE_CACHE_MAX_ENTRIES"):
+        QuoteCache.clear()
@@ -0,0 +1,216 @@
+import json
+import multiprocessing
+import os
+import time
+from dataclasses import dataclass, asdict
+from decimal import Decimal
+from pathlib import Path
+from typing import Iterator, List, Optional, Set, Tuple
+
+import django
+from django.db import connections
+from django.db.models import Count, Max, Min, Sum
+
+from app.models import Payment, LedgerEntry, OutboxEvent
+from app.services import ShardService
+
+CAPTURED_EVENT_TYPE = "payment_captured"
+CENTS = Decimal("0.01")
+
+
+@dataclass(frozen=True)
+class ReconciliationRange:
+    alias: str
+    start_id: int
+    end_id: int
+
+
+@dataclass(frozen=True)
+class Discrepancy:
+    alias: str
+    payment_id: int
+    kind: str
+    expected: str
+    actual: str
+
+
+@dataclass(frozen=True)
+class RangeResult:
+    range: ReconciliationRange
+    payments: int
+    discrepancies: List[Discrepancy]
+
+
+@dataclass(frozen=True)
+class ReconciliationSummary:
+    ranges: int
+    skipped_ranges: int
+    payments: int
+    discrepancies: int
+    completed: bool
+
+
+class ReconciliationService:
+    @staticmethod
+    def check_range(reconciliation_range: ReconciliationRange) -> RangeResult:
+        alias = reconciliation_range.alias
+        start_id = reconciliation_range.start_id
+        end_id = reconciliation_range.end_id
+
+        payments = (
+            Payment.objects.using(alias)
+            .filter(id__gte=start_id, id__lt=end_id)
+            .values_list("id", "gross_amount", "platform_fee_amount", "net_amount")
+        )
+        ledger_totals = dict(
+            LedgerEntry.objects.using(alias)
+            .filter(payment_id__gte=start_id, payment_id__lt=end_id)
+            .values("payment_id")
+            .annotate(total=Sum("amount"))
+            .values_list("payment_id", "total")
+        )
+        captured_events = dict(
+            OutboxEvent.objects.using(alias)
+            .filter(payment_id__gte=start_id, payment_id__lt=end_id, type=CAPTURED_EVENT_TYPE)
+            .values("payment_id")
+            .annotate(events=Count("id"))
+            .values_list("payment_id", "events")
+        )
+
+        discrepancies: List[Discrepancy] = []
+        checked = 0
+        for payment_id, gross_amount, platform_fee_amount, net_amount in payments.iterator():
+            checked += 1
+
+            if platform_fee_amount + net_amount != gross_amount:
+                discrepancies.append(Discrepancy(alias, payment_id, "fee_plus_net_mismatch", str(gross_amount), str(platform_fee_amount + net_amount)))
+
+            ledger_total = Decimal(ledger_totals.get(payment_id, 0)).quantize(CENTS)
+            if ledger_total != net_amount:
+                discrepancies.append(Discrepancy(alias, payment_id, "ledger_total_mismatch", str(net_amount), str(ledger_total)))
+
+            events = captured_events.get(payment_id, 0)
+            if events != 1:
+                discrepancies.append(Discrepancy(alias, payment_id, "captured_event_count", "1", str(events)))
+
+        return RangeResult(range=reconciliation_range, payments=checked, discrepancies=discrepancies)
+
+    @staticmethod
+    def ranges(*, chunk_size: int, aliases: Optional[List[str]] = None) -> Iterator[ReconciliationRange]:
+        for alias in aliases if aliases is not None else ShardService.aliases():
+            bounds = Payment.objects.using(alias).aggregate(low=Min("id"), high=Max("id"))
+            if bounds["low"] is None:
+                continue
+
+            for start_id in range(bounds["low"], bounds["high"] + 1, chunk_size):
+                yield ReconciliationRange(alias=alias, start_id=start_id, end_id=start_id + chunk_size)
+
+    @staticmethod
+    def reconcile(*, report_path: Path, checkpoint_path: Path, chunk_size: int = 10_000, workers: int = 1, max_seconds: Optional[float] = None) -> ReconciliationSummary:
+        done, report_offset = ReconciliationService._load_checkpoint(checkpoint_path)
+        deadline = time.monotonic() + max_seconds if max_seconds else None
+
+        pending: List[ReconciliationRange] = []
+        skipped = 0
+        for reconciliation_range in ReconciliationService.ranges(chunk_size=chunk_size):
+            if ReconciliationService._key(reconciliation_range) in done:
+                skipped += 1
+            else:
+                pending.append(reconciliation_range)
+
+        # Whatever the report holds past the last checkpoint belongs to a
+        # range that is about to be checked again: drop it so it is not
+        # reported twice.
+        if report_offset is not None and report_path.exists():
+            os.truncate(report_path, report_offset)
+
+        checked_ranges = checked_payments = found = 0
+        with open(report_path, "a") as report, open(checkpoint_path, "a") as checkpoint:
+            if report_offset is None:
+                checkpoint.write(json.dumps({"report_offset": report.tell()}) + "\n")
+                checkpoint.flush()
+
+            for result in ReconciliationService._run(pending, workers=workers, deadline=deadline):
+                for discrepancy in result.discrepancies:
+                    report.write(json.dumps(asdict(discrepancy), separators=(",", ":")) + "\n")
+                report.flush()
+
+                # Only checkpoint a range after its discrepancies are on disk,
+                # with the report size they brought it to.
+                checkpoint.write(json.dumps({**asdict(result.range), "report_offset": report.tell()}, separators=(",", ":")) + "\n")
+                checkpoint.flush()
+
+                checked_ranges += 1
+                checked_payments += result.payments
+                found += len(result.discrepancies)
+
+        return ReconciliationSummary(
+            ranges=checked_ranges,
+            skipped_ranges=skipped,
+            payments=checked_payments,
+            discrepancies=found,
+            completed=checked_ranges == len(pending),
+        )
+
+    @staticmethod
+    def _run(pending: List[ReconciliationRange], *, workers: int, deadline: Optional[float]) -> Iterator[RangeResult]:
+        if workers <= 1:
+            for reconciliation_range in pending:
+                if deadline is not None and time.monotonic() >= deadline:
+                    return
+                yield ReconciliationService.check_range(reconciliation_range)
+            return
+
+        connections.close_all()
+        context = multiprocessing.get_context("spawn")
+
+        # Spawned workers inherit DJANGO_SETTINGS_MODULE and set Django up
+        # before unpickling any task (which imports the models).
+        with context.Pool(workers, initializer=django.setup) as pool:
+            # A bounded window of in-flight ranges keeps memory flat no matter
+            # how many ranges there are.
+            queue = iter(pending)
+            in_flight = []
+            while True:
+                while len(in_flight) < workers * 2 and (deadline is None or time.monotonic() < deadline):
+                    reconciliation_range = next(queue, None)
+                    if reconciliation_range is None:
+                        break
+                    in_flight.append(pool.apply_async(ReconciliationService.check_range, (reconciliation_range,)))
+
+                if not in_flight:
+                    return
+
+                yield in_flight.pop(0).get()
+
+    @staticmethod
+    def _load_checkpoint(checkpoint_path: Path) -> Tuple[Set[Tuple[str, int, int]], Optional[int]]:
+        # The checked ranges and the report size at the last checkpoint. A
+        # run killed mid-write leaves an incomplete last line: it is cut off
+        # so the next checkpoint starts on a line of its own.
+        if not checkpoint_path.exists():
+            return set(), None
+
+        done = set()
+        report_offset = None
+        complete = 0
+        with open(checkpoint_path, "rb") as checkpoint:
+            for line in checkpoint:
+                if not line.endswith(b"\n"):
+                    break
+                if line.strip():
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break
+                    if "alias" in record:
+                        done.add((record["alias"], record["start_id"], record["end_id"]))
+                    report_offset = record.get("report_offset", report_offset)
+                complete += len(line)
+
+        os.truncate(checkpoint_path, complete)
+        return done, report_offset
+
+    @staticmethod
+    def _key(reconciliation_range: ReconciliationRange) -> Tuple[str, int, int]:
+        return (reconciliation_range.alias, reconciliation_range.start_id, reconciliation_range.end_id)
@@ -0,0 +1,89 @@
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, TypeVar
+
+from django.conf import settings
+from django.db import connections
+
+from app.models import LedgerEntry
+
+T = TypeVar("T")
+
+SELLER_ROLE = "producer"
+
+
+class ShardService:
+    @staticmethod
+    def aliases() -> List[str]:
+        return list(settings.PAYMENT_SHARDS)
+
+    @staticmethod
+    def shard_for(*, idempotency_key: str, recipients: Iterable, aliases: Optional[List[str]] = None) -> str:
+        mode = settings.PAYMENT_SHARD_KEY
+
+        if mode == "idempotency_key":
+            key = idempotency_key
+        elif mode == "seller":
+            key = ShardService.seller_of(recipients)
+        else:
+            raise InvalidShardKey(f"Unsupported shard key: {mode}")
+
+        return ShardService.alias_for_key(key, aliases=aliases)
+
+    @staticmethod
+    def alias_for_key(key: str, *, aliases: Optional[List[str]] = None) -> str:
+        aliases = aliases if aliases is not None else ShardService.aliases()
+        if len(aliases) == 1:
+            return aliases[0]
+
+        # Rendezvous hashing: adding a shard only moves ~1/N of the keys.
+        return max(aliases, key=lambda alias: ShardService._score(alias, key))
+
+    @staticmethod
+    def seller_of(recipients: Iterable) -> str:
+        recipients = list(recipients)
+        if not recipients:
+            raise InvalidShardKey("Cannot derive a seller from an empty recipient list")
+
+        for recipient in recipients:
+            if recipient.role == SELLER_ROLE:
+                return recipient.recipient_id
+        return recipients[0].recipient_id
+
+    @staticmethod
+    def fan_out(query: Callable[[str], T], *, aliases: Optional[List[str]] = None) -> Dict[str, T]:
+        aliases = aliases if aliases is not None else ShardService.aliases()
+        if len(aliases) == 1:
+            return {aliases[0]: query(aliases[0])}
+
+        def run(alias: str) -> T:
+            try:
+                return query(alias)
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=len(aliases)) as executor:
+            return dict(zip(aliases, executor.map(run, aliases)))
+
+    @staticmethod
+    def recipient_ledger_entries(recipient_id: str) -> List[LedgerEntry]:
+        results = ShardService.fan_out(
+            lambda alias: list(
+                LedgerEntry.objects.using(alias)
+                .filter(recipient_id=recipient_id)
+                .order_by("-created_at", "-id")
+            )
+        )
+
+        entries = [entry for alias_entries in results.values() for entry in alias_entries]
+        entries.sort(key=lambda entry: entry.created_at, reverse=True)
+        return entries
+
+    @staticmethod
+    def _score(alias: str, key: str) -> int:
+        digest = hashlib.blake2b(f"{alias}:{key}".encode(), digest_size=8).digest()
+        return int.from_bytes(digest, "big")
+
+
+class InvalidShardKey(Exception):
+    pass
@@ -2,6 +2,8 @@ from decimal import Decimal, ROUND_DOWN
 from dataclasses import dataclass
 from typing import List
 
+from app.services import CurrencyService
+
 @dataclass(frozen=True)
 class SplitInput:
     recipient_id: str
@@ -18,7 +20,7 @@ class SplitResult:
 
 class SplitService:
     @staticmethod
-    def calculate(*, net_amount: Decimal, splits: List[SplitInput]) -> List[SplitResult]:
+    def calculate(*, net_amount: Decimal, splits: List[SplitInput], currency: str = "BRL") -> List[SplitResult]:
         if not splits:
             raise EmptySplitError("At least one split is required")
 
@@ -30,12 +32,14 @@ class SplitService:
         if total_percent != 100:
             raise InvalidSplitPercentage("Split percentages must sum to 100")
 
+        currency = CurrencyService.get(currency)
+
         results: List[SplitResult] = []
-        total_distributed = Decimal("0.00")
+        total_distributed = Decimal("0")
 
         for split in splits:
             raw = (net_amount * Decimal(split.percent) / Decimal("100"))
-            amount = raw.quantize(Decimal("0.01"), rounding=ROUND_DOWN)
+            amount = CurrencyService.quantize(raw, currency, rounding=ROUND_DOWN)
 
             results.append(SplitResult(
                 recipient_id=split.recipient_id,
@@ -45,9 +49,9 @@ class SplitService:
             ))
             total_distributed += amount
 
-        remainder = (net_amount - total_distributed).quantize(Decimal("0.01"))
+        remainder = CurrencyService.quantize(net_amount - total_distributed, currency)
 
-        if remainder > Decimal("0.00"):
+        if remainder > 0:
             target = max(results, key=lambda r: r.percent)
             results = [
                 SplitResult(
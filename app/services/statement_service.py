@@ -0,0 +1,199 @@
+import heapq
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, List, Optional
+
+from django.core import signing
+from django.db.models import Q
+
+from app.models import LedgerEntry
+from app.services import LedgerSnapshotService, ShardService
+
+CURSOR_SALT = "app.statement.cursor"
+
+
+@dataclass(frozen=True)
+class StatementLine:
+    payment_id: str
+    role: str
+    amount: Decimal
+    currency: str
+    running_balance: Decimal
+    created_at: datetime
+
+
+@dataclass(frozen=True)
+class StatementPage:
+    recipient_id: str
+    closing_balance: Decimal
+    lines: List[StatementLine]
+    next_cursor: Optional[str]
+
+
+@dataclass(frozen=True)
+class _Cursor:
+    created_at: datetime
+    shard: int
+    id: int
+    balance: Decimal
+    closing_balance: Decimal
+
+
+class StatementService:
+    @staticmethod
+    def get_statement(*, recipient_id: str, start: Optional[datetime] = None, end: Optional[datetime] = None, currency: Optional[str] = None, cursor: Optional[str] = None, limit: int = 50) -> StatementPage:
+        aliases = ShardService.aliases()
+
+        period = Q(recipient_id=recipient_id)
+        if start is not None:
+            period &= Q(created_at__gte=start)
+        if end is not None:
+            period &= Q(created_at__lt=end)
+        if currency is not None:
+            period &= Q(currency=currency)
+        # A cursor is only valid for the statement it was issued for.
+        scope = [recipient_id, currency, start.isoformat() if start else None, end.isoformat() if end else None]
+
+        if cursor is None:
+            position = None
+            currencies = set()
+            for shard_currencies in ShardService.fan_out(lambda alias: StatementService._currencies(alias, period)).values():
+                currencies.update(shard_currencies)
+
+            # Balances only add up within one currency. Cursors are only
+            # issued once this check passed, so later pages skip it.
+            if len(currencies) > 1:
+                raise StatementCurrencyRequired(
+                    f"Recipient has entries in {', '.join(sorted(currencies))}; pass currency to get a statement"
+                )
+            closing_balance = Decimal("0.00")
+            if currencies:
+                closing_balance = StatementService._period_total(recipient_id, currencies.pop(), start, end)
+            balance = closing_balance
+        else:
+            position = StatementService._decode_cursor(cursor, scope)
+            closing_balance = position.closing_balance
+            balance = position.balance
+
+        rows_per_shard = ShardService.fan_out(
+            lambda alias: StatementService._page(alias, aliases.index(alias), period, position, limit + 1),
+        )
+
+        # Rows are ordered newest first by (created_at, shard, id) across shards.
+        merged = heapq.merge(*rows_per_shard.values(), key=lambda row: (row[5], row[6], row[0]), reverse=True)
+
+        lines: List[StatementLine] = []
+        last = None
+        has_more = False
+        for row in merged:
+            if len(lines) == limit:
+                has_more = True
+                break
+
+            entry_id, payment_id, role, amount, entry_currency, created_at, shard = row
+            lines.append(StatementLine(
+                payment_id=str(payment_id),
+                role=role,
+                amount=amount,
+                currency=entry_currency,
+                running_balance=balance,
+                created_at=created_at,
+            ))
+            balance -= amount
+            last = row
+
+        next_cursor = None
+        if has_more:
+            next_cursor = StatementService._encode_cursor(_Cursor(
+                created_at=last[5],
+                shard=last[6],
+                id=last[0],
+                balance=balance,
+                closing_balance=closing_balance,
+            ), scope)
+
+        return StatementPage(
+            recipient_id=recipient_id,
+            closing_balance=closing_balance,
+            lines=lines,
+            next_cursor=next_cursor,
+        )
+
+    @staticmethod
+    def _currencies(alias: str, period: Q) -> List[str]:
+        # At most two, each found by a seek on ledger_recipient_delta: enough
+        # to tell whether the period spans currencies without reading it all.
+        entries = LedgerEntry.objects.using(alias).filter(period).order_by("currency").values_list("currency", flat=True)
+        first = entries.first()
+        if first is None:
+            return []
+        second = entries.filter(currency__gt=first).first()
+        return [first] if second is None else [first, second]
+
+    @staticmethod
+    def _period_total(recipient_id: str, currency: str, start: Optional[datetime], end: Optional[datetime]) -> Decimal:
+        # Balances from the ledger snapshots: only entries past a snapshot's
+        # watermark are summed, not the recipient's whole history.
+        total = LedgerSnapshotService.balance(recipient_id=recipient_id, currency=currency, as_of=end, inclusive=False).balance
+        if start is not None:
+            total -= LedgerSnapshotService.balance(recipient_id=recipient_id, currency=currency, as_of=start, inclusive=False).balance
+        return total
+
+    @staticmethod
+    def _page(alias: str, shard: int, period: Q, position: Optional[_Cursor], limit: int) -> list:
+        queryset = LedgerEntry.objects.using(alias).filter(period)
+
+        if position is not None:
+            if shard < position.shard:
+                queryset = queryset.filter(created_at__lte=position.created_at)
+            elif shard == position.shard:
+                queryset = queryset.filter(
+                    Q(created_at__lt=position.created_at)
+                    | Q(created_at=position.created_at, id__lt=position.id)
+                )
+            else:
+                queryset = queryset.filter(created_at__lt=position.created_at)
+
+        rows = (
+            queryset
+            .order_by("-created_at", "-id")
+            .values_list("id", "payment_id", "role", "amount", "currency", "created_at")[:limit]
+        )
+        return [(*row, shard) for row in rows]
+
+    @staticmethod
+    def _encode_cursor(position: _Cursor, scope: list) -> str:
+        # Signed: the cursor carries balances the next page trusts as is.
+        return signing.dumps([
+            scope,
+            position.created_at.isoformat(),
+            position.shard,
+            position.id,
+            str(position.balance),
+            str(position.closing_balance),
+        ], salt=CURSOR_SALT, compress=True)
+
+    @staticmethod
+    def _decode_cursor(cursor: str, scope: list) -> _Cursor:
+        try:
+            cursor_scope, created_at, shard, entry_id, balance, closing_balance = signing.loads(cursor, salt=CURSOR_SALT)
+            if cursor_scope != scope:
+                raise ValueError("cursor issued for another statement")
+            return _Cursor(
+                created_at=datetime.fromisoformat(created_at),
+                shard=int(shard),
+                id=int(entry_id),
+                balance=Decimal(balance),
+                closing_balance=Decimal(closing_balance),
+            )
+        except (signing.BadSignature, ValueError, TypeError, ArithmeticError) as exception:
+            raise InvalidStatementCursor("Invalid statement cursor") from exception
+
+
+class InvalidStatementCursor(Exception):
+    pass
+
+
+class StatementCurrencyRequired(Exception):
+    pass
@@ -0,0 +1,446 @@
+import asyncio
+import hashlib
+import hmac
+import json
+import random
+import ssl
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Min, Q
+from django.utils import timezone
+
+from app.models import OutboxEvent, WebhookSubscription, WebhookDeadLetter, WebhookRetry
+from app.services import EventCodec, ShardService
+
+USER_AGENT = "payments-webhooks/1"
+RETRYABLE_STATUSES = {408, 425, 429}
+
+
+@dataclass(frozen=True)
+class WebhookDelivery:
+    alias: str
+    event_id: int
+    subscription_id: int
+    url: str
+    secret: str
+    event_type: str
+    body: bytes
+    # Attempts already made, and the WebhookRetry row when this is a retry.
+    attempts: int = 0
+    retry_id: Optional[int] = None
+
+
+@dataclass(frozen=True)
+class DeliveryOutcome:
+    delivery: WebhookDelivery
+    attempts: int
+    status: Optional[int]
+    error: str = ""
+
+    @property
+    def delivered(self) -> bool:
+        return self.status is not None and 200 <= self.status < 300
+
+    @property
+    def retryable(self) -> bool:
+        if self.delivered or self.attempts >= settings.WEBHOOK_MAX_ATTEMPTS:
+            return False
+        return self.status is None or self.status >= 500 or self.status in RETRYABLE_STATUSES
+
+
+@dataclass
+class DispatchSummary:
+    events: int = 0
+    deliveries: int = 0
+    delivered: int = 0
+    dead_lettered: int = 0
+    retries: int = 0
+    seconds: float = 0.0
+
+    @property
+    def deliveries_per_second(self) -> float:
+        return self.deliveries / self.seconds if self.seconds else 0.0
+
+
+class HttpConnectionPool:
+    """Minimal HTTP/1.1 client keeping idle keep-alive connections per host.
+
+    At most `per_host` requests (and so connections) are open per host at a
+    time and at most `in_flight` across all hosts.
+    """
+
+    def __init__(self, *, per_host: int, in_flight: int, timeout: float):
+        self.per_host = per_host
+        self.timeout = timeout
+        self._in_flight = asyncio.Semaphore(in_flight)
+        self._limits: Dict[Tuple[str, str, int], asyncio.Semaphore] = {}
+        self._idle: Dict[Tuple[str, str, int], List[Tuple[asyncio.StreamReader, asyncio.StreamWriter]]] = {}
+        self.connections_opened = 0
+
+    async def post(self, url: str, body: bytes, headers: Dict[str, str]) -> int:
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise ValueError(f"Unsupported webhook URL {url!r}")
+
+        key = (parts.scheme, parts.hostname, parts.port or (443 if parts.scheme == "https" else 80))
+        limit = self._limits.setdefault(key, asyncio.Semaphore(self.per_host))
+        request = self._request(parts, body, headers)
+
+        # The host's own limit first: deliveries queued behind one slow host
+        # must not hold global slots other subscribers could use.
+        async with limit, self._in_flight:
+            idle = self._idle.setdefault(key, [])
+            while True:
+                reused = bool(idle)
+                connection = idle.pop() if reused else await asyncio.wait_for(self._open(key), self.timeout)
+                try:
+                    status, keep_alive = await asyncio.wait_for(self._exchange(connection, request), self.timeout)
+                except (OSError, EOFError) as exception:
+                    connection[1].close()
+                    # The server may close an idle keep-alive connection at any
+                    # time; only a fresh connection failing counts as an attempt.
+                    if reused and not isinstance(exception, TimeoutError):
+                        continue
+                    raise
+                except BaseException:
+                    connection[1].close()
+                    raise
+
+                if keep_alive:
+                    idle.append(connection)
+                else:
+                    connection[1].close()
+                return status
+
+    async def close(self):
+        for connections in self._idle.values():
+            for _, writer in connections:
+                writer.close()
+        self._idle.clear()
+
+    async def _open(self, key: Tuple[str, str, int]) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        scheme, host, port = key
+        connection = await asyncio.open_connection(host, port, ssl=ssl.create_default_context() if scheme == "https" else None)
+        self.connections_opened += 1
+        return connection
+
+    @staticmethod
+    def _request(parts, body: bytes, headers: Dict[str, str]) -> bytes:
+        target = parts.path or "/"
+        if parts.query:
+            target += f"?{parts.query}"
+
+        lines = [
+            f"POST {target} HTTP/1.1",
+            f"Host: {parts.netloc.rpartition('@')[2]}",
+            f"User-Agent: {USER_AGENT}",
+            "Content-Type: application/json",
+            f"Content-Length: {len(body)}",
+            *(f"{name}: {value}" for name, value in headers.items()),
+        ]
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body
+
+    @staticmethod
+    async def _exchange(connection: Tuple[asyncio.StreamReader, asyncio.StreamWriter], request: bytes) -> Tuple[int, bool]:
+        reader, writer = connection
+        writer.write(request)
+        await writer.drain()
+
+        # Interim 1xx responses (e.g. 100 Continue) have no body and are
+        # followed by the final response on the same connection.
+        status = 100
+        while 100 <= status < 200:
+            version, status = (await reader.readuntil(b"\r\n")).decode("latin-1").split(" ", 2)[:2]
+            status = int(status.strip())
+            headers = {}
+            while (line := await reader.readuntil(b"\r\n")) != b"\r\n":
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip().lower()
+
+        # The response body is read and discarded so the connection can be
+        # reused. Framing follows RFC 9112 §6.3: 204 and 304 never have a body,
+        # and only a closing connection may delimit one by EOF.
+        connection = headers.get("connection")
+        closing = connection == "close" or (version != "HTTP/1.1" and connection != "keep-alive")
+        keep_alive = not closing
+        if status in (204, 304):
+            pass
+        elif headers.get("transfer-encoding") == "chunked":
+            while size := int((await reader.readuntil(b"\r\n")).split(b";")[0], 16):
+                await reader.readexactly(size + 2)
+            while await reader.readuntil(b"\r\n") != b"\r\n":
+                pass
+        elif "content-length" in headers:
+            await reader.readexactly(int(headers["content-length"]))
+        elif closing:
+            await reader.read()
+        else:
+            # A persistent connection with no framing: the status is all we
+            # need, but the connection cannot be reused safely.
+            keep_alive = False
+
+        return status, keep_alive
+
+
+class WebhookDispatcher:
+    @staticmethod
+    def dispatch(*, aliases: Optional[List[str]] = None, batch_size: Optional[int] = None, follow: bool = False, poll_interval: float = 1.0, max_seconds: Optional[float] = None) -> DispatchSummary:
+        return asyncio.run(WebhookDispatcher.run(
+            aliases=aliases,
+            batch_size=batch_size,
+            follow=follow,
+            poll_interval=poll_interval,
+            max_seconds=max_seconds,
+        ))
+
+    @staticmethod
+    async def run(*, aliases: Optional[List[str]] = None, batch_size: Optional[int] = None, follow: bool = False, poll_interval: float = 1.0, max_seconds: Optional[float] = None) -> DispatchSummary:
+        # Database work runs in a worker thread (the ORM is synchronous); the
+        # event loop only does HTTP, and the pool outlives every batch so
+        # connections to each subscriber are reused across batches.
+        aliases = aliases if aliases is not None else ShardService.aliases()
+        batch_size = batch_size or settings.WEBHOOK_BATCH_SIZE
+        pool = HttpConnectionPool(
+            per_host=settings.WEBHOOK_MAX_CONNECTIONS_PER_HOST,
+            in_flight=settings.WEBHOOK_MAX_IN_FLIGHT,
+            timeout=settings.WEBHOOK_TIMEOUT_SECONDS,
+        )
+
+        summary = DispatchSummary()
+        started = time.perf_counter()
+        try:
+            while max_seconds is None or time.perf_counter() - started < max_seconds:
+                claimed = 0
+                for alias in aliases:
+                    for claim in (WebhookDispatcher._claim, WebhookDispatcher._claim_retries):
+                        deliveries, ids = await sync_to_async(claim)(alias, batch_size)
+                        if not ids:
+                            continue
+
+                        # One attempt per delivery: a failure is rescheduled
+                        # instead of sleeping here, so a dead endpoint never
+                        # holds up the batch or outlives its claim.
+                        outcomes = await asyncio.gather(*(WebhookDispatcher._attempt(pool, delivery) for delivery in deliveries))
+                        finish = WebhookDispatcher._finish if claim is WebhookDispatcher._claim else WebhookDispatcher._finish_retries
+                        await sync_to_async(finish)(alias, ids, outcomes)
+
+                        claimed += len(ids)
+                        if claim is WebhookDispatcher._claim:
+                            summary.events += len(ids)
+                        summary.retries += sum(outcome.retryable for outcome in outcomes)
+                        summary.delivered += sum(outcome.delivered for outcome in outcomes)
+                        summary.dead_lettered += sum(not outcome.delivered and not outcome.retryable for outcome in outcomes)
+                        summary.deliveries = summary.delivered + summary.dead_lettered
+
+                if not claimed:
+                    # Without --follow the run ends once no event is pending and
+                    # no retry is scheduled; until then it sleeps to the next one.
+                    next_retry_in = await sync_to_async(WebhookDispatcher._next_retry_in)(aliases)
+                    if next_retry_in is None and not follow:
+                        break
+                    await asyncio.sleep(poll_interval if next_retry_in is None else min(poll_interval, next_retry_in))
+        finally:
+            await pool.close()
+            summary.seconds = time.perf_counter() - started
+
+        return summary
+
+    @staticmethod
+    def sign(secret: str, timestamp: str, body: bytes) -> str:
+        digest = hmac.new(secret.encode(), timestamp.encode() + b"." + body, hashlib.sha256).hexdigest()
+        return f"v1={digest}"
+
+    @staticmethod
+    def backoff(attempt: int) -> float:
+        # "Full jitter": spreads the retries of a burst of failures instead of
+        # sending them back to a recovering endpoint all at once.
+        ceiling = min(settings.WEBHOOK_BACKOFF_MAX_SECONDS, settings.WEBHOOK_BACKOFF_BASE_SECONDS * 2 ** (attempt - 1))
+        return random.uniform(0, ceiling)
+
+    @staticmethod
+    async def _attempt(pool: HttpConnectionPool, delivery: WebhookDelivery) -> DeliveryOutcome:
+        timestamp = str(int(time.time()))
+        headers = {
+            "X-Webhook-Id": f"{delivery.alias}:{delivery.event_id}",
+            "X-Webhook-Event": delivery.event_type,
+            "X-Webhook-Timestamp": timestamp,
+            "X-Webhook-Signature": WebhookDispatcher.sign(delivery.secret, timestamp, delivery.body),
+        }
+        try:
+            status, error = await pool.post(delivery.url, delivery.body, headers), ""
+        except (OSError, EOFError, ValueError, asyncio.LimitOverrunError) as exception:
+            status, error = None, f"{type(exception).__name__}: {exception}"
+
+        return DeliveryOutcome(delivery=delivery, attempts=delivery.attempts + 1, status=status, error=error)
+
+    @staticmethod
+    def _claim(alias: str, batch_size: int) -> Tuple[List[WebhookDelivery], List[int]]:
+        # The claim is its own short transaction so no lock is held while
+        # delivering; an event whose dispatcher died is reclaimed once the
+        # lease expires (deliveries are at-least-once, keyed by X-Webhook-Id).
+        now = timezone.now()
+        expired = now - timedelta(seconds=settings.WEBHOOK_CLAIM_LEASE_SECONDS)
+        with transaction.atomic(using=alias):
+            ids = list(
+                OutboxEvent.objects.using(alias)
+                .select_for_update(skip_locked=True)
+                .filter(Q(status=OutboxEvent.Status.PENDING) | Q(status=OutboxEvent.Status.DISPATCHING, claimed_at__lt=expired))
+                .order_by("id")
+                .values_list("id", flat=True)[:batch_size]
+            )
+            OutboxEvent.objects.using(alias).filter(id__in=ids).update(status=OutboxEvent.Status.DISPATCHING, claimed_at=now)
+        if not ids:
+            return [], []
+
+        subscriptions: Dict[str, List[WebhookSubscription]] = {}
+        for subscription in WebhookSubscription.objects.filter(active=True).order_by("id"):
+            subscriptions.setdefault(subscription.event_type, []).append(subscription)
+
+        deliveries = []
+        for event in OutboxEvent.objects.using(alias).filter(id__in=ids).order_by("id"):
+            matching = subscriptions.get(event.type)
+            if not matching:
+                continue
+
+            payload = EventCodec.payload_of(event)
+            recipients = {receivable["recipient_id"] for receivable in payload.get("receivables", [])}
+            body = WebhookDispatcher._body(alias, event, payload)
+
+            deliveries.extend(
+                WebhookDelivery(
+                    alias=alias,
+                    event_id=event.id,
+                    subscription_id=subscription.id,
+                    url=subscription.url,
+                    secret=subscription.secret,
+                    event_type=event.type,
+                    body=body,
+                )
+                for subscription in matching
+                if not subscription.recipient_id or subscription.recipient_id in recipients
+            )
+        return deliveries, ids
+
+    @staticmethod
+    def _claim_retries(alias: str, batch_size: int) -> Tuple[List[WebhookDelivery], List[int]]:
+        now = timezone.now()
+        expired = now - timedelta(seconds=settings.WEBHOOK_CLAIM_LEASE_SECONDS)
+        with transaction.atomic(using=alias):
+            ids = list(
+                WebhookRetry.objects.using(alias)
+                .select_for_update(skip_locked=True)
+                .filter(Q(claimed_at__isnull=True, next_attempt_at__lte=now) | Q(claimed_at__lt=expired))
+                .order_by("next_attempt_at")
+                .values_list("id", flat=True)[:batch_size]
+            )
+            WebhookRetry.objects.using(alias).filter(id__in=ids).update(claimed_at=now)
+        if not ids:
+            return [], []
+
+        retries = list(WebhookRetry.objects.using(alias).filter(id__in=ids).select_related("event").order_by("id"))
+        subscriptions = WebhookSubscription.objects.in_bulk({retry.subscription_id for retry in retries})
+
+        # A subscription deactivated or deleted since the first attempt gets
+        # no more retries.
+        dropped = [retry.id for retry in retries if retry.subscription_id not in subscriptions or not subscriptions[retry.subscription_id].active]
+        WebhookRetry.objects.using(alias).filter(id__in=dropped).delete()
+
+        return [
+            WebhookDelivery(
+                alias=alias,
+                event_id=retry.event_id,
+                subscription_id=retry.subscription_id,
+                url=subscriptions[retry.subscription_id].url,
+                secret=subscriptions[retry.subscription_id].secret,
+                event_type=retry.event.type,
+                body=WebhookDispatcher._body(alias, retry.event, EventCodec.payload_of(retry.event)),
+                attempts=retry.attempts,
+                retry_id=retry.id,
+            )
+            for retry in retries
+            if retry.id not in dropped
+        ], ids
+
+    @staticmethod
+    def _body(alias: str, event: OutboxEvent, payload: dict) -> bytes:
+        return json.dumps({
+            "id": f"{alias}:{event.id}",
+            "type": event.type,
+            "created_at": event.created_at.isoformat(),
+            "data": payload,
+        }, separators=(",", ":")).encode()
+
+    @staticmethod
+    def _finish(alias: str, event_ids: List[int], outcomes: List[DeliveryOutcome]):
+        now = timezone.now()
+        with transaction.atomic(using=alias):
+            WebhookDispatcher._dead_letter(alias, outcomes)
+            WebhookRetry.objects.using(alias).bulk_create([
+                WebhookDispatcher._retry(outcome, now)
+                for outcome in outcomes
+                if outcome.retryable
+            ])
+            OutboxEvent.objects.using(alias).filter(id__in=event_ids, status=OutboxEvent.Status.DISPATCHING).update(
+                status=OutboxEvent.Status.PUBLISHED,
+                published_at=now,
+            )
+
+    @staticmethod
+    def _finish_retries(alias: str, retry_ids: List[int], outcomes: List[DeliveryOutcome]):
+        now = timezone.now()
+        with transaction.atomic(using=alias):
+            WebhookDispatcher._dead_letter(alias, outcomes)
+            rescheduled = [WebhookDispatcher._retry(outcome, now) for outcome in outcomes if outcome.retryable]
+            WebhookRetry.objects.using(alias).bulk_update(
+                rescheduled,
+                ["attempts", "last_status", "last_error", "next_attempt_at", "claimed_at"],
+            )
+            WebhookRetry.objects.using(alias).filter(id__in=retry_ids).exclude(id__in=[retry.id for retry in rescheduled]).delete()
+
+    @staticmethod
+    def _dead_letter(alias: str, outcomes: List[DeliveryOutcome]):
+        WebhookDeadLetter.objects.using(alias).bulk_create([
+            WebhookDeadLetter(
+                event_id=outcome.delivery.event_id,
+                subscription_id=outcome.delivery.subscription_id,
+                url=outcome.delivery.url,
+                attempts=outcome.attempts,
+                last_status=outcome.status,
+                last_error=outcome.error,
+            )
+            for outcome in outcomes
+            if not outcome.delivered and not outcome.retryable
+        ])
+
+    @staticmethod
+    def _retry(outcome: DeliveryOutcome, now) -> WebhookRetry:
+        return WebhookRetry(
+            id=outcome.delivery.retry_id,
+            event_id=outcome.delivery.event_id,
+            subscription_id=outcome.delivery.subscription_id,
+            url=outcome.delivery.url,
+            attempts=outcome.attempts,
+            last_status=outcome.status,
+            last_error=outcome.error,
+            next_attempt_at=now + timedelta(seconds=WebhookDispatcher.backoff(outcome.attempts)),
+            claimed_at=None,
+        )
+
+    @staticmethod
+    def _next_retry_in(aliases: List[str]) -> Optional[float]:
+        # Seconds until the earliest unclaimed retry is due, or None if none is scheduled.
+        due = [
+            WebhookRetry.objects.using(alias).filter(claimed_at__isnull=True).aggregate(due=Min("next_attempt_at"))["due"]
+            for alias in aliases
+        ]
+        due = [at for at in due if at is not None]
+        if not due:
+            return None
+        return max(0.0, (min(due) - timezone.now()).total_seconds())
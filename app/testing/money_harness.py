@@ -0,0 +1,271 @@
+import multiprocessing
+import random
+import time
+from dataclasses import dataclass, field
+from decimal import Decimal, ROUND_DOWN
+from typing import Callable, Iterator, List, Optional, Tuple
+
+import django
+from django.utils.module_loading import import_string
+
+from app.services import CalculationService, SplitService, SplitInput, FxRateSnapshot
+from app.services.currency_service import CURRENCIES
+
+ROLES = ("producer", "affiliate", "coproducer")
+MAX_INTEGER_DIGITS = 10
+
+# Every registered currency converts at 1, so the settlement step never needs
+# the database (or published rates) while the harness runs.
+FX_SNAPSHOT = FxRateSnapshot(version=None, rates={code: Decimal(1) for code in CURRENCIES})
+
+DEFAULT_CANDIDATE = "app.testing.money_harness.integer_engine"
+
+
+@dataclass(frozen=True)
+class MoneyCase:
+    index: int
+    amount: Decimal
+    currency: str
+    payment_method: str
+    installments: int
+    splits: Tuple[SplitInput, ...]
+
+
+@dataclass(frozen=True)
+class MoneyOutcome:
+    gross_amount: Optional[Decimal] = None
+    platform_fee_amount: Optional[Decimal] = None
+    net_amount: Optional[Decimal] = None
+    split_amounts: Tuple[Decimal, ...] = ()
+    error: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class HarnessFailure:
+    case: MoneyCase
+    kind: str
+    detail: str
+
+
+@dataclass
+class HarnessReport:
+    cases: int = 0
+    invalid_cases: int = 0
+    failures: List[HarnessFailure] = field(default_factory=list)
+    seconds: float = 0.0
+
+    @property
+    def cases_per_second(self) -> float:
+        return self.cases / self.seconds if self.seconds else 0.0
+
+
+class MoneyHarness:
+    @staticmethod
+    def generate(seed: int, index: int) -> MoneyCase:
+        # Each case depends only on (seed, index), so any failure can be
+        # replayed on its own with `check_money_invariants --case <index>`.
+        rng = random.Random(seed * 1_000_003 + index)
+        currency = CURRENCIES[rng.choice(sorted(CURRENCIES))]
+
+        shape = rng.random()
+        if shape < 0.2:
+            minor = rng.randint(1, 1_000)
+        elif shape < 0.9:
+            minor = rng.randint(1, 10 ** (currency.minor_units + 6))
+        else:
+            minor = rng.randint(1, 10 ** (currency.minor_units + MAX_INTEGER_DIGITS) - 1)
+
+        if rng.random() < 0.5:
+            payment_method, installments = "card", rng.randint(1, 12)
+        else:
+            payment_method, installments = "pix", 1
+
+        # A small share of cases is invalid on purpose: implementations must
+        # reject them with the same error as the reference.
+        if rng.random() < 0.02:
+            installments = rng.choice([0, 2, 13])
+
+        return MoneyCase(
+            index=index,
+            amount=Decimal(minor).scaleb(-currency.minor_units),
+            currency=currency.code,
+            payment_method=payment_method,
+            installments=installments,
+            splits=MoneyHarness._splits(rng),
+        )
+
+    @staticmethod
+    def reference(case: MoneyCase) -> MoneyOutcome:
+        try:
+            calculation = CalculationService.calculate(
+                amount=case.amount,
+                payment_method=case.payment_method,
+                installments=case.installments,
+                currency=case.currency,
+                fx_snapshot=FX_SNAPSHOT,
+            )
+            split_results = SplitService.calculate(
+                net_amount=calculation.net_amount,
+                splits=list(case.splits),
+                currency=case.currency,
+            )
+        except Exception as exception:
+            return MoneyOutcome(error=type(exception).__name__)
+
+        return MoneyOutcome(
+            gross_amount=calculation.gross_amount,
+            platform_fee_amount=calculation.platform_fee_amount,
+            net_amount=calculation.net_amount,
+            split_amounts=tuple(split.amount for split in split_results),
+        )
+
+    @staticmethod
+    def check_invariants(case: MoneyCase, outcome: MoneyOutcome) -> List[str]:
+        if outcome.error is not None:
+            return []
+
+        quantum = CURRENCIES[case.currency].quantum
+        violations = []
+
+        if outcome.gross_amount != case.amount:
+            violations.append(f"gross {outcome.gross_amount} != amount {case.amount}")
+        if outcome.platform_fee_amount + outcome.net_amount != outcome.gross_amount:
+            violations.append(f"fee {outcome.platform_fee_amount} + net {outcome.net_amount} != gross {outcome.gross_amount}")
+        if sum(outcome.split_amounts) != outcome.net_amount:
+            violations.append(f"sum of splits {sum(outcome.split_amounts)} != net {outcome.net_amount}")
+
+        amounts = (outcome.platform_fee_amount, outcome.net_amount, *outcome.split_amounts)
+        if any(amount < 0 or amount != amount.quantize(quantum) for amount in amounts):
+            violations.append(f"amount negative or finer than {quantum} in {amounts}")
+
+        target = MoneyHarness._remainder_target(case.splits)
+        for position, (split, amount) in enumerate(zip(case.splits, outcome.split_amounts)):
+            floor = (outcome.net_amount * split.percent / 100).quantize(quantum, rounding=ROUND_DOWN)
+            if position != target and amount != floor:
+                violations.append(f"split {position} got {amount}, expected its floor share {floor}")
+            if position == target and amount < floor:
+                violations.append(f"remainder target {position} got {amount}, below its floor share {floor}")
+
+        return violations
+
+    @staticmethod
+    def run(*, cases: int, seed: int = 0, candidate: str = DEFAULT_CANDIDATE, workers: int = 1, chunk_size: int = 10_000, max_failures: int = 20) -> HarnessReport:
+        chunks = [
+            (seed, start, min(cases, start + chunk_size), candidate, max_failures)
+            for start in range(0, cases, chunk_size)
+        ]
+
+        report = HarnessReport()
+        started = time.perf_counter()
+        for checked, invalid, failures in MoneyHarness._map(chunks, workers=workers):
+            report.cases += checked
+            report.invalid_cases += invalid
+            report.failures.extend(failures[:max_failures - len(report.failures)])
+        report.seconds = time.perf_counter() - started
+        return report
+
+    @staticmethod
+    def check_chunk(seed: int, start: int, end: int, candidate_path: str, max_failures: int) -> Tuple[int, int, List[HarnessFailure]]:
+        candidate: Callable[[MoneyCase], MoneyOutcome] = import_string(candidate_path)
+        failures: List[HarnessFailure] = []
+        invalid = 0
+
+        for index in range(start, end):
+            expected, case_failures = MoneyHarness.check_case(MoneyHarness.generate(seed, index), candidate)
+            if expected.error is not None:
+                invalid += 1
+            failures.extend(case_failures[:max_failures - len(failures)])
+
+        return end - start, invalid, failures
+
+    @staticmethod
+    def check_case(case: MoneyCase, candidate: Callable[[MoneyCase], MoneyOutcome]) -> Tuple[MoneyOutcome, List[HarnessFailure]]:
+        expected = MoneyHarness.reference(case)
+        failures = [HarnessFailure(case, "invariant", violation) for violation in MoneyHarness.check_invariants(case, expected)]
+
+        try:
+            actual = candidate(case)
+        except Exception as exception:
+            actual = MoneyOutcome(error=type(exception).__name__)
+
+        if actual != expected:
+            failures.append(HarnessFailure(case, "differential", f"reference {expected} != candidate {actual}"))
+        return expected, failures
+
+    @staticmethod
+    def _map(chunks: list, *, workers: int) -> Iterator[Tuple[int, int, List[HarnessFailure]]]:
+        if workers <= 1:
+            for chunk in chunks:
+                yield MoneyHarness.check_chunk(*chunk)
+            return
+
+        context = multiprocessing.get_context("spawn")
+        with context.Pool(workers, initializer=django.setup) as pool:
+            yield from pool.imap_unordered(_check_chunk, chunks)
+
+    @staticmethod
+    def _splits(rng: random.Random) -> Tuple[SplitInput, ...]:
+        count = rng.randint(1, 5)
+        shape = rng.random()
+        if shape < 0.25 and 100 % count == 0:
+            percents = [100 // count] * count
+        elif shape < 0.4:
+            percents = [1] * (count - 1) + [100 - (count - 1)]
+            rng.shuffle(percents)
+        else:
+            cuts = sorted(rng.sample(range(1, 100), count - 1))
+            percents = [high - low for low, high in zip([0, *cuts], [*cuts, 100])]
+
+        return tuple(
+            SplitInput(recipient_id=f"recipient_{position}", role=rng.choice(ROLES), percent=percent)
+            for position, percent in enumerate(percents)
+        )
+
+    @staticmethod
+    def _remainder_target(splits: Tuple[SplitInput, ...]) -> int:
+        highest = max(split.percent for split in splits)
+        return next(position for position, split in enumerate(splits) if split.percent == highest)
+
+
+def _check_chunk(chunk: tuple) -> Tuple[int, int, List[HarnessFailure]]:
+    return MoneyHarness.check_chunk(*chunk)
+
+
+def integer_engine(case: MoneyCase) -> MoneyOutcome:
+    """Independent integer minor-unit implementation of fees and splits."""
+    currency = CURRENCIES.get(case.currency)
+    if currency is None:
+        return MoneyOutcome(error="UnsupportedCurrency")
+
+    scale = 10 ** currency.minor_units
+    minor = case.amount * scale
+    if minor != int(minor):
+        return MoneyOutcome(error="InvalidCurrencyAmount")
+    minor = int(minor)
+
+    if case.payment_method == "pix":
+        if case.installments != 1:
+            return MoneyOutcome(error="InvalidInstallments")
+        basis_points = 0
+    elif case.payment_method == "card":
+        if not 1 <= case.installments <= 12:
+            return MoneyOutcome(error="InvalidInstallments")
+        basis_points = 399 if case.installments == 1 else 499 + 200 * (case.installments - 1)
+    else:
+        return MoneyOutcome(error="UnsupportedPaymentMethod")
+
+    fee = (minor * basis_points + 5_000) // 10_000
+    net = minor - fee
+
+    shares = [net * split.percent // 100 for split in case.splits]
+    shares[MoneyHarness._remainder_target(case.splits)] += net - sum(shares)
+
+    def to_decimal(value: int) -> Decimal:
+        return Decimal(value).scaleb(-currency.minor_units)
+
+    return MoneyOutcome(
+        gross_amount=to_decimal(minor),
+        platform_fee_amount=to_decimal(fee),
+        net_amount=to_decimal(net),
+        split_amounts=tuple(to_decimal(share) for share in shares),
+    )
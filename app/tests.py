@@ -1,8 +1,35 @@
+import asyncio
+import dataclasses
+import hashlib
+import hmac
+import importlib
+import io
+import os
+import json
+import subprocess
+import sys
+import threading
+import time
 import pytest
-from decimal import Decimal
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal, ROUND_DOWN
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
 
-from app.models import Payment, OutboxEvent
-from app.services import PaymentService, SplitInput, IdempotencyConflict
+from asgiref.sync import async_to_sync
+from django.apps import apps as django_apps
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, connections
+from django.utils import timezone
+from django.test import AsyncClient
+from django.test.utils import CaptureQueriesContext
+
+from app.models import Payment, LedgerEntry, LedgerSnapshot, OutboxEvent, ShardMove, WebhookSubscription, WebhookDeadLetter, WebhookRetry
+from app.services import PaymentService, SplitInput, IdempotencyConflict, ShardService, IdempotencyFilter, GroupCommitWriter, ReconciliationService, LedgerSnapshotService, AdmissionService, InMemoryRateLimitBackend, CacheRateLimitBackend, EventCodec, FxService, QuoteCache, WebhookDispatcher, EventStreamService
+from app.services.idempotency_filter import BloomFilter
 
 def test_pix_zero_fee_single_split(db):
     result = PaymentService.confirm_payment(
@@ -127,3 +154,1001 @@ def test_idempotency_conflict_on_different_payload(db):
             installments=1,
             splits=[SplitInput(recipient_id="producer_1", role="producer", percent=100)],
         )
+
+def test_shard_for_is_stable_and_moves_few_keys_when_adding_a_shard(settings):
+    settings.PAYMENT_SHARD_KEY = "idempotency_key"
+    keys = [f"key-{i}" for i in range(1000)]
+
+    before = {key: ShardService.shard_for(idempotency_key=key, recipients=[], aliases=["shard_0", "shard_1", "shard_2"]) for key in keys}
+    again = {key: ShardService.shard_for(idempotency_key=key, recipients=[], aliases=["shard_0", "shard_1", "shard_2"]) for key in keys}
+    after = {key: ShardService.shard_for(idempotency_key=key, recipients=[], aliases=["shard_0", "shard_1", "shard_2", "shard_3"]) for key in keys}
+
+    assert before == again
+    assert set(before.values()) == {"shard_0", "shard_1", "shard_2"}
+
+    moved = [key for key in keys if before[key] != after[key]]
+    assert all(after[key] == "shard_3" for key in moved)
+    assert len(moved) < 400
+
+def test_shard_for_seller_routes_all_payments_of_a_seller_together(settings):
+    settings.PAYMENT_SHARD_KEY = "seller"
+    aliases = ["shard_0", "shard_1", "shard_2", "shard_3"]
+
+    shards = {
+        ShardService.shard_for(
+            idempotency_key=f"key-{i}",
+            recipients=[
+                SplitInput(recipient_id=f"affiliate_{i}", role="affiliate", percent=30),
+                SplitInput(recipient_id="producer_1", role="producer", percent=70),
+            ],
+            aliases=aliases,
+        )
+        for i in range(50)
+    }
+
+    assert len(shards) == 1
+
+@pytest.fixture
+def target_shard(transactional_db, settings, tmp_path):
+    # A second database, so rebalance_shards can move payments off `default`.
+    alias = "shard_0"
+    database = {**connections.settings["default"], "NAME": str(tmp_path / "shard_0.sqlite3")}
+    connections.settings[alias] = database
+    # Connect up front: the test case only allows connections to the
+    # databases it was set up with.
+    connections[alias].connect()
+    call_command("migrate", database=alias, verbosity=0)
+    yield alias
+    connections[alias].close()
+    del connections[alias]
+    del connections.settings[alias]
+
+def test_rebalance_shards_records_moved_ids_and_never_deletes_an_uncopied_payment(target_shard, settings):
+    settings.PAYMENT_SHARD_KEY = "seller"
+    splits = [SplitInput(recipient_id="producer_1", role="producer", percent=100)]
+    moved = PaymentService.confirm_payment(
+        idempotency_key="rebalance_1", amount=Decimal("100.00"), currency="BRL",
+        payment_method=Payment.PaymentMethod.PIX, installments=1, splits=splits,
+    )
+    moved_payment = Payment.objects.get(id=moved.payment_id)
+    moved_entry = LedgerEntry.objects.get(payment_id=moved.payment_id)
+    moved_event = OutboxEvent.objects.get(payment_id=moved.payment_id)
+    WebhookDeadLetter.objects.create(event=moved_event, subscription_id=1, url="https://partner.example/hooks", attempts=5, last_status=500)
+    WebhookRetry.objects.create(event=moved_event, subscription_id=2, url="https://crm.example/hooks", attempts=1, last_status=503, next_attempt_at=timezone.now())
+    LedgerSnapshotService.build(alias="default", safety_lag=timedelta(0))
+
+    # With seller sharding the target may already hold another seller's
+    # payment under the same key: the source must survive untouched.
+    settings.PAYMENT_SHARDS = [target_shard]
+    other = PaymentService.confirm_payment(
+        idempotency_key="rebalance_1", amount=Decimal("50.00"), currency="BRL",
+        payment_method=Payment.PaymentMethod.PIX, installments=1,
+        splits=[SplitInput(recipient_id="producer_2", role="producer", percent=100)],
+    )
+
+    with pytest.raises(CommandError, match="different payment"):
+        call_command("rebalance_shards", "--from-alias", "default", stdout=io.StringIO())
+    assert Payment.objects.filter(id=moved.payment_id).exists()
+    assert LedgerEntry.objects.filter(payment_id=moved.payment_id).count() == 1
+
+    Payment.objects.using(target_shard).filter(id=other.payment_id).delete()
+    call_command("rebalance_shards", "--from-alias", "default", stdout=io.StringIO())
+
+    assert not Payment.objects.filter(id=moved.payment_id).exists()
+    shard_move = ShardMove.objects.using(target_shard).get(source_alias="default", source_payment_id=moved.payment_id)
+    copy = Payment.objects.using(target_shard).get(id=shard_move.payment_id)
+    assert (copy.idempotency_key, copy.gross_amount, copy.created_at) == ("rebalance_1", Decimal("100.00"), moved_payment.created_at)
+
+    copied_entry = LedgerEntry.objects.using(target_shard).get(payment_id=copy.id)
+    assert shard_move.ledger_entry_ids == {str(moved_entry.id): copied_entry.id}
+    copied_event = OutboxEvent.objects.using(target_shard).get(payment_id=copy.id)
+    assert shard_move.outbox_event_ids == {str(moved_event.id): copied_event.id}
+    assert EventCodec.payload_of(copied_event)["payment_id"] == str(copy.id)
+
+    dead_letter = WebhookDeadLetter.objects.using(target_shard).get()
+    assert (dead_letter.event_id, dead_letter.attempts, dead_letter.last_status) == (copied_event.id, 5, 500)
+    retry = WebhookRetry.objects.using(target_shard).get()
+    assert (retry.event_id, retry.attempts, retry.last_status) == (copied_event.id, 1, 503)
+
+    # The source snapshot stops counting the moved entry; the copy counts on
+    # the target as delta above its watermark.
+    assert LedgerSnapshotService.verify(alias="default").mismatches == []
+    balances = [LedgerSnapshotService._shard_balance(alias, "producer_1", "BRL", None) for alias in ("default", target_shard)]
+    assert balances == [(Decimal("0.00"), 0), (Decimal("100.00"), 1)]
+
+@pytest.fixture
+def idempotency_filter(settings):
+    settings.IDEMPOTENCY_FILTER_ENABLED = True
+    IdempotencyFilter.reset()
+    yield IdempotencyFilter
+    IdempotencyFilter.reset()
+
+def test_idempotency_filter_skips_lookup_for_new_keys_and_replays_known_ones(db, idempotency_filter):
+    args = dict(
+        idempotency_key="filter-new",
+        amount=Decimal("100.00"),
+        currency="BRL",
+        payment_method=Payment.PaymentMethod.PIX,
+        installments=1,
+        splits=[SplitInput(recipient_id="producer_1", role="producer", percent=100)],
+    )
+    idempotency_filter.warm_up()
+
+    with CaptureQueriesContext(connection) as context:
+        result1 = PaymentService.confirm_payment(**args)
+    assert not any(query["sql"].startswith('SELECT "payments"') for query in context.captured_queries)
+
+    result2 = PaymentService.confirm_payment(**args)
+    assert result1.payment_id == result2.payment_id
+
+    stats = idempotency_filter.stats()
+    assert stats.keys == 1
+    assert stats.checks == 2
+    assert stats.negatives == 1
+    assert stats.memory_bytes > 0
+
+def test_idempotency_filter_miss_falls_back_to_unique_constraint(db, idempotency_filter):
+    args = dict(
+        idempotency_key="filter-other-process",
+        amount=Decimal("100.00"),
+        currency="BRL",
+        payment_method=Payment.PaymentMethod.PIX,
+        installments=1,
+        splits=[SplitInput(recipient_id="producer_1", role="producer", percent=100)],
+    )
+    result1 = PaymentService.confirm_payment(**args)
+
+    # Another process inserted the key: this process' filter has never seen it.
+    idempotency_filter.reset()
+    idempotency_filter._filter = BloomFilter(capacity=10, error_rate=0.01)
+
+    result2 = PaymentService.confirm_payment(**args)
+    assert result1.payment_id == result2.payment_id
+    assert Payment.objects.count() == 1
+
+    idempotency_filter._filter = BloomFilter(capacity=10, error_rate=0.01)
+    with pytest.raises(IdempotencyConflict):
+        PaymentService.confirm_payment(**{**args, "amount": Decimal("200.00")})
+
+def test_group_commit_resolves_each_caller_with_its_own_result(transactional_db, settings, monkeypatch):
+    settings.PAYMENT_GROUP_COMMIT_ENABLED = True
+    monkeypatch.setattr(GroupCommitWriter, "_instance", GroupCommitWriter(max_wait=0.2, max_batch_size=10))
+
+    def confirm(key, amount="100.00"):
+        return PaymentService.confirm_payment(
+            idempotency_key=key,
+            amount=Decimal(amount),
+            currency="BRL",
+            payment_method=Payment.PaymentMethod.CARD,
+            installments=3,
+            splits=[
+                SplitInput(recipient_id="producer_1", role="producer", percent=70),
+                SplitInput(recipient_id="affiliate_1", role="affiliate", percent=30),
+            ],
+        )
+
+    calls = [("group-1",), ("group-2",), ("group-1",), ("group-1", "50.00")]
+    with ThreadPoolExecutor(max_workers=len(calls)) as executor:
+        futures = [executor.submit(confirm, *call) for call in calls]
+
+    first, second, replay, conflict = futures
+    assert first.result().payment_id == replay.result().payment_id
+    assert first.result().payment_id != second.result().payment_id
+    assert second.result().net_amount == Decimal("91.01")
+    assert [r.amount for r in second.result().receivables] == [Decimal("63.71"), Decimal("27.30")]
+    assert isinstance(conflict.exception(), IdempotencyConflict)
+
+    assert Payment.objects.count() == 2
+    assert OutboxEvent.objects.count() == 2
+
+def test_group_commit_replays_identical_zero_decimal_payloads(transactional_db, settings, monkeypatch):
+    settings.PAYMENT_GROUP_COMMIT_ENABLED = True
+    monkeypatch.setattr(GroupCommitWriter, "_instance", GroupCommitWriter(max_wait=0.2, max_batch_size=10))
+    FxService.publish({"JPY": Decimal("0.0345")})
+
+    def confirm(_):
+        # Sent as the API does, with decimals the currency does not have.
+        return PaymentService.confirm_payment(
+            idempotency_key="group-jpy",
+            amount=Decimal("500.00"),
+            currency="JPY",
+            payment_method=Payment.PaymentMethod.PIX,
+            installments=1,
+            splits=[SplitInput(recipient_id="producer_1", role="producer", percent=100)],
+        )
+
+    try:
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            first, replay = executor.map(confirm, range(2))
+    finally:
+        FxService.reset()
+
+    assert first.payment_id == replay.payment_id
+    assert Payment.objects.count() == 1
+
+def test_api_profile_serves_payment_endpoints_like_the_default_profile(db, client, settings):
+    from config import settings_api
+
+    body = {
+        "amount": "100.00",
+        "currency": "BRL",
+        "payment_method": "card",
+        "installments": 3,
+        "splits": [{"recipient_id": "producer_1", "role": "producer", "percent": 100}],
+    }
+
+    default_response = client.post("/api/v1/payments", body, content_type="application/json", HTTP_IDEMPOTENCY_KEY="profile-default")
+
+    settings.MIDDLEWARE = settings_api.MIDDLEWARE
+    settings.ROOT_URLCONF = settings_api.ROOT_URLCONF
+    settings.REST_FRAMEWORK = settings_api.REST_FRAMEWORK
+
+    api_response = client.post("/api/v1/payments", body, content_type="application/json", HTTP_IDEMPOTENCY_KEY="profile-api")
+    quote_response = client.post("/api/v1/checkout/quote", body, content_type="application/json")
+
+    assert api_response.status_code == default_response.status_code == 201
+    assert {**api_response.json(), "payment_id": None} == {**default_response.json(), "payment_id": None}
+    assert quote_response.json() == {
+        "gross_amount": 100.0,
+        "platform_fee_amount": 8.99,
+        "net_amount": 91.01,
+        "currency": "BRL",
+        "settlement": {"currency": "BRL", "net_amount": 91.01, "fx_rate_version": None},
+    }
+
+def test_api_profile_loads_only_the_services_of_the_endpoints_it_serves():
+    script = """
+import sys
+import django
+django.setup()
+from django.urls import resolve
+resolve("/api/v1/payments")
+print(",".join(sorted(name.rsplit(".", 1)[1] for name in sys.modules if name.startswith("app.services."))))
+"""
+    loaded = subprocess.run(
+        [sys.executable, "-c", script],
+        env={**os.environ, "DJANGO_SETTINGS_MODULE": "config.settings_api"},
+        capture_output=True, text=True, check=True,
+    ).stdout.strip().split(",")
+
+    assert "payment_service" in loaded and "quote_cache" in loaded
+    for unused in ("statement_service", "ledger_snapshot_service", "event_stream_service", "group_commit", "reconciliation_service", "webhook_dispatcher"):
+        assert unused not in loaded
+
+def test_lazy_views_and_exception_mapping_still_serve_every_endpoint(db, client):
+    assert client.get("/api/v1/recipients/producer_1/statement", {"currency": "BRL"}).status_code == 200
+    assert client.get("/api/v1/recipients/producer_1/statement", {"currency": "BRL", "cursor": "garbage"}).status_code == 400
+    assert client.get("/api/v1/events", {"cursor": "garbage"}).status_code == 400
+    assert client.post("/api/v1/events/consumers/crm/offsets", {"cursor": "garbage"}, content_type="application/json").status_code == 400
+
+def test_binary_outbox_payloads_decode_to_the_json_payload_and_migrate_both_ways(db, settings):
+    from django.core.management import call_command
+
+    args = dict(
+        amount=Decimal("100.00"),
+        currency="BRL",
+        payment_method=Payment.PaymentMethod.CARD,
+        installments=3,
+        splits=[
+            SplitInput(recipient_id="producer_1", role="producer", percent=70),
+            SplitInput(recipient_id="partner_ção", role="partner", percent=30),
+        ],
+    )
+
+    PaymentService.confirm_payment(idempotency_key="codec-json", **args)
+    settings.OUTBOX_PAYLOAD_ENCODING = "binary"
+    PaymentService.confirm_payment(idempotency_key="codec-binary", **args)
+
+    json_event, binary_event = OutboxEvent.objects.order_by("id")
+    assert json_event.payload_bin is None
+    assert binary_event.payload is None
+    assert len(binary_event.payload_bin) < len(json.dumps(json_event.payload)) / 2
+    assert EventCodec.payload_of(binary_event) == {**json_event.payload, "payment_id": str(binary_event.payment_id)}
+
+    original = json_event.payload
+    call_command("compact_outbox_payloads", "--to", "binary", stdout=io.StringIO())
+    json_event.refresh_from_db()
+    assert json_event.payload is None
+    assert EventCodec.payload_of(json_event) == original
+
+    call_command("compact_outbox_payloads", "--to", "json", stdout=io.StringIO())
+    assert [event.payload_bin for event in OutboxEvent.objects.all()] == [None, None]
+    assert OutboxEvent.objects.get(id=json_event.id).payload == original
+
+@pytest.fixture
+def fx_rates(db):
+    FxService.publish({"USD": Decimal("5.1234"), "JPY": Decimal("0.0345")})
+    yield
+    FxService.reset()
+    QuoteCache.clear()
+
+def test_zero_decimal_currency_fees_and_splits_stay_in_whole_units(fx_rates):
+    result = PaymentService.confirm_payment(
+        idempotency_key="jpy-1",
+        amount=Decimal("10001"),
+        currency="JPY",
+        payment_method=Payment.PaymentMethod.CARD,
+        installments=1,
+        splits=[
+            SplitInput(recipient_id="producer_1", role="producer", percent=67),
+            SplitInput(recipient_id="affiliate_1", role="affiliate", percent=33),
+        ],
+    )
+
+    assert result.platform_fee_amount == Decimal("399")
+    assert result.net_amount == Decimal("9602")
+    assert [r.amount for r in result.receivables] == [Decimal("6434"), Decimal("3168")]
+    assert result.settlement_net_amount == Decimal("331.27")
+    assert result.fx_rate_version == 1
+    assert set(LedgerEntry.objects.values_list("currency", flat=True)) == {"JPY"}
+
+def test_payments_from_before_settlement_amounts_replay_and_are_backfilled(db, client):
+    backfill = importlib.import_module("app.migrations.0009_backfill_settlement_net_amount").backfill_settlement_net_amount
+    body = {
+        "amount": "100.00",
+        "currency": "BRL",
+        "payment_method": "pix",
+        "installments": 1,
+        "splits": [{"recipient_id": "producer_1", "role": "producer", "percent": 100}],
+    }
+
+    def confirm():
+        return client.post("/api/v1/payments", body, content_type="application/json", HTTP_IDEMPOTENCY_KEY="pre-fx")
+
+    payment_id = confirm().json()["payment_id"]
+    Payment.objects.filter(id=payment_id).update(settlement_net_amount=None, fx_rate_version=None)
+
+    replay = confirm()
+    assert replay.status_code == 201
+    assert replay.json()["settlement"] == {"currency": "BRL", "net_amount": None, "fx_rate_version": None}
+
+    backfill(django_apps, SimpleNamespace(connection=connection))
+    assert confirm().json()["settlement"]["net_amount"] == 100.0
+
+def test_fx_rate_version_is_pinned_per_payment_and_quotes_skip_the_database(fx_rates, client, django_assert_num_queries):
+    body = {
+        "amount": "100.00",
+        "currency": "usd",
+        "payment_method": "pix",
+        "installments": 1,
+        "splits": [{"recipient_id": "producer_1", "role": "producer", "percent": 100}],
+    }
+
+    first = client.post("/api/v1/payments", body, content_type="application/json", HTTP_IDEMPOTENCY_KEY="usd-1")
+    FxService.publish({"USD": Decimal("5.50")})
+    second = client.post("/api/v1/payments", body, content_type="application/json", HTTP_IDEMPOTENCY_KEY="usd-2")
+    replay = client.post("/api/v1/payments", body, content_type="application/json", HTTP_IDEMPOTENCY_KEY="usd-1")
+
+    assert first.json()["settlement"] == {"currency": "BRL", "net_amount": 512.34, "fx_rate_version": 1}
+    assert second.json()["settlement"] == {"currency": "BRL", "net_amount": 550.0, "fx_rate_version": 2}
+    assert replay.json()["settlement"] == first.json()["settlement"]
+
+    with django_assert_num_queries(0):
+        quote = client.post("/api/v1/checkout/quote", body, content_type="application/json")
+    assert quote.json()["settlement"]["fx_rate_version"] == 2
+
+    body["amount"] = "100.50"
+    body["currency"] = "JPY"
+    assert client.post("/api/v1/checkout/quote", body, content_type="application/json").status_code == 400
+    body["currency"] = "GBP"
+    assert client.post("/api/v1/checkout/quote", body, content_type="application/json").status_code == 503
+
+def remainder_to_last_recipient(case):
+    from app.services.currency_service import CURRENCIES
+    from app.testing.money_harness import integer_engine
+
+    outcome = integer_engine(case)
+    if outcome.error is not None:
+        return outcome
+
+    quantum = CURRENCIES[case.currency].quantum
+    shares = [(outcome.net_amount * split.percent / 100).quantize(quantum, rounding=ROUND_DOWN) for split in case.splits]
+    shares[-1] += outcome.net_amount - sum(shares)
+    return dataclasses.replace(outcome, split_amounts=tuple(shares))
+
+def test_money_harness_finds_no_violations_and_catches_a_diverging_candidate():
+    from app.testing.money_harness import MoneyHarness
+
+    report = MoneyHarness.run(cases=3_000, seed=1)
+    assert report.cases == 3_000
+    assert report.invalid_cases > 0
+    assert report.failures == []
+
+    broken = MoneyHarness.run(cases=3_000, seed=1, candidate="app.tests.remainder_to_last_recipient", max_failures=5)
+    assert len(broken.failures) == 5
+    assert {failure.kind for failure in broken.failures} == {"differential"}
+
+def test_token_bucket_allows_burst_then_refills_at_rate():
+    now = [0.0]
+    backend = InMemoryRateLimitBackend(clock=lambda: now[0])
+
+    assert [backend.consume("seller", rate=2, burst=3) for _ in range(3)] == [0, 0, 0]
+    assert backend.consume("seller", rate=2, burst=3) == pytest.approx(0.5)
+    assert backend.consume("other", rate=2, burst=3) == 0
+
+    now[0] = 0.5
+    assert backend.consume("seller", rate=2, burst=3) == 0
+    assert backend.consume("seller", rate=2, burst=3) > 0
+
+def test_cache_rate_limit_backend_never_overshoots_under_concurrent_workers(monkeypatch):
+    cache = caches["default"]
+    cache.clear()
+    now = [0.0]
+    backend = CacheRateLimitBackend(clock=lambda: now[0])
+
+    # Widen the read-modify-write window so unsynchronised workers would collide.
+    get = cache.get
+    def slow_get(*args, **kwargs):
+        value = get(*args, **kwargs)
+        time.sleep(0.001)
+        return value
+
+    monkeypatch.setattr(cache, "get", slow_get)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        waits = list(pool.map(lambda _: backend.consume("seller", rate=2, burst=10), range(20)))
+
+    assert waits.count(0) == 10
+    assert backend.consume("seller", rate=2, burst=10) == pytest.approx(0.5)
+
+    now[0] = 0.5
+    assert backend.consume("seller", rate=2, burst=10) == 0
+    assert backend.consume("seller", rate=2, burst=10) > 0
+
+    # A lock left behind by a dead worker rejects instead of skipping the check.
+    cache.add("admission:other:lock", 1)
+    assert backend.consume("other", rate=2, burst=10) == pytest.approx(0.5)
+
+def test_admission_control_charges_the_global_bucket_only_for_admitted_sellers(settings):
+    settings.ADMISSION_RATE_PER_SECOND = 0.001
+    settings.ADMISSION_BURST = 3
+    settings.ADMISSION_SELLER_RATE_PER_SECOND = 0.001
+    settings.ADMISSION_SELLER_BURST = 1
+
+    assert AdmissionService._rate_limit_wait("noisy") == 0
+    assert all(AdmissionService._rate_limit_wait("noisy") > 0 for _ in range(20))
+    assert AdmissionService._rate_limit_wait("quiet_1") == 0
+    assert AdmissionService._rate_limit_wait("quiet_2") == 0
+    assert AdmissionService._rate_limit_wait("quiet_3") > 0
+
+def test_admission_control_rejects_new_work_fast_but_answers_replays(db, client, settings, idempotency_filter):
+    settings.ADMISSION_CONTROL_ENABLED = True
+    settings.ADMISSION_SELLER_RATE_PER_SECOND = 0.1
+    settings.ADMISSION_SELLER_BURST = 1
+    settings.ADMISSION_MAX_CONCURRENT_PER_SELLER = 1
+    settings.ADMISSION_QUEUE_TIMEOUT_MS = 0
+
+    body = {
+        "amount": "100.00",
+        "currency": "BRL",
+        "payment_method": "pix",
+        "installments": 1,
+        "splits": [{"recipient_id": "producer_1", "role": "producer", "percent": 100}],
+    }
+
+    def confirm(key):
+        return client.post("/api/v1/payments", body, content_type="application/json", HTTP_IDEMPOTENCY_KEY=key)
+
+    first = confirm("admission-1")
+    throttled = confirm("admission-2")
+    throttled_replay = confirm("admission-1")
+
+    assert first.status_code == 201
+    assert throttled.status_code == 429
+    assert throttled["Retry-After"] == "10"
+    assert throttled_replay.status_code == 201
+    assert throttled_replay.json()["payment_id"] == first.json()["payment_id"]
+
+    settings.ADMISSION_SELLER_BURST = 100
+    assert AdmissionService.limiter().acquire("producer_1")
+    try:
+        overloaded = confirm("admission-3")
+        overloaded_replay = confirm("admission-1")
+    finally:
+        AdmissionService.limiter().release("producer_1")
+
+    assert overloaded.status_code == 503
+    assert overloaded["Retry-After"] == "1"
+    assert overloaded_replay.status_code == 201
+    assert confirm("admission-3").status_code == 201
+    assert Payment.objects.count() == 2
+
+def test_admission_control_sheds_without_a_lookup_when_the_filter_is_off(db, client, settings, django_assert_num_queries):
+    settings.ADMISSION_CONTROL_ENABLED = True
+    settings.ADMISSION_SELLER_RATE_PER_SECOND = 0.1
+    settings.ADMISSION_SELLER_BURST = 1
+
+    body = {
+        "amount": "100.00",
+        "currency": "BRL",
+        "payment_method": "pix",
+        "installments": 1,
+        "splits": [{"recipient_id": "producer_shed", "role": "producer", "percent": 100}],
+    }
+    assert client.post("/api/v1/payments", body, content_type="application/json", HTTP_IDEMPOTENCY_KEY="shed-1").status_code == 201
+
+    with django_assert_num_queries(0):
+        for key in ("shed-1", "shed-2"):
+            assert client.post("/api/v1/payments", body, content_type="application/json", HTTP_IDEMPOTENCY_KEY=key).status_code == 429
+
+def test_recipient_statement_paginates_newest_first_with_running_balance(db, client):
+    for index, amount in enumerate(["10.00", "20.00", "30.00", "40.00", "50.00"]):
+        PaymentService.confirm_payment(
+            idempotency_key=f"statement-{index}",
+            amount=Decimal(amount),
+            currency="BRL",
+            payment_method=Payment.PaymentMethod.PIX,
+            installments=1,
+            splits=[
+                SplitInput(recipient_id="producer_statement", role="producer", percent=50),
+                SplitInput(recipient_id="affiliate_statement", role="affiliate", percent=50),
+            ],
+        )
+
+    entries = []
+    cursor = None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/api/v1/recipients/producer_statement/statement", params)
+        assert response.status_code == 200
+
+        body = response.json()
+        assert body["closing_balance"] == 75.0
+        entries.extend(body["entries"])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+
+    assert [entry["amount"] for entry in entries] == [25.0, 20.0, 15.0, 10.0, 5.0]
+    assert [entry["running_balance"] for entry in entries] == [75.0, 50.0, 30.0, 15.0, 5.0]
+
+    response = client.get("/api/v1/recipients/producer_statement/statement", {"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+def test_recipient_statement_closing_balance_reads_snapshots_and_cursors_are_signed(db, client):
+    for index, amount in enumerate(["10.00", "20.00", "30.00", "40.00", "50.00", "60.00"]):
+        if index == 5:
+            LedgerSnapshotService.build(alias="default", safety_lag=timedelta(0))
+        PaymentService.confirm_payment(
+            idempotency_key=f"statement-snapshot-{index}",
+            amount=Decimal(amount),
+            currency="BRL",
+            payment_method=Payment.PaymentMethod.PIX,
+            installments=1,
+            splits=[SplitInput(recipient_id="producer_snapshot", role="producer", percent=100)],
+        )
+    url = "/api/v1/recipients/producer_snapshot/statement"
+
+    with CaptureQueriesContext(connection) as queries:
+        body = client.get(url, {"limit": 2}).json()
+    assert body["closing_balance"] == 210.0
+    sums = [query["sql"] for query in queries if "SUM(" in query["sql"]]
+    assert sums and all('"ledger_entries"."id" >' in sql for sql in sums)
+
+    created = list(LedgerEntry.objects.filter(recipient_id="producer_snapshot").order_by("id").values_list("created_at", flat=True))
+    period = {"start": created[2].isoformat(), "end": created[5].isoformat()}
+    page = client.get(url, period).json()
+    assert page["closing_balance"] == 120.0
+    assert [entry["running_balance"] for entry in page["entries"]] == [120.0, 70.0, 30.0]
+
+    # A forged or reused cursor cannot carry balances into another page.
+    cursor = body["next_cursor"]
+    payload, signature = cursor.rsplit(":", 1)
+    assert client.get(url, {"cursor": payload + ":" + signature[::-1]}).status_code == 400
+    assert client.get(url, {"cursor": cursor, "currency": "BRL"}).status_code == 400
+    assert client.get("/api/v1/recipients/producer_statement/statement", {"cursor": cursor}).status_code == 400
+    assert client.get(url, {"cursor": cursor, "limit": 2}).json()["entries"][0]["running_balance"] == 100.0
+
+def test_recipient_statement_requires_currency_when_balances_span_currencies(fx_rates, client):
+    for currency, amount in [("BRL", "100.00"), ("USD", "10.00"), ("BRL", "50.00")]:
+        PaymentService.confirm_payment(
+            idempotency_key=f"statement-{currency}-{amount}",
+            amount=Decimal(amount),
+            currency=currency,
+            payment_method=Payment.PaymentMethod.PIX,
+            installments=1,
+            splits=[SplitInput(recipient_id="producer_fx", role="producer", percent=100)],
+        )
+
+    response = client.get("/api/v1/recipients/producer_fx/statement")
+    assert response.status_code == 400
+    assert "BRL, USD" in response.json()["detail"]
+
+    body = client.get("/api/v1/recipients/producer_fx/statement", {"currency": "BRL"}).json()
+    assert body["closing_balance"] == 150.0
+    assert [entry["running_balance"] for entry in body["entries"]] == [150.0, 100.0]
+
+    body = client.get("/api/v1/recipients/producer_fx/statement", {"currency": "usd"}).json()
+    assert body["closing_balance"] == 10.0
+    assert [entry["currency"] for entry in body["entries"]] == ["USD"]
+
+def test_reconciliation_reports_discrepancies_and_resumes_from_checkpoint(db, tmp_path):
+    payment_ids = []
+    for index in range(6):
+        result = PaymentService.confirm_payment(
+            idempotency_key=f"reconcile-{index}",
+            amount=Decimal("10.01"),
+            currency="BRL",
+            payment_method=Payment.PaymentMethod.CARD,
+            installments=3,
+            splits=[
+                SplitInput(recipient_id="producer_1", role="producer", percent=70),
+                SplitInput(recipient_id="affiliate_1", role="affiliate", percent=30),
+            ],
+        )
+        payment_ids.append(int(result.payment_id))
+
+    LedgerEntry.objects.filter(payment_id=payment_ids[1], role="affiliate").update(amount=Decimal("0.01"))
+    OutboxEvent.objects.filter(payment_id=payment_ids[4]).delete()
+
+    report = tmp_path / "report.jsonl"
+    checkpoint = tmp_path / "checkpoint.jsonl"
+
+    summary = ReconciliationService.reconcile(report_path=report, checkpoint_path=checkpoint, chunk_size=2)
+    assert summary.completed
+    assert summary.payments == 6
+    assert summary.discrepancies == 2
+
+    lines = [json.loads(line) for line in report.read_text().splitlines()]
+    assert [(line["payment_id"], line["kind"]) for line in lines] == [
+        (payment_ids[1], "ledger_total_mismatch"),
+        (payment_ids[4], "captured_event_count"),
+    ]
+
+    resumed = ReconciliationService.reconcile(report_path=report, checkpoint_path=checkpoint, chunk_size=2)
+    assert resumed.ranges == 0
+    assert resumed.skipped_ranges == summary.ranges
+
+    # Killed after reporting the last range but mid-way through its
+    # checkpoint line: the range is checked again, reported once.
+    checkpoint.write_text("".join(checkpoint.read_text().splitlines(keepends=True)[:-1]) + '{"alias":"def')
+    resumed = ReconciliationService.reconcile(report_path=report, checkpoint_path=checkpoint, chunk_size=2)
+    assert (resumed.ranges, resumed.skipped_ranges, resumed.discrepancies) == (1, summary.ranges - 1, 1)
+    assert [json.loads(line) for line in report.read_text().splitlines()] == lines
+    assert all(json.loads(line) for line in checkpoint.read_text().splitlines())
+
+def test_ledger_snapshots_answer_balance_as_of_and_are_verifiable_and_rebuildable(db, client):
+    def confirm(index):
+        PaymentService.confirm_payment(
+            idempotency_key=f"snapshot-{index}",
+            amount=Decimal("10.01"),
+            currency="BRL",
+            payment_method=Payment.PaymentMethod.CARD,
+            installments=3,
+            splits=[
+                SplitInput(recipient_id="producer_snapshot", role="producer", percent=70),
+                SplitInput(recipient_id="affiliate_snapshot", role="affiliate", percent=30),
+            ],
+        )
+
+    for index in range(5):
+        confirm(index)
+    start = timezone.now() - timedelta(days=10)
+    for day, entry in enumerate(LedgerEntry.objects.filter(recipient_id="producer_snapshot").order_by("id")):
+        LedgerEntry.objects.filter(payment_id=entry.payment_id).update(created_at=start + timedelta(days=day))
+
+    result = LedgerSnapshotService.build(alias="default", chunk_size=3, step_size=4, safety_lag=timedelta(0))
+    assert result.entries == 10
+    assert result.steps == 3
+    confirm(5)
+
+    def raw_balance(as_of=None):
+        entries = LedgerEntry.objects.filter(recipient_id="producer_snapshot")
+        if as_of is not None:
+            entries = entries.filter(created_at__lte=as_of)
+        return sum((entry.amount for entry in entries), Decimal("0.00"))
+
+    current = LedgerSnapshotService.balance(recipient_id="producer_snapshot")
+    assert current.balance == raw_balance()
+    assert current.delta_entries == 1
+
+    as_of = start + timedelta(days=2, hours=12)
+    past = LedgerSnapshotService.balance(recipient_id="producer_snapshot", as_of=as_of)
+    assert past.balance == raw_balance(as_of) != current.balance
+
+    response = client.get("/api/v1/recipients/producer_snapshot/balance", {"as_of": as_of.isoformat()})
+    assert response.status_code == 200
+    assert response.json()["balance"] == float(raw_balance(as_of))
+
+    assert LedgerSnapshotService.verify(alias="default").mismatches == []
+    LedgerSnapshot.objects.filter(recipient_id="affiliate_snapshot").update(cumulative_amount=Decimal("0.01"))
+    assert len(LedgerSnapshotService.verify(alias="default").mismatches) == 3
+
+    LedgerSnapshotService.rebuild(alias="default", safety_lag=timedelta(0))
+    assert LedgerSnapshotService.verify(alias="default").mismatches == []
+    assert LedgerSnapshotService.balance(recipient_id="affiliate_snapshot").delta_entries == 0
+
+class WebhookReceiver(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    requests = []
+    failures_left = {}
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        self.requests.append((self.path, dict(self.headers), body, self.client_address[1]))
+
+        if self.path == "/no-content":
+            self.send_response(204)
+            self.send_header("Connection", "keep-alive")
+            self.end_headers()
+            return
+
+        status = 410 if self.path == "/gone" else 200
+        if self.failures_left.get(self.path, 0) > 0:
+            self.failures_left[self.path] -= 1
+            status = 503
+        self.send_response(status)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def webhook_receiver(settings):
+    settings.WEBHOOK_MAX_ATTEMPTS = 3
+    settings.WEBHOOK_BACKOFF_BASE_SECONDS = 0.01
+    WebhookReceiver.requests = []
+    WebhookReceiver.failures_left = {"/flaky": 2, "/down": 99}
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), WebhookReceiver)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_webhook_dispatcher_signs_retries_and_dead_letters(transactional_db, webhook_receiver):
+    for path, recipient_id in [("/ok", ""), ("/flaky", "affiliate_hook"), ("/down", ""), ("/gone", ""), ("/other", "someone_else")]:
+        WebhookSubscription.objects.create(url=f"{webhook_receiver}{path}", secret="s3cret", recipient_id=recipient_id)
+    WebhookSubscription.objects.create(url=f"{webhook_receiver}/inactive", secret="s3cret", active=False)
+
+    for index in range(3):
+        PaymentService.confirm_payment(
+            idempotency_key=f"webhook-{index}",
+            amount=Decimal("10.01"),
+            currency="BRL",
+            payment_method=Payment.PaymentMethod.PIX,
+            installments=1,
+            splits=[
+                SplitInput(recipient_id="producer_hook", role="producer", percent=70),
+                SplitInput(recipient_id="affiliate_hook", role="affiliate", percent=30),
+            ],
+        )
+
+    summary = WebhookDispatcher.dispatch(batch_size=2)
+    assert (summary.events, summary.deliveries, summary.delivered, summary.dead_lettered) == (3, 12, 6, 6)
+    assert set(OutboxEvent.objects.values_list("status", flat=True)) == {OutboxEvent.Status.PUBLISHED}
+
+    requests = WebhookReceiver.requests
+    paths = [path for path, _, _, _ in requests]
+    assert paths.count("/ok") == 3
+    assert paths.count("/flaky") == 3 + 2
+    assert paths.count("/down") == 3 * 3
+    assert paths.count("/gone") == 3
+    assert "/other" not in paths and "/inactive" not in paths
+
+    _, headers, body, _ = requests[0]
+    signature = hmac.new(b"s3cret", headers["X-Webhook-Timestamp"].encode() + b"." + body, hashlib.sha256).hexdigest()
+    assert headers["X-Webhook-Signature"] == f"v1={signature}"
+    event = json.loads(body)
+    assert event["type"] == "payment_captured"
+    assert [receivable["recipient_id"] for receivable in event["data"]["receivables"]] == ["producer_hook", "affiliate_hook"]
+
+    # Keep-alive: far fewer connections than requests.
+    assert len({port for _, _, _, port in requests}) < len(requests) // 2
+
+    dead_letters = WebhookDeadLetter.objects.order_by("url", "event_id")
+    assert [(letter.url.rsplit("/", 1)[1], letter.attempts, letter.last_status) for letter in dead_letters] == [
+        ("down", 3, 503)] * 3 + [("gone", 1, 410)] * 3
+
+    assert WebhookDispatcher.dispatch().events == 0
+
+
+def test_webhook_dispatcher_reschedules_failures_instead_of_holding_the_batch(transactional_db, webhook_receiver, settings, monkeypatch):
+    settings.WEBHOOK_BACKOFF_BASE_SECONDS = 60
+    settings.WEBHOOK_BACKOFF_MAX_SECONDS = 60
+    monkeypatch.setattr(WebhookDispatcher, "backoff", staticmethod(lambda attempt: 60))
+    for path in ("/ok", "/down"):
+        WebhookSubscription.objects.create(url=f"{webhook_receiver}{path}", secret="s3cret")
+    for index in range(2):
+        PaymentService.confirm_payment(
+            idempotency_key=f"webhook-retry-{index}",
+            amount=Decimal("10.00"),
+            currency="BRL",
+            payment_method=Payment.PaymentMethod.PIX,
+            installments=1,
+            splits=[SplitInput(recipient_id="producer_hook", role="producer", percent=100)],
+        )
+
+    # The dead endpoint gets one attempt per claim; its backoff is stored, not slept.
+    summary = WebhookDispatcher.dispatch(batch_size=1, max_seconds=0.5)
+    assert (summary.events, summary.delivered, summary.retries, summary.dead_lettered) == (2, 2, 2, 0)
+    assert set(OutboxEvent.objects.values_list("status", flat=True)) == {OutboxEvent.Status.PUBLISHED}
+    assert [path for path, _, _, _ in WebhookReceiver.requests].count("/down") == 2
+    retries = WebhookRetry.objects.order_by("event_id")
+    assert [(retry.attempts, retry.last_status, retry.claimed_at) for retry in retries] == [(1, 503, None)] * 2
+    assert all(retry.next_attempt_at > timezone.now() + timedelta(seconds=50) for retry in retries)
+
+    monkeypatch.setattr(WebhookDispatcher, "backoff", staticmethod(lambda attempt: 0))
+    WebhookRetry.objects.update(next_attempt_at=timezone.now())
+    summary = WebhookDispatcher.dispatch()
+    assert (summary.events, summary.delivered, summary.dead_lettered) == (0, 0, 2)
+    assert not WebhookRetry.objects.exists()
+    assert [path for path, _, _, _ in WebhookReceiver.requests].count("/down") == 2 * 3
+    assert list(WebhookDeadLetter.objects.values_list("attempts", "last_status")) == [(3, 503)] * 2
+
+
+def test_webhook_dispatcher_accepts_204_on_a_keep_alive_connection(transactional_db, webhook_receiver, settings):
+    settings.WEBHOOK_TIMEOUT_SECONDS = 2
+    WebhookSubscription.objects.create(url=f"{webhook_receiver}/no-content", secret="s3cret")
+    for index in range(2):
+        PaymentService.confirm_payment(
+            idempotency_key=f"webhook-204-{index}",
+            amount=Decimal("10.00"),
+            currency="BRL",
+            payment_method=Payment.PaymentMethod.PIX,
+            installments=1,
+            splits=[SplitInput(recipient_id="producer_hook", role="producer", percent=100)],
+        )
+
+    summary = WebhookDispatcher.dispatch(batch_size=1)
+    assert (summary.deliveries, summary.delivered, summary.dead_lettered) == (2, 2, 0)
+    assert summary.seconds < 1
+    assert len(WebhookReceiver.requests) == 2
+    assert len({port for _, _, _, port in WebhookReceiver.requests}) == 1
+    assert not WebhookDeadLetter.objects.exists()
+
+def test_quote_cache_serves_etags_and_is_invalidated_by_a_new_fee_schedule(db, client, settings, django_assert_num_queries):
+    settings.QUOTE_CACHE_MAX_ENTRIES = 2
+    params = {"amount": "100.00", "currency": "BRL", "payment_method": "card", "installments": 3}
+
+    first = client.get("/api/v1/checkout/quote", params)
+    assert first.status_code == 200
+    assert first.json()["platform_fee_amount"] == 8.99
+    assert first["Cache-Control"] == "public, max-age=30"
+
+    with django_assert_num_queries(0):
+        repeat = client.get("/api/v1/checkout/quote", {**params, "amount": "100.0", "payment_method": "CARD"})
+    assert repeat.content == first.content
+    assert repeat["ETag"] == first["ETag"]
+
+    not_modified = client.get("/api/v1/checkout/quote", params, HTTP_IF_NONE_MATCH=first["ETag"])
+    assert not_modified.status_code == 304
+    assert not_modified["ETag"] == first["ETag"]
+
+    posted = client.post("/api/v1/checkout/quote", {**params, "splits": [{"recipient_id": "producer_1", "role": "producer", "percent": 100}]}, content_type="application/json")
+    assert posted.content == first.content
+
+    assert client.get("/api/v1/checkout/quote", {**params, "installments": 13}).status_code == 400
+    client.get("/api/v1/checkout/quote", {**params, "installments": 2})
+    client.get("/api/v1/checkout/quote", {**params, "installments": 4})
+    assert QuoteCache.size() == 2
+
+    settings.PLATFORM_FEE_SCHEDULE = {**settings.PLATFORM_FEE_SCHEDULE, "card_per_extra_installment": "0.01"}
+    assert QuoteCache.size() == 0
+    changed = client.get("/api/v1/checkout/quote", params, HTTP_IF_NONE_MATCH=first["ETag"])
+    assert changed.status_code == 200
+    assert changed.json()["platform_fee_amount"] == 6.99
+    assert changed["ETag"] != first["ETag"]
+
+    for amount in ["sNaN", "NaN", "Infinity"]:
+        assert client.get("/api/v1/checkout/quote", {**params, "amount": amount}).status_code == 400
+
+@pytest.fixture
+def event_stream(settings):
+    settings.EVENT_STREAM_POLL_INTERVAL_MS = 0
+    settings.EVENT_STREAM_BUFFER_SIZE = 2
+    settings.EVENT_STREAM_HEARTBEAT_SECONDS = 0.05
+    EventStreamService.reset()
+    yield
+    EventStreamService.reset()
+
+
+def test_event_stream_resumes_from_cursors_and_consumer_offsets(db, client, settings, event_stream):
+    def confirm(index):
+        return PaymentService.confirm_payment(
+            idempotency_key=f"stream-{index}",
+            amount=Decimal("10.00"),
+            currency="BRL",
+            payment_method=Payment.PaymentMethod.PIX,
+            installments=1,
+            splits=[SplitInput(recipient_id="producer_stream", role="producer", percent=100)],
+        ).payment_id
+
+    settings.OUTBOX_PAYLOAD_ENCODING = "binary"
+    payment_ids = [confirm(index) for index in range(4)]
+
+    # The shared buffer only holds the latest two events: the first page is
+    # read from the outbox by primary key, the rest from memory.
+    first = client.get("/api/v1/events", {"limit": 3, "wait": 0}).json()
+    assert [event["payment_id"] for event in first["events"]] == payment_ids[:3]
+    assert first["events"][0]["data"]["receivables"][0]["amount"] == "10.00"
+    assert [event["sequence"] for event in first["events"]] == sorted(event["sequence"] for event in first["events"])
+
+    response = client.post("/api/v1/events/consumers/risk/offsets", {"cursor": first["cursor"]}, content_type="application/json")
+    assert response.status_code == 200
+    client.post("/api/v1/events/consumers/risk/offsets", {"cursor": EventStreamService.encode_cursor({"default": 1})}, content_type="application/json")
+
+    resumed = client.get("/api/v1/events", {"consumer": "risk", "wait": 0}).json()
+    assert [event["payment_id"] for event in resumed["events"]] == payment_ids[3:]
+    assert client.get("/api/v1/events", {"cursor": resumed["cursor"], "wait": 0}).json()["events"] == []
+    assert client.get("/api/v1/events", {"start": "latest", "wait": 0.05}).json()["events"] == []
+
+    payment_ids.append(confirm(4))
+    tail = client.get("/api/v1/events", {"cursor": resumed["cursor"], "wait": 1}).json()
+    assert [event["payment_id"] for event in tail["events"]] == payment_ids[4:]
+
+    streamed = client.get("/api/v1/events/stream", {"cursor": first["cursor"], "timeout": 0.2})
+    assert streamed["Content-Type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in b"".join(streamed.streaming_content).splitlines()]
+    assert [line["payment_id"] for line in lines if line.get("type") == "payment_captured"] == payment_ids[3:]
+    assert lines[-1]["type"] == "cursor"
+    assert EventStreamService.decode_cursor(lines[-1]["cursor"]) == EventStreamService.decode_cursor(tail["cursor"])
+
+    assert client.get("/api/v1/events", {"cursor": "not-a-cursor"}).status_code == 400
+    assert client.get("/api/v1/events", {"cursor": EventStreamService.encode_cursor({"shard_9": 1})}).status_code == 400
+
+def test_event_stream_sends_lines_as_they_come_under_asgi_and_caps_thread_bound_waits(db, client, settings, event_stream):
+    settings.EVENT_STREAM_HEARTBEAT_SECONDS = 30
+    payment_id = PaymentService.confirm_payment(
+        idempotency_key="stream-asgi",
+        amount=Decimal("10.00"),
+        currency="BRL",
+        payment_method=Payment.PaymentMethod.PIX,
+        installments=1,
+        splits=[SplitInput(recipient_id="producer_stream", role="producer", percent=100)],
+    ).payment_id
+
+    async def first_line():
+        response = await AsyncClient().get("/api/v1/events/stream", {"timeout": 60})
+        started = time.monotonic()
+        lines = aiter(response.streaming_content)
+        try:
+            return response, json.loads(await asyncio.wait_for(anext(lines), 5)), time.monotonic() - started
+        finally:
+            await lines.aclose()
+
+    response, line, seconds = async_to_sync(first_line)()
+    assert response.is_async
+    assert line["payment_id"] == payment_id
+    assert seconds < 5
+
+    # Over the cap, WSGI streams are refused and long polls stop waiting.
+    settings.EVENT_STREAM_MAX_CONNECTIONS = 0
+    assert client.get("/api/v1/events/stream", {"timeout": 60}).status_code == 503
+    started = time.monotonic()
+    assert client.get("/api/v1/events", {"start": "latest", "wait": 5}).json()["events"] == []
+    assert time.monotonic() - started < 1
+
+def test_event_long_poll_under_asgi_does_not_block_concurrent_confirms(db, settings, event_stream):
+    body = {
+        "amount": "10.00",
+        "currency": "BRL",
+        "payment_method": "pix",
+        "installments": 1,
+        "splits": [{"recipient_id": "producer_stream", "role": "producer", "percent": 100}],
+    }
+
+    async def poll_and_confirm():
+        client = AsyncClient()
+
+        async def long_poll():
+            response = await client.get("/api/v1/events", {"start": "latest", "wait": 5})
+            return json.loads(b"".join([chunk async for chunk in response.streaming_content]))
+
+        async def confirm():
+            await asyncio.sleep(0.1)
+            started = time.monotonic()
+            response = await client.post("/api/v1/payments", body, content_type="application/json", headers={"Idempotency-Key": "stream-long-poll"})
+            return response, time.monotonic() - started
+
+        return await asyncio.gather(long_poll(), confirm())
+
+    polled, (confirmed, seconds) = async_to_sync(poll_and_confirm)()
+    assert confirmed.status_code == 201
+    assert seconds < 1
+    assert [event["payment_id"] for event in polled["events"]] == [confirmed.json()["payment_id"]]
@@ -0,0 +1,119 @@
+"""Flash-sale burst against ConfirmPaymentView with admission control off and on.
+
+Many client threads post confirmations for one seller through the Django test
+client. A response slower than --client-timeout-ms counts as a timeout (the
+client would have given up and retried); --replay-ratio of the requests reuse
+an already confirmed Idempotency-Key, as retrying clients do (with admission
+control on, the idempotency filter is enabled so shed replays are recognised).
+
+    python -m benchmarks.bench_admission --threads 64 --requests 4000
+"""
+import argparse
+import logging
+import os
+import random
+import statistics
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=4_000)
+    parser.add_argument("--replay-ratio", type=float, default=0.2)
+    parser.add_argument("--client-timeout-ms", type=float, default=250)
+    parser.add_argument("--max-concurrent", type=int, default=4)
+    parser.add_argument("--seller-rate", type=float, default=300)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["DATABASE_DIR"] = directory
+        run(args)
+
+
+def run(args):
+    from benchmarks.utils import setup_django, migrate, timer, print_table
+
+    setup_django()
+
+    from django.conf import settings
+    from django.db import connections
+    from django.test import Client
+
+    settings.DATABASES["default"]["OPTIONS"] = {"timeout": 60, "transaction_mode": "IMMEDIATE"}
+    settings.ALLOWED_HOSTS = ["testserver"]
+    logging.getLogger("django.request").setLevel(logging.ERROR)
+    migrate("default")
+
+    from app.services import AdmissionService, IdempotencyFilter
+
+    body = {
+        "amount": "100.00",
+        "currency": "BRL",
+        "payment_method": "card",
+        "installments": 3,
+        "splits": [
+            {"recipient_id": "producer_1", "role": "producer", "percent": 70},
+            {"recipient_id": "affiliate_1", "role": "affiliate", "percent": 30},
+        ],
+    }
+
+    def burst(prefix: str):
+        rng = random.Random(7)
+        confirmed = f"{prefix}-seed"
+        Client().post("/api/v1/payments", body, content_type="application/json", HTTP_IDEMPOTENCY_KEY=confirmed)
+
+        keys = [
+            confirmed if rng.random() < args.replay_ratio else f"{prefix}-{index}"
+            for index in range(args.requests)
+        ]
+
+        def post(key: str):
+            try:
+                start = time.perf_counter()
+                response = Client().post("/api/v1/payments", body, content_type="application/json", HTTP_IDEMPOTENCY_KEY=key)
+                return response.status_code, time.perf_counter() - start
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=args.threads) as executor, timer() as elapsed:
+            results = list(executor.map(post, keys))
+        return results, elapsed["seconds"]
+
+    rows = []
+    for name, enabled in [("no admission control", False), ("admission control", True)]:
+        settings.ADMISSION_CONTROL_ENABLED = enabled
+        settings.ADMISSION_MAX_CONCURRENT = args.max_concurrent
+        settings.ADMISSION_MAX_CONCURRENT_PER_SELLER = args.max_concurrent
+        settings.ADMISSION_SELLER_RATE_PER_SECOND = args.seller_rate
+        settings.ADMISSION_SELLER_BURST = int(args.seller_rate)
+        # Shed requests are only checked for replays through the filter.
+        settings.IDEMPOTENCY_FILTER_ENABLED = enabled
+        AdmissionService.reset()
+        IdempotencyFilter.reset()
+
+        results, seconds = burst("on" if enabled else "off")
+        statuses = Counter(status for status, _ in results)
+        latencies = sorted(latency * 1000 for status, latency in results if status == 201)
+        timeouts = sum(1 for _, latency in results if latency * 1000 > args.client_timeout_ms)
+
+        rows.append([
+            name,
+            statuses[201],
+            statuses[429],
+            statuses[503],
+            timeouts,
+            f"{statuses[201] / seconds:.0f}",
+            f"{statistics.median(latencies):.1f}" if latencies else "-",
+            f"{latencies[int(len(latencies) * 0.99) - 1]:.1f}" if latencies else "-",
+        ])
+
+    print(f"threads={args.threads} requests={args.requests} replay_ratio={args.replay_ratio} client_timeout={args.client_timeout_ms}ms")
+    print_table(["mode", "201", "429", "503", "timeouts", "201/s", "p50 ms", "p99 ms"], rows)
+
+
+if __name__ == "__main__":
+    main()
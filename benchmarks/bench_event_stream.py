@@ -0,0 +1,134 @@
+"""Many consumers tailing new captures: `created_at > last_seen` polling on
+ledger_entries versus long-polling EventStreamService.
+
+A writer thread confirms payments at --rate per second while --consumers
+threads tail them. Reported: the queries all consumers issued per second
+(the load they add next to the write path) and the delay between a payment's
+created_at and the moment a consumer saw it.
+
+    python -m benchmarks.bench_event_stream --consumers 32 --rate 200 --seconds 10
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--consumers", type=int, default=32)
+    parser.add_argument("--rate", type=float, default=200)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--poll-interval-ms", type=float, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["DATABASE_DIR"] = directory
+        run(args)
+
+
+def run(args):
+    from benchmarks.utils import setup_django, migrate, print_table
+
+    setup_django()
+
+    from django.conf import settings
+    from django.db import connection, connections
+
+    settings.DATABASES["default"]["OPTIONS"] = {"timeout": 60}
+    settings.EVENT_STREAM_POLL_INTERVAL_MS = args.poll_interval_ms
+    migrate("default")
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA journal_mode=WAL")
+
+    from decimal import Decimal
+
+    from django.utils import timezone
+
+    from app.models import LedgerEntry, Payment
+    from app.services import EventStreamService, PaymentService, SplitInput
+
+    def write(stop: threading.Event, prefix: str):
+        index = 0
+        started = time.perf_counter()
+        while not stop.is_set():
+            PaymentService.confirm_payment(
+                idempotency_key=f"{prefix}-{index}",
+                amount=Decimal("100.00"),
+                currency="BRL",
+                payment_method=Payment.PaymentMethod.PIX,
+                installments=1,
+                splits=[
+                    SplitInput(recipient_id="producer_1", role="producer", percent=70),
+                    SplitInput(recipient_id="affiliate_1", role="affiliate", percent=30),
+                ],
+            )
+            index += 1
+            time.sleep(max(0.0, started + index / args.rate - time.perf_counter()))
+        connections.close_all()
+
+    def poll_table(stop: threading.Event, delays: list, queries: list):
+        last_seen = timezone.now()
+        while not stop.is_set():
+            rows = list(LedgerEntry.objects.filter(created_at__gt=last_seen).order_by("created_at").values_list("created_at", flat=True))
+            queries.append(1)
+            now = timezone.now()
+            for created_at in rows:
+                delays.append((now - created_at).total_seconds())
+            if rows:
+                last_seen = rows[-1]
+            time.sleep(args.poll_interval_ms / 1000)
+
+    def tail_stream(stop: threading.Event, delays: list, queries: list):
+        offsets = EventStreamService.offsets(start="latest")
+        while not stop.is_set():
+            batch = EventStreamService.poll(offsets, limit=1000, wait=1.0)
+            now = timezone.now()
+            for event in batch.events:
+                delays.append((now - event.created_at).total_seconds())
+            offsets = batch.offsets
+
+    rows = []
+    for name, consume in [("poll ledger_entries", poll_table), ("EventStreamService", tail_stream)]:
+        EventStreamService.reset()
+        stop = threading.Event()
+        delays: list = []
+        queries: list = []
+
+        def consumer():
+            def count(execute, sql, params, many, context):
+                if sql.lstrip().upper().startswith("SELECT"):
+                    queries.append(1)
+                return execute(sql, params, many, context)
+
+            with connection.execute_wrapper(count):
+                consume(stop, delays, [])
+            connections.close_all()
+
+        threads = [threading.Thread(target=consumer) for _ in range(args.consumers)]
+        writer = threading.Thread(target=write, args=(stop, consume.__name__))
+        for thread in threads:
+            thread.start()
+        writer.start()
+        time.sleep(args.seconds)
+        stop.set()
+        for thread in [writer, *threads]:
+            thread.join()
+
+        delays.sort()
+        rows.append([
+            name,
+            f"{len(queries) / args.seconds:.0f}",
+            f"{statistics.median(delays) * 1000:.1f}" if delays else "-",
+            f"{delays[int(len(delays) * 0.99)] * 1000:.1f}" if delays else "-",
+            len(delays) // args.consumers,
+        ])
+
+    print(f"consumers={args.consumers} rate={args.rate}/s seconds={args.seconds} poll interval={args.poll_interval_ms}ms")
+    print_table(["consumers read", "SELECTs/s", "p50 delay ms", "p99 delay ms", "rows per consumer"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Quote cost per currency with the FX snapshot cached in-process versus read
+from the database on every call (FX_RATE_CACHE_TTL_SECONDS=0).
+
+    python -m benchmarks.bench_fx_quote --quotes 20000
+"""
+import argparse
+import os
+import tempfile
+from decimal import Decimal
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--quotes", type=int, default=20_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["DATABASE_DIR"] = directory
+        run(args)
+
+
+def run(args):
+    from benchmarks.utils import setup_django, migrate, timer, print_table
+
+    setup_django()
+    migrate("default")
+
+    from django.conf import settings
+    from django.db import connection
+
+    from app.services import CalculationService, FxService, SplitService, SplitInput
+
+    FxService.publish({"USD": Decimal("5.1234"), "EUR": Decimal("5.5012"), "JPY": Decimal("0.0345")})
+    splits = [
+        SplitInput(recipient_id="producer_1", role="producer", percent=70),
+        SplitInput(recipient_id="affiliate_1", role="affiliate", percent=30),
+    ]
+
+    def quote(currency: str, amount: Decimal):
+        calculation = CalculationService.calculate(amount=amount, payment_method="card", installments=3, currency=currency)
+        SplitService.calculate(net_amount=calculation.net_amount, splits=splits, currency=currency)
+
+    rows = []
+    for currency, amount in [("BRL", Decimal("100.00")), ("USD", Decimal("100.00")), ("JPY", Decimal("10000"))]:
+        row = [currency]
+        for ttl in [60, 0]:
+            settings.FX_RATE_CACHE_TTL_SECONDS = ttl
+            FxService.reset()
+            quote(currency, amount)
+
+            queries = []
+
+            def count_queries(execute, sql, params, many, context):
+                queries.append(sql)
+                return execute(sql, params, many, context)
+
+            with connection.execute_wrapper(count_queries), timer() as elapsed:
+                for _ in range(args.quotes):
+                    quote(currency, amount)
+            row += [f"{elapsed['seconds'] / args.quotes * 1e6:.1f}", f"{len(queries) / args.quotes:.1f}"]
+        rows.append(row)
+
+    print(f"quotes={args.quotes} (fee + split calculation, card 3x, 70/30)")
+    print_table(["currency", "cached us/quote", "queries/quote", "uncached us/quote", "queries/quote"], rows)
+
+
+if __name__ == "__main__":
+    main()
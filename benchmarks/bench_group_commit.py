@@ -0,0 +1,87 @@
+"""Throughput of concurrent PaymentService.confirm_payment calls with one
+commit per payment versus group commit (one commit per batch).
+
+Runs against an on-disk SQLite database with synchronous=FULL, so every
+commit pays for an fsync.
+
+    python -m benchmarks.bench_group_commit --threads 16 --payments 2000
+"""
+import argparse
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--payments", type=int, default=2_000)
+    parser.add_argument("--max-wait-ms", type=float, default=5)
+    parser.add_argument("--max-batch-size", type=int, default=100)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["DATABASE_DIR"] = directory
+        run(args)
+
+
+def run(args):
+    from benchmarks.utils import setup_django, migrate, timer, print_table
+
+    setup_django()
+
+    from django.conf import settings
+    from django.db import connection, connections
+    from django.db.backends.signals import connection_created
+
+    settings.DATABASES["default"]["OPTIONS"] = {"timeout": 60, "transaction_mode": "IMMEDIATE"}
+    connection_created.connect(lambda connection, **kwargs: connection.cursor().execute("PRAGMA synchronous=FULL"))
+    migrate("default")
+
+    from app.models import Payment
+    from app.services import PaymentService, SplitInput, GroupCommitWriter
+
+    def confirm(key: str):
+        try:
+            PaymentService.confirm_payment(
+                idempotency_key=key,
+                amount=Decimal("100.00"),
+                currency="BRL",
+                payment_method=Payment.PaymentMethod.CARD,
+                installments=3,
+                splits=[
+                    SplitInput(recipient_id="producer_1", role="producer", percent=70),
+                    SplitInput(recipient_id="affiliate_1", role="affiliate", percent=30),
+                ],
+            )
+        finally:
+            connections.close_all()
+
+    def measure(prefix: str) -> float:
+        with ThreadPoolExecutor(max_workers=args.threads) as executor, timer() as elapsed:
+            list(executor.map(confirm, (f"{prefix}-{index}" for index in range(args.payments))))
+        return elapsed["seconds"]
+
+    settings.PAYMENT_GROUP_COMMIT_ENABLED = False
+    per_payment = measure("single")
+
+    settings.PAYMENT_GROUP_COMMIT_ENABLED = True
+    GroupCommitWriter._instance = GroupCommitWriter(max_wait=args.max_wait_ms / 1000, max_batch_size=args.max_batch_size)
+    grouped = measure("grouped")
+
+    assert Payment.objects.count() == args.payments * 2
+    connection.close()
+
+    print(f"threads={args.threads} payments={args.payments} max_wait={args.max_wait_ms}ms max_batch={args.max_batch_size}")
+    print_table(
+        ["mode", "seconds", "payments/s"],
+        [
+            ["commit per payment", f"{per_payment:.2f}", f"{args.payments / per_payment:.0f}"],
+            ["group commit", f"{grouped:.2f}", f"{args.payments / grouped:.0f}"],
+        ],
+    )
+
+
+if __name__ == "__main__":
+    main()
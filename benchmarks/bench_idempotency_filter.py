@@ -0,0 +1,96 @@
+"""New-payment latency of PaymentService.confirm_payment with and without the
+idempotency-key Bloom filter, plus the filter's warm-up time, memory footprint
+and observed false-positive rate.
+
+    python -m benchmarks.bench_idempotency_filter --existing 50000 --payments 2000
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from decimal import Decimal
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--existing", type=int, default=50_000)
+    parser.add_argument("--payments", type=int, default=2_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["DATABASE_DIR"] = directory
+        run(args)
+
+
+def run(args):
+    from benchmarks.utils import setup_django, migrate, timer, print_table
+
+    setup_django()
+    migrate("default")
+
+    from django.conf import settings
+    from django.utils import timezone
+
+    from app.models import Payment
+    from app.services import PaymentService, SplitInput, IdempotencyFilter
+
+    Payment.objects.bulk_create(
+        [
+            Payment(
+                idempotency_key=f"existing-{index}",
+                gross_amount=Decimal("100.00"),
+                platform_fee_amount=Decimal("0.00"),
+                net_amount=Decimal("100.00"),
+                payment_method=Payment.PaymentMethod.PIX,
+                installments=1,
+                currency="BRL",
+                payload_hash="0" * 64,
+                created_at=timezone.now(),
+            )
+            for index in range(args.existing)
+        ],
+        batch_size=5_000,
+    )
+
+    def confirm(prefix: str) -> list[float]:
+        latencies = []
+        for index in range(args.payments):
+            start = time.perf_counter()
+            PaymentService.confirm_payment(
+                idempotency_key=f"{prefix}-{index}",
+                amount=Decimal("100.00"),
+                currency="BRL",
+                payment_method=Payment.PaymentMethod.PIX,
+                installments=1,
+                splits=[SplitInput(recipient_id="producer_1", role="producer", percent=100)],
+            )
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    settings.IDEMPOTENCY_FILTER_ENABLED = False
+    without_filter = confirm("without")
+
+    settings.IDEMPOTENCY_FILTER_ENABLED = True
+    settings.IDEMPOTENCY_FILTER_CAPACITY = max(args.existing * 2, 1_000)
+    IdempotencyFilter.reset()
+    with timer() as warm_up:
+        IdempotencyFilter.warm_up()
+    with_filter = confirm("with")
+
+    def row(name: str, latencies: list[float]) -> list:
+        quantiles = statistics.quantiles(latencies, n=100)
+        return [name, f"{statistics.mean(latencies) * 1e6:.0f}", f"{quantiles[49] * 1e6:.0f}", f"{quantiles[98] * 1e6:.0f}"]
+
+    print(f"existing payments={args.existing} new payments={args.payments}")
+    print_table(["mode", "mean us", "p50 us", "p99 us"], [row("lookup", without_filter), row("bloom filter", with_filter)])
+
+    stats = IdempotencyFilter.stats()
+    print()
+    print(f"warm-up: {warm_up['seconds'] * 1000:.1f} ms for {args.existing} keys")
+    print(f"memory: {stats.memory_bytes / 1024:.1f} KiB")
+    print(f"false positives: {stats.false_positives}/{stats.negatives + stats.false_positives} ({stats.false_positive_rate:.4%}), estimated {stats.estimated_false_positive_rate:.4%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Recipient balance (now and as of a past date) computed by scanning the full
+ledger history versus the latest ledger snapshot plus the delta after it.
+
+Reuses the skewed ledger from bench_statement (one year of entries), builds
+snapshots in --generations steps so past dates have a nearby checkpoint, then appends a tail of fresh entries that only the delta
+read covers. Also reports how long the chunked snapshot build and verification
+take.
+
+    python -m benchmarks.bench_ledger_snapshots --entries 2000000 --recipients 100000 --tail 20000
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entries", type=int, default=2_000_000)
+    parser.add_argument("--recipients", type=int, default=100_000)
+    parser.add_argument("--skew", type=float, default=1.2)
+    parser.add_argument("--tail", type=int, default=20_000, help="Entries appended after the snapshot build.")
+    parser.add_argument("--generations", type=int, default=12, help="Snapshot steps the year of history is split into.")
+    parser.add_argument("--queries", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["DATABASE_DIR"] = directory
+        run(args)
+
+
+def run(args):
+    from benchmarks.utils import setup_django, migrate, timer, print_table
+
+    setup_django()
+    migrate("default")
+
+    from django.db import connection
+    from django.db.models import Sum
+
+    from app.models import LedgerEntry, LedgerSnapshot
+    from app.services import LedgerSnapshotService
+    from benchmarks.bench_statement import _load
+
+    print(f"loading {args.entries} ledger entries for {args.recipients} recipients (skew {args.skew})...")
+    recipients = _load(connection, args)
+
+    with timer() as build:
+        result = LedgerSnapshotService.build(alias="default", step_size=args.entries // args.generations + 1)
+    print(
+        f"build: {result.entries} entries in {result.steps} step(s), {result.snapshots} snapshot(s) "
+        f"in {build['seconds']:.1f}s"
+    )
+
+    _append_tail(connection, recipients, args)
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE")
+
+    hot = recipients[0]
+    cold = random.Random(7).sample(recipients[len(recipients) // 2:], min(50, len(recipients) // 2))
+    month_ago = datetime.now(dt_timezone.utc) - timedelta(days=30)
+
+    def full_scan(recipient_id, as_of=None):
+        entries = LedgerEntry.objects.filter(recipient_id=recipient_id, currency="BRL")
+        if as_of is not None:
+            entries = entries.filter(created_at__lte=as_of)
+        return entries.aggregate(total=Sum("amount"))["total"]
+
+    def snapshot(recipient_id, as_of=None):
+        return LedgerSnapshotService.balance(recipient_id=recipient_id, as_of=as_of).balance
+
+    def time_calls(call, repeat: int) -> float:
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            call()
+            samples.append(time.perf_counter() - start)
+        return statistics.median(samples) * 1000
+
+    rows = []
+    for name, recipient_ids, as_of in [
+        ("hot recipient, now", [hot], None),
+        ("hot recipient, 30 days ago", [hot], month_ago),
+        ("cold recipient, now", cold, None),
+    ]:
+        old = time_calls(lambda: [full_scan(recipient_id, as_of) for recipient_id in recipient_ids], args.queries) / len(recipient_ids)
+        new = time_calls(lambda: [snapshot(recipient_id, as_of) for recipient_id in recipient_ids], args.queries) / len(recipient_ids)
+        rows.append([name, f"{old:.2f}", f"{new:.2f}", f"{old / new:.1f}x"])
+
+    with timer() as verify:
+        verification = LedgerSnapshotService.verify(alias="default")
+
+    print(f"hot recipient owns {LedgerEntry.objects.filter(recipient_id=hot).count()} entries, {args.tail} tail entries")
+    print_table(["balance", "full scan ms", "snapshot + delta ms", "speedup"], rows)
+    print(
+        f"verify: {verification.checked} of {LedgerSnapshot.objects.count()} snapshot(s), "
+        f"{len(verification.mismatches)} mismatch(es) in {verify['seconds']:.1f}s"
+    )
+
+
+def _append_tail(connection, recipients: list[str], args):
+    rng = random.Random(43)
+    weights = [1 / (rank + 1) ** args.skew for rank in range(len(recipients))]
+    now = datetime.now(dt_timezone.utc).isoformat(" ").replace("+00:00", "")
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            'INSERT INTO "ledger_entries" ("payment_id", "recipient_id", "role", "amount", "currency", "created_at") VALUES (1, ?, \'producer\', ?, \'BRL\', ?)',
+            [(recipient, f"{rng.randint(1, 100_000) / 100:.2f}", now) for recipient in rng.choices(recipients, weights=weights, k=args.tail)],
+        )
+
+
+if __name__ == "__main__":
+    main()
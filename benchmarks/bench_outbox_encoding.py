@@ -0,0 +1,119 @@
+"""Outbox payload size and encode/decode throughput: JSON versus the compact
+binary encoding (EventCodec).
+
+Payloads have 1 to 5 receivables with realistic ids and amounts. Besides the
+raw payload bytes, the same events are written to the outbox_events table in
+each encoding and the table's on-disk size is read from SQLite's dbstat.
+
+    python -m benchmarks.bench_outbox_encoding --events 200000
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=200_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["DATABASE_DIR"] = directory
+        run(args)
+
+
+def run(args):
+    from benchmarks.utils import setup_django, migrate, timer, print_table
+
+    setup_django()
+    migrate("default")
+
+    from django.db import connection
+
+    from app.services import EventCodec
+
+    payloads = _payloads(args.events)
+
+    with timer() as elapsed:
+        json_blobs = [json.dumps(payload) for payload in payloads]
+    json_encode = elapsed["seconds"]
+    with timer() as elapsed:
+        for blob in json_blobs:
+            json.loads(blob)
+    json_decode = elapsed["seconds"]
+
+    with timer() as elapsed:
+        binary_blobs = [EventCodec.encode(payload) for payload in payloads]
+    binary_encode = elapsed["seconds"]
+    with timer() as elapsed:
+        for blob in binary_blobs:
+            EventCodec.decode(blob)
+    binary_decode = elapsed["seconds"]
+
+    assert all(EventCodec.decode(blob) == payload for blob, payload in zip(binary_blobs[:1000], payloads))
+
+    json_table = _table_size(connection, [(blob, None) for blob in json_blobs])
+    binary_table = _table_size(connection, [(None, blob) for blob in binary_blobs])
+
+    json_bytes = sum(len(blob) for blob in json_blobs)
+    binary_bytes = sum(len(blob) for blob in binary_blobs)
+
+    print(f"events={args.events}")
+    print_table(
+        ["encoding", "payload bytes/event", "table MiB", "encode events/s", "decode events/s"],
+        [
+            ["json", f"{json_bytes / args.events:.0f}", f"{json_table / 2**20:.1f}", f"{args.events / json_encode:.0f}", f"{args.events / json_decode:.0f}"],
+            ["binary", f"{binary_bytes / args.events:.0f}", f"{binary_table / 2**20:.1f}", f"{args.events / binary_encode:.0f}", f"{args.events / binary_decode:.0f}"],
+        ],
+    )
+    print(f"binary payloads are {binary_bytes / json_bytes:.0%} of JSON, the table is {binary_table / json_table:.0%}")
+
+
+def _payloads(count: int) -> list[dict]:
+    rng = random.Random(42)
+    payloads = []
+    for payment_id in range(1, count + 1):
+        gross = Decimal(rng.randint(1_000, 500_000)).scaleb(-2)
+        net = (gross * Decimal("0.9101")).quantize(Decimal("0.01"))
+        receivables = []
+        remaining = net
+        size = rng.randint(1, 5)
+        for index in range(size):
+            amount = remaining if index == size - 1 else (net / size).quantize(Decimal("0.01"))
+            remaining -= amount
+            receivables.append({
+                "recipient_id": f"recipient_{rng.randint(1, 1_000_000)}",
+                "role": "producer" if index == 0 else "affiliate",
+                "amount": str(amount),
+            })
+        payloads.append({
+            "payment_id": str(payment_id),
+            "currency": "BRL",
+            "gross_amount": str(gross),
+            "net_amount": str(net),
+            "receivables": receivables,
+        })
+    return payloads
+
+
+def _table_size(connection, rows: list) -> int:
+    created_at = datetime.now(dt_timezone.utc).isoformat(" ")
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA foreign_keys=OFF")
+        cursor.execute('DELETE FROM "outbox_events"')
+        cursor.executemany(
+            'INSERT INTO "outbox_events" ("payment_id", "type", "payload", "payload_bin", "status", "created_at") '
+            "VALUES (?, 'payment_captured', ?, ?, 'pending', ?)",
+            [(index + 1, payload, payload_bin, created_at) for index, (payload, payload_bin) in enumerate(rows)],
+        )
+        cursor.execute("VACUUM")
+        cursor.execute("SELECT SUM(pgsize) FROM dbstat WHERE name = 'outbox_events'")
+        return cursor.fetchone()[0]
+
+
+if __name__ == "__main__":
+    main()
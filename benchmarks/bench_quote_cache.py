@@ -0,0 +1,89 @@
+"""Checkout quote throughput through the full Django stack with the quote
+cache disabled (QUOTE_CACHE_MAX_ENTRIES=0) versus enabled, for GET, conditional
+GET (If-None-Match, answered with 304) and POST quotes.
+
+Requests cycle over --distinct combinations of amount, method and
+installments, as repeat quotes from a checkout page do.
+
+    python -m benchmarks.bench_quote_cache --requests 20000 --distinct 500
+"""
+import argparse
+import os
+import random
+import tempfile
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--distinct", type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["DATABASE_DIR"] = directory
+        run(args)
+
+
+def run(args):
+    from benchmarks.utils import setup_django, migrate, timer, print_table
+
+    setup_django("config.settings_api")
+
+    from django.conf import settings
+    from django.test import Client
+
+    settings.ALLOWED_HOSTS = ["testserver"]
+    migrate("default")
+
+    from app.services import QuoteCache
+
+    rng = random.Random(42)
+    quotes = []
+    for _ in range(args.distinct):
+        installments = rng.randint(1, 12)
+        quotes.append({
+            "amount": f"{rng.randint(1_000, 500_000) / 100:.2f}",
+            "currency": "BRL",
+            "payment_method": "card" if installments > 1 or rng.random() < 0.5 else "pix",
+            "installments": installments,
+        })
+    splits = [{"recipient_id": "producer_1", "role": "producer", "percent": 100}]
+    client = Client()
+
+    etags = {}
+
+    def get(index: int):
+        return client.get("/api/v1/checkout/quote", quotes[index % args.distinct])
+
+    def conditional_get(index: int):
+        response = client.get("/api/v1/checkout/quote", quotes[index % args.distinct], HTTP_IF_NONE_MATCH=etags[index % args.distinct])
+        assert response.status_code == 304
+
+    def post(index: int):
+        return client.post("/api/v1/checkout/quote", {**quotes[index % args.distinct], "splits": splits}, content_type="application/json")
+
+    for index in range(args.distinct):
+        etags[index] = get(index)["ETag"]
+
+    rows = []
+    for name, call in [("GET", get), ("GET If-None-Match", conditional_get), ("POST", post)]:
+        row = [name]
+        for max_entries in [0, args.distinct]:
+            settings.QUOTE_CACHE_MAX_ENTRIES = max_entries
+            QuoteCache.clear()
+            for index in range(args.distinct):
+                call(index)
+
+            with timer() as elapsed:
+                for index in range(args.requests):
+                    call(index)
+            row.append(f"{args.requests / elapsed['seconds']:.0f}")
+        row.append(f"{float(row[2]) / float(row[1]):.1f}x")
+        rows.append(row)
+
+    print(f"requests={args.requests} distinct quotes={args.distinct} (config.settings_api, Django test client)")
+    print_table(["quote", "uncached req/s", "cached req/s", "speedup"], rows)
+
+
+if __name__ == "__main__":
+    main()
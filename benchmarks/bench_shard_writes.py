@@ -0,0 +1,100 @@
+"""Write throughput of PaymentService.confirm_payment as local shards are added.
+
+Each shard count runs in a fresh subprocess (the shard layout is read from the
+environment at settings import) against SQLite files in a temporary directory,
+with several writer processes confirming payments concurrently.
+
+    python -m benchmarks.bench_shard_writes --shards 1 2 4 --workers 4 --payments 2000
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+from decimal import Decimal
+
+from benchmarks.utils import setup_django, migrate, timer, print_table
+
+
+def _write(worker: int, count: int):
+    setup_django()
+
+    from app.models import Payment
+    from app.services import PaymentService, SplitInput
+
+    for index in range(count):
+        PaymentService.confirm_payment(
+            idempotency_key=f"bench-{worker}-{index}",
+            amount=Decimal("100.00"),
+            currency="BRL",
+            payment_method=Payment.PaymentMethod.CARD,
+            installments=3,
+            splits=[
+                SplitInput(recipient_id=f"producer_{index % 97}", role="producer", percent=70),
+                SplitInput(recipient_id="affiliate_1", role="affiliate", percent=30),
+            ],
+        )
+
+
+def run(workers: int, payments: int) -> dict:
+    setup_django()
+
+    from app.services import ShardService
+
+    migrate(*ShardService.aliases())
+
+    per_worker = payments // workers
+    context = multiprocessing.get_context("spawn")
+    with timer() as elapsed:
+        processes = [context.Process(target=_write, args=(worker, per_worker)) for worker in range(workers)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+            if process.exitcode != 0:
+                raise RuntimeError(f"writer exited with {process.exitcode}")
+
+    written = per_worker * workers
+    return {"payments": written, "seconds": elapsed["seconds"], "throughput": written / elapsed["seconds"]}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--payments", type=int, default=2000)
+    parser.add_argument("--run", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(run(args.workers, args.payments)))
+        return
+
+    rows = []
+    baseline = None
+    for shard_count in args.shards:
+        with tempfile.TemporaryDirectory() as directory:
+            env = {**os.environ, "PAYMENT_SHARD_COUNT": str(shard_count), "DATABASE_DIR": directory}
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_shard_writes", "--run",
+                 "--workers", str(args.workers), "--payments", str(args.payments)],
+                env=env, check=True, capture_output=True, text=True,
+            ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        baseline = baseline or result["throughput"]
+        rows.append([
+            shard_count,
+            result["payments"],
+            f"{result['seconds']:.2f}",
+            f"{result['throughput']:.0f}",
+            f"{result['throughput'] / baseline:.2f}x",
+        ])
+
+    print(f"workers={args.workers} cpus={os.cpu_count()}")
+    print_table(["shards", "payments", "seconds", "payments/s", "speedup"], rows)
+
+
+if __name__ == "__main__":
+    main()
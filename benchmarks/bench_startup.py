@@ -0,0 +1,107 @@
+"""Cold start and per-request cost of the default settings versus the lean
+API-only profile (config.settings_api).
+
+For each profile a fresh interpreter loads the WSGI application, serves a
+first quote request and then a series of warm ones, calling the WSGI callable
+directly so no test client or server is involved.
+
+    python -m benchmarks.bench_startup --requests 2000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+from benchmarks.utils import print_table
+
+PROFILES = ["config.settings", "config.settings_api"]
+
+QUOTE = json.dumps({
+    "amount": "100.00",
+    "currency": "BRL",
+    "payment_method": "card",
+    "installments": 3,
+    "splits": [{"recipient_id": "producer_1", "role": "producer", "percent": 100}],
+}).encode()
+
+
+def _request(application):
+    import io
+
+    environ = {
+        "REQUEST_METHOD": "POST",
+        "PATH_INFO": "/api/v1/checkout/quote",
+        "SERVER_NAME": "localhost",
+        "SERVER_PORT": "80",
+        "HTTP_HOST": "localhost",
+        "CONTENT_TYPE": "application/json",
+        "CONTENT_LENGTH": str(len(QUOTE)),
+        "wsgi.input": io.BytesIO(QUOTE),
+        "wsgi.url_scheme": "http",
+        "wsgi.errors": sys.stderr,
+    }
+    statuses = []
+    body = b"".join(application(environ, lambda status, headers: statuses.append(status)))
+    assert statuses[0].startswith("200"), (statuses, body)
+
+
+def measure(requests: int) -> dict:
+    import time
+
+    start = time.perf_counter()
+    from config.wsgi import application
+    loaded = time.perf_counter()
+
+    _request(application)
+    first = time.perf_counter()
+
+    for _ in range(requests):
+        _request(application)
+    warm = time.perf_counter()
+
+    return {
+        "import_ms": (loaded - start) * 1000,
+        "first_request_ms": (first - start) * 1000,
+        "request_us": (warm - first) / requests * 1e6,
+        "modules": len(sys.modules),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--measure", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(args.requests)))
+        return
+
+    rows = []
+    for profile in PROFILES:
+        results = []
+        for _ in range(args.runs):
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_startup", "--measure", "--requests", str(args.requests)],
+                env={**os.environ, "DJANGO_SETTINGS_MODULE": profile},
+                check=True, capture_output=True, text=True,
+            ).stdout
+            results.append(json.loads(output.strip().splitlines()[-1]))
+
+        best = {key: min(result[key] for result in results) for key in results[0]}
+        rows.append([
+            profile,
+            f"{best['import_ms']:.0f}",
+            f"{best['first_request_ms']:.0f}",
+            f"{best['request_us']:.0f}",
+            best["modules"],
+        ])
+
+    print(f"best of {args.runs} runs, {args.requests} warm requests each")
+    print_table(["profile", "import ms", "first request ms", "warm request us", "modules"], rows)
+
+
+if __name__ == "__main__":
+    main()
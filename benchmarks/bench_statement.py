@@ -0,0 +1,149 @@
+"""Recipient statement latency on a large ledger with heavily skewed recipients,
+with the old single-column recipient index versus the composite covering one.
+
+Recipients are drawn from a Zipf-like distribution, so a handful of them own
+most of the entries. The benchmark times StatementService.get_statement for
+the hottest recipient (first page and a deep page reached by following
+cursors), for a month-long window, and for random cold recipients.
+
+    python -m benchmarks.bench_statement --entries 20000000 --recipients 100000
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+OLD_INDEX = 'CREATE INDEX "ledger_entr_recipie_42c77e_idx" ON "ledger_entries" ("recipient_id")'
+NEW_INDEX = 'CREATE INDEX "ledger_recipient_statement" ON "ledger_entries" ("recipient_id", "created_at" DESC, "id" DESC, "amount", "role", "payment_id", "currency")'
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entries", type=int, default=2_000_000)
+    parser.add_argument("--recipients", type=int, default=100_000)
+    parser.add_argument("--skew", type=float, default=1.2)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--deep-pages", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["DATABASE_DIR"] = directory
+        run(args)
+
+
+def run(args):
+    from benchmarks.utils import setup_django, migrate, print_table
+
+    setup_django()
+    migrate("default")
+
+    from django.db import connection
+
+    from app.services import StatementService
+
+    print(f"loading {args.entries} ledger entries for {args.recipients} recipients (skew {args.skew})...")
+    recipients = _load(connection, args)
+
+    hot = recipients[0]
+    cold = random.Random(7).sample(recipients[len(recipients) // 2:], min(50, len(recipients) // 2))
+    now = datetime.now(dt_timezone.utc)
+
+    def time_calls(call, repeat: int) -> float:
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            call()
+            samples.append(time.perf_counter() - start)
+        return statistics.median(samples) * 1000
+
+    def deep_page():
+        cursor = None
+        for _ in range(args.deep_pages):
+            cursor = StatementService.get_statement(recipient_id=hot, cursor=cursor, limit=50).next_cursor
+
+    def scenarios() -> list:
+        return [
+            time_calls(lambda: StatementService.get_statement(recipient_id=hot, limit=50), args.queries // 10 or 1),
+            time_calls(deep_page, 3),
+            time_calls(lambda: StatementService.get_statement(
+                recipient_id=hot, start=now - timedelta(days=60), end=now - timedelta(days=30), limit=50,
+            ), args.queries // 10 or 1),
+            time_calls(lambda: [StatementService.get_statement(recipient_id=recipient, limit=50) for recipient in cold], 3) / len(cold),
+        ]
+
+    with connection.cursor() as cursor:
+        cursor.execute('DROP INDEX "ledger_recipient_statement"')
+        cursor.execute(OLD_INDEX)
+        cursor.execute("ANALYZE")
+    before = scenarios()
+
+    with connection.cursor() as cursor:
+        cursor.execute('DROP INDEX "ledger_entr_recipie_42c77e_idx"')
+        cursor.execute(NEW_INDEX)
+        cursor.execute("ANALYZE")
+    after = scenarios()
+
+    names = [
+        "hot recipient, first page",
+        f"hot recipient, {args.deep_pages} pages",
+        "hot recipient, 30-day window",
+        "cold recipient, first page",
+    ]
+    print(f"hot recipient owns {_count(connection, hot)} entries")
+    print_table(
+        ["query", "single-column ms", "covering ms", "speedup"],
+        [[name, f"{old:.2f}", f"{new:.2f}", f"{old / new:.1f}x"] for name, old, new in zip(names, before, after)],
+    )
+
+
+def _load(connection, args) -> list[str]:
+    rng = random.Random(42)
+    recipients = [f"recipient_{index}" for index in range(args.recipients)]
+    weights = [1 / (rank + 1) ** args.skew for rank in range(args.recipients)]
+    start = datetime.now(dt_timezone.utc) - timedelta(days=365)
+    step = timedelta(days=365) / args.entries
+
+    payments = max(1, args.entries // 2)
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA synchronous=OFF")
+        cursor.execute("PRAGMA journal_mode=MEMORY")
+        for offset in range(0, payments, 100_000):
+            cursor.executemany(
+                'INSERT INTO "payments" ("idempotency_key", "status", "gross_amount", "platform_fee_amount", "net_amount", '
+                '"payment_method", "installments", "currency", "payload_hash", "created_at") '
+                "VALUES (?, 'captured', '100.00', '0.00', '100.00', 'pix', 1, 'BRL', '', ?)",
+                [(f"bench-{index}", start.isoformat(" ")) for index in range(offset, min(payments, offset + 100_000))],
+            )
+
+        chunk = 100_000
+        for offset in range(0, args.entries, chunk):
+            size = min(chunk, args.entries - offset)
+            chosen = rng.choices(recipients, weights=weights, k=size)
+            cursor.executemany(
+                'INSERT INTO "ledger_entries" ("payment_id", "recipient_id", "role", "amount", "currency", "created_at") VALUES (?, ?, ?, ?, \'BRL\', ?)',
+                [
+                    (
+                        (offset + index) // 2 + 1,
+                        recipient,
+                        "producer" if index % 2 == 0 else "affiliate",
+                        str(Decimal(rng.randint(1, 100_000)) / 100),
+                        (start + step * (offset + index)).isoformat(" ").replace("+00:00", ""),
+                    )
+                    for index, recipient in enumerate(chosen)
+                ],
+            )
+    return recipients
+
+
+def _count(connection, recipient_id: str) -> int:
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT COUNT(*) FROM "ledger_entries" WHERE "recipient_id" = %s', [recipient_id])
+        return cursor.fetchone()[0]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Webhook delivery throughput: one synchronous POST per delivery over a new
+connection versus WebhookDispatcher (asyncio, pooled keep-alive connections,
+per-host concurrency limit).
+
+A minimal keep-alive HTTP/1.1 receiver runs in a separate process. Pending
+outbox events are inserted directly and fanned out to --subscribers
+subscriptions on that receiver.
+
+    python -m benchmarks.bench_webhooks --events 20000 --subscribers 3
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import tempfile
+from datetime import datetime, timezone as dt_timezone
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=20_000)
+    parser.add_argument("--subscribers", type=int, default=3)
+    parser.add_argument("--baseline-deliveries", type=int, default=2_000)
+    parser.add_argument("--per-host", type=int, default=16)
+    args = parser.parse_args()
+
+    ready = multiprocessing.get_context("spawn").Queue()
+    receiver = multiprocessing.get_context("spawn").Process(target=_receive, args=(ready,), daemon=True)
+    receiver.start()
+    port = ready.get(timeout=30)
+
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            os.environ["DATABASE_DIR"] = directory
+            run(args, f"http://127.0.0.1:{port}")
+    finally:
+        receiver.terminate()
+
+
+def run(args, base_url: str):
+    import json
+    import urllib.request
+
+    from benchmarks.utils import setup_django, migrate, timer, print_table
+    from benchmarks.bench_outbox_encoding import _payloads
+
+    setup_django()
+    migrate("default")
+
+    from django.conf import settings
+    from django.db import connection
+
+    from app.models import WebhookSubscription
+    from app.services import WebhookDispatcher
+
+    settings.WEBHOOK_MAX_CONNECTIONS_PER_HOST = args.per_host
+    payloads = _payloads(args.events)
+
+    created_at = datetime.now(dt_timezone.utc).isoformat(" ")
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA foreign_keys=OFF")
+        cursor.executemany(
+            'INSERT INTO "outbox_events" ("payment_id", "type", "payload", "status", "created_at") '
+            "VALUES (?, 'payment_captured', ?, 'pending', ?)",
+            [(index + 1, json.dumps(payload), created_at) for index, payload in enumerate(payloads)],
+        )
+    for index in range(args.subscribers):
+        WebhookSubscription.objects.create(url=f"{base_url}/hooks/{index}", secret=f"secret-{index}")
+
+    body = json.dumps({"id": "default:1", "type": "payment_captured", "data": payloads[0]}).encode()
+    with timer() as baseline:
+        for _ in range(args.baseline_deliveries):
+            request = urllib.request.Request(f"{base_url}/hooks/0", data=body, headers={"Content-Type": "application/json"})
+            with urllib.request.urlopen(request) as response:
+                response.read()
+
+    summary = WebhookDispatcher.dispatch()
+    assert summary.dead_lettered == 0
+
+    baseline_rate = args.baseline_deliveries / baseline["seconds"]
+    print(f"events={args.events} subscribers={args.subscribers} per-host limit={args.per_host} cpus={os.cpu_count()}")
+    print_table(
+        ["dispatcher", "deliveries", "seconds", "deliveries/s"],
+        [
+            ["sync, new connection each", args.baseline_deliveries, f"{baseline['seconds']:.1f}", f"{baseline_rate:.0f}"],
+            ["WebhookDispatcher", summary.deliveries, f"{summary.seconds:.1f}", f"{summary.deliveries_per_second:.0f}"],
+        ],
+    )
+    print(f"speedup {summary.deliveries_per_second / baseline_rate:.1f}x")
+
+
+def _receive(ready):
+    async def handle(reader, writer):
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = 0
+                for line in head.split(b"\r\n"):
+                    if line.lower().startswith(b"content-length:"):
+                        length = int(line.split(b":", 1)[1])
+                await reader.readexactly(length)
+                close = b"connection: close" in head.lower()
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 0\r\n" + (b"Connection: close\r\n" if close else b"") + b"\r\n")
+                await writer.drain()
+                if close:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve():
+        server = await asyncio.start_server(handle, "127.0.0.1", 0, backlog=1024)
+        ready.put(server.sockets[0].getsockname()[1])
+        await server.serve_forever()
+
+    asyncio.run(serve())
+
+
+if __name__ == "__main__":
+    main()
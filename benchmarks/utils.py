@@ -0,0 +1,35 @@
+import os
+import time
+from contextlib import contextmanager
+
+import django
+
+
+def setup_django(settings_module: str = "config.settings"):
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", settings_module)
+    django.setup()
+
+
+def migrate(*aliases: str):
+    from django.core.management import call_command
+
+    for alias in aliases:
+        call_command("migrate", database=alias, verbosity=0)
+
+
+@contextmanager
+def timer():
+    elapsed = {}
+    start = time.perf_counter()
+    try:
+        yield elapsed
+    finally:
+        elapsed["seconds"] = time.perf_counter() - start
+
+
+def print_table(headers: list[str], rows: list[list]):
+    widths = [max(len(str(value)) for value in column) for column in zip(headers, *rows)]
+    line = "  ".join(f"{{:>{width}}}" for width in widths)
+    print(line.format(*headers))
+    for row in rows:
+        print(line.format(*row))
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -49,13 +50,122 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'config.wsgi.application'
 
+DATABASE_DIR = Path(os.environ.get('DATABASE_DIR', BASE_DIR))
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': DATABASE_DIR / 'db.sqlite3',
+    }
+}
+
+# Payment sharding: when PAYMENT_SHARD_COUNT > 0, payments (and their ledger
+# entries and outbox events) are written to `shard_<n>` databases instead of
+# `default`. PAYMENT_SHARD_KEY selects what the shard is derived from:
+# "idempotency_key" or "seller".
+PAYMENT_SHARD_COUNT = int(os.environ.get('PAYMENT_SHARD_COUNT', '0'))
+PAYMENT_SHARD_KEY = os.environ.get('PAYMENT_SHARD_KEY', 'idempotency_key')
+
+for shard_index in range(PAYMENT_SHARD_COUNT):
+    DATABASES[f'shard_{shard_index}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': DATABASE_DIR / f'db_shard_{shard_index}.sqlite3',
+        'OPTIONS': {
+            'timeout': 30,
+            'transaction_mode': 'IMMEDIATE',
+        },
     }
+
+PAYMENT_SHARDS = [f'shard_{shard_index}' for shard_index in range(PAYMENT_SHARD_COUNT)] or ['default']
+
+# Per-process Bloom filter of known idempotency keys: a negative answer skips
+# the pre-insert lookup (the unique constraint remains the backstop).
+IDEMPOTENCY_FILTER_ENABLED = os.environ.get('IDEMPOTENCY_FILTER_ENABLED', '0') == '1'
+IDEMPOTENCY_FILTER_CAPACITY = int(os.environ.get('IDEMPOTENCY_FILTER_CAPACITY', '1000000'))
+IDEMPOTENCY_FILTER_ERROR_RATE = float(os.environ.get('IDEMPOTENCY_FILTER_ERROR_RATE', '0.001'))
+IDEMPOTENCY_FILTER_WARM_CHUNK_SIZE = 10_000
+
+# Group commit: concurrent confirms arriving within MAX_WAIT_MS are written by
+# a single writer thread in one transaction (up to MAX_BATCH_SIZE payments).
+PAYMENT_GROUP_COMMIT_ENABLED = os.environ.get('PAYMENT_GROUP_COMMIT_ENABLED', '0') == '1'
+PAYMENT_GROUP_COMMIT_MAX_WAIT_MS = float(os.environ.get('PAYMENT_GROUP_COMMIT_MAX_WAIT_MS', '5'))
+PAYMENT_GROUP_COMMIT_MAX_BATCH_SIZE = int(os.environ.get('PAYMENT_GROUP_COMMIT_MAX_BATCH_SIZE', '100'))
+
+# Currencies: payments are charged in any registered currency (see
+# app/services/currency_service.py) and their net amount is converted to
+# SETTLEMENT_CURRENCY with the latest FX snapshot, which each process caches
+# for FX_RATE_CACHE_TTL_SECONDS.
+SETTLEMENT_CURRENCY = 'BRL'
+FX_RATE_CACHE_TTL_SECONDS = float(os.environ.get('FX_RATE_CACHE_TTL_SECONDS', '60'))
+
+# Platform fee schedule (rates as decimal strings): PIX has no installments;
+# card charges card_single for 1x and card_installment_base plus
+# card_per_extra_installment for every installment after the first.
+PLATFORM_FEE_SCHEDULE = {
+    'pix': '0.00',
+    'card_single': '0.0399',
+    'card_installment_base': '0.0499',
+    'card_per_extra_installment': '0.02',
 }
 
+# Quote cache: rendered /checkout/quote responses are kept in a per-process LRU
+# keyed by the normalized inputs, the fee schedule version and the FX snapshot
+# version (0 entries disables it). GET quotes carry an ETag and may be cached
+# by browsers and CDNs for QUOTE_CACHE_MAX_AGE_SECONDS.
+QUOTE_CACHE_MAX_ENTRIES = int(os.environ.get('QUOTE_CACHE_MAX_ENTRIES', '10000'))
+QUOTE_CACHE_MAX_AGE_SECONDS = int(os.environ.get('QUOTE_CACHE_MAX_AGE_SECONDS', '30'))
+
+# Outbox payload encoding for new events: "json" (JSONField) or "binary"
+# (versioned struct-packed bytes with integer cents, see EventCodec). Existing
+# rows are converted with `manage.py compact_outbox_payloads`.
+OUTBOX_PAYLOAD_ENCODING = os.environ.get('OUTBOX_PAYLOAD_ENCODING', 'json')
+
+# Admission control for payment confirmation: token buckets (global and per
+# seller) answer 429, exhausted concurrency slots answer 503 after waiting at
+# most QUEUE_TIMEOUT_MS. The in-memory backend limits each process on its own;
+# CacheRateLimitBackend shares the buckets through the default cache. Off by
+# default: enabling it changes how POST /payments answers under load.
+ADMISSION_CONTROL_ENABLED = os.environ.get('ADMISSION_CONTROL_ENABLED', '0') == '1'
+ADMISSION_RATE_LIMIT_BACKEND = os.environ.get('ADMISSION_RATE_LIMIT_BACKEND', 'app.services.admission_service.InMemoryRateLimitBackend')
+ADMISSION_RATE_PER_SECOND = float(os.environ.get('ADMISSION_RATE_PER_SECOND', '500'))
+ADMISSION_BURST = int(os.environ.get('ADMISSION_BURST', '1000'))
+ADMISSION_SELLER_RATE_PER_SECOND = float(os.environ.get('ADMISSION_SELLER_RATE_PER_SECOND', '100'))
+ADMISSION_SELLER_BURST = int(os.environ.get('ADMISSION_SELLER_BURST', '200'))
+ADMISSION_MAX_CONCURRENT = int(os.environ.get('ADMISSION_MAX_CONCURRENT', '32'))
+ADMISSION_MAX_CONCURRENT_PER_SELLER = int(os.environ.get('ADMISSION_MAX_CONCURRENT_PER_SELLER', '8'))
+ADMISSION_QUEUE_TIMEOUT_MS = float(os.environ.get('ADMISSION_QUEUE_TIMEOUT_MS', '50'))
+ADMISSION_RETRY_AFTER_SECONDS = 1
+
+# Webhooks: `manage.py dispatch_webhooks` claims pending outbox events in
+# batches (the claim expires after CLAIM_LEASE_SECONDS), posts them to matching
+# subscriptions over pooled keep-alive connections. Each claim makes one
+# attempt per delivery; failures are rescheduled in webhook_retries with
+# jittered exponential backoff and, after MAX_ATTEMPTS, moved to
+# webhook_dead_letters.
+WEBHOOK_BATCH_SIZE = int(os.environ.get('WEBHOOK_BATCH_SIZE', '1000'))
+WEBHOOK_CLAIM_LEASE_SECONDS = float(os.environ.get('WEBHOOK_CLAIM_LEASE_SECONDS', '300'))
+WEBHOOK_TIMEOUT_SECONDS = float(os.environ.get('WEBHOOK_TIMEOUT_SECONDS', '10'))
+WEBHOOK_MAX_ATTEMPTS = int(os.environ.get('WEBHOOK_MAX_ATTEMPTS', '5'))
+WEBHOOK_BACKOFF_BASE_SECONDS = float(os.environ.get('WEBHOOK_BACKOFF_BASE_SECONDS', '0.5'))
+WEBHOOK_BACKOFF_MAX_SECONDS = float(os.environ.get('WEBHOOK_BACKOFF_MAX_SECONDS', '30'))
+WEBHOOK_MAX_CONNECTIONS_PER_HOST = int(os.environ.get('WEBHOOK_MAX_CONNECTIONS_PER_HOST', '16'))
+WEBHOOK_MAX_IN_FLIGHT = int(os.environ.get('WEBHOOK_MAX_IN_FLIGHT', '512'))
+
+# Event stream (/api/v1/events): each process reads new outbox events at most
+# once per POLL_INTERVAL_MS into a buffer of the latest BUFFER_SIZE events per
+# shard shared by every tailing consumer. Events younger than SETTLE_MS are
+# held back; keep it above the longest payment transaction on databases whose
+# ids can commit out of order (SQLite commits them in order).
+# MAX_CONNECTIONS caps, per process, the long polls and WSGI streams holding a
+# worker thread (over it, long polls answer at once and streams get 503); keep
+# it below the worker's thread count. Streams served through config.asgi wait
+# on the event loop and are not counted.
+EVENT_STREAM_POLL_INTERVAL_MS = float(os.environ.get('EVENT_STREAM_POLL_INTERVAL_MS', '50'))
+EVENT_STREAM_SETTLE_MS = float(os.environ.get('EVENT_STREAM_SETTLE_MS', '0'))
+EVENT_STREAM_BUFFER_SIZE = int(os.environ.get('EVENT_STREAM_BUFFER_SIZE', '10000'))
+EVENT_STREAM_HEARTBEAT_SECONDS = float(os.environ.get('EVENT_STREAM_HEARTBEAT_SECONDS', '15'))
+EVENT_STREAM_MAX_CONNECTIONS = int(os.environ.get('EVENT_STREAM_MAX_CONNECTIONS', '8'))
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
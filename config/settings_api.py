@@ -0,0 +1,30 @@
+# Lean, API-only deployment profile for confirm/quote workers:
+#   DJANGO_SETTINGS_MODULE=config.settings_api
+# Drops admin, auth, sessions, messages, static files and templates, and the
+# middleware that only serves them. The JSON endpoints behave the same.
+from config.settings import *  # noqa: F401,F403
+
+INSTALLED_APPS = [
+    'app',
+]
+
+MIDDLEWARE = [
+    'django.middleware.security.SecurityMiddleware',
+    'django.middleware.common.CommonMiddleware',
+]
+
+ROOT_URLCONF = 'config.urls_api'
+
+TEMPLATES = []
+
+AUTH_PASSWORD_VALIDATORS = []
+
+USE_I18N = False
+
+REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': [],
+    'DEFAULT_PERMISSION_CLASSES': ['rest_framework.permissions.AllowAny'],
+    'DEFAULT_RENDERER_CLASSES': ['rest_framework.renderers.JSONRenderer'],
+    'DEFAULT_PARSER_CLASSES': ['rest_framework.parsers.JSONParser'],
+    'UNAUTHENTICATED_USER': None,
+}
@@ -0,0 +1,5 @@
+from django.urls import path, include
+
+urlpatterns = [
+    path("api/v1/", include("app.api.urls")),
+]